@@ -0,0 +1,120 @@
+"""Micro-benchmark: default FastAPI response path vs the FAST_JSON path.
+
+Run from the backend directory:
+
+    python bench_serialization.py
+
+The default path is what FastAPI does for a route with response_model
+(validate every row, jsonable_encoder, stdlib json). The fast path shapes
+trusted rows and renders them with orjson.
+"""
+import asyncio
+import random
+import time
+import uuid
+from typing import List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import BaseModel
+
+from fast_json import FastJSONResponse, row_shaper, orjson
+
+SIZES = [10, 100, 1000]
+GAME_MODES = ["classic", "sequence", "endurance", "precision"]
+
+
+# Same fields as server.LeaderboardEntry; importing server would connect to
+# Mongo and start the Irys workers just to run the benchmark
+class LeaderboardEntry(BaseModel):
+    id: str
+    player: str
+    username: str
+    time: int
+    penalty: bool
+    timestamp: str
+    tx_id: Optional[str] = None
+    verified: bool = False
+    verification_state: Optional[str] = None
+    game_mode: str = "classic"
+    hits_count: Optional[int] = None
+    accuracy: Optional[float] = None
+    sequence_times: Optional[List[int]] = None
+    total_targets: Optional[int] = None
+
+
+def make_rows(count: int) -> List[dict]:
+    rows = []
+    for _ in range(count):
+        game_mode = random.choice(GAME_MODES)
+        row = {
+            "id": str(uuid.uuid4()),
+            "player": "0x" + uuid.uuid4().hex + uuid.uuid4().hex[:8],
+            "username": f"player{random.randint(1, 9999)}",
+            "time": random.randint(150, 600),
+            "penalty": False,
+            "timestamp": "2024-01-01T00:00:00.000Z",
+            "tx_id": uuid.uuid4().hex,
+            "verified": True,
+            "verification_state": "verified",
+            "game_mode": game_mode
+        }
+        if game_mode == "endurance":
+            row["hits_count"] = random.randint(10, 80)
+        if game_mode == "sequence":
+            row["sequence_times"] = [random.randint(150, 600) for _ in range(5)]
+            row["total_targets"] = 5
+        rows.append(row)
+    return rows
+
+
+def bench(fn, repeat: int) -> float:
+    """Best-of-5 average time per call in microseconds."""
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        elapsed = (time.perf_counter() - start) / repeat
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e6
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    field = create_response_field("bench_leaderboard", List[LeaderboardEntry])
+    shape = row_shaper(LeaderboardEntry)
+
+    def default_leaderboard(rows):
+        content = loop.run_until_complete(serialize_response(field=field, response_content=rows))
+        return JSONResponse(content).body
+
+    def fast_leaderboard(rows):
+        return FastJSONResponse([shape(row) for row in rows]).body
+
+    def default_player(rows):
+        return JSONResponse(jsonable_encoder({"player": "0x0", "scores": rows})).body
+
+    def fast_player(rows):
+        return FastJSONResponse({"player": "0x0", "scores": rows}).body
+
+    print(f"orjson: {'available' if orjson is not None else 'NOT installed (fast path uses stdlib json)'}")
+    print(f"{'payload':<22}{'rows':>6}{'default us':>14}{'fast us':>12}{'speedup':>10}")
+    for name, default, fast in (
+        ("get_leaderboard", default_leaderboard, fast_leaderboard),
+        ("get_player_scores", default_player, fast_player),
+    ):
+        for size in SIZES:
+            rows = make_rows(size)
+            repeat = max(10, 20000 // size)
+            default_us = bench(lambda: default(rows), repeat)
+            fast_us = bench(lambda: fast(rows), repeat)
+            print(f"{name:<22}{size:>6}{default_us:>14.1f}{fast_us:>12.1f}{default_us / fast_us:>9.1f}x")
+
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional
+
+# Threads for blocking irys_sdk calls (RPC round trips)
+BLOCKING_IO_WORKERS = int(os.environ.get('BLOCKING_IO_WORKERS', '4'))
+# Calls allowed to wait for a free worker before new ones are refused
+BLOCKING_QUEUE_LIMIT = int(os.environ.get('BLOCKING_QUEUE_LIMIT', '32'))
+# Default per-call timeout (seconds)
+BLOCKING_CALL_TIMEOUT = float(os.environ.get('BLOCKING_CALL_TIMEOUT', '15'))
+# Sign in a separate process instead of a thread (keeps ECDSA off the GIL)
+SIGNING_PROCESS_POOL = os.environ.get('SIGNING_PROCESS_POOL', 'false').lower() == 'true'
+SIGNING_WORKERS = int(os.environ.get('SIGNING_WORKERS', '1'))
+
+
+class ExecutorBusyError(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """Runs blocking calls off the event loop with a cap on queued work.
+
+    Each call gets a timeout. When more than `max_queue` calls are already
+    waiting for a worker, new calls are refused straight away instead of
+    piling up behind a slow RPC.
+    """
+
+    def __init__(self, name: str, executor: Executor, workers: int,
+                 max_queue: int = BLOCKING_QUEUE_LIMIT,
+                 timeout: float = BLOCKING_CALL_TIMEOUT):
+        self.name = name
+        self.executor = executor
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        # Updated from worker threads as calls complete
+        self._lock = threading.Lock()
+        self.outstanding = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.outstanding - self.workers)
+
+    async def run(self, fn, *args, timeout: Optional[float] = None):
+        with self._lock:
+            if self.queue_depth >= self.max_queue:
+                self.rejected += 1
+                raise ExecutorBusyError(f"{self.name} executor has {self.queue_depth} calls queued")
+            self.outstanding += 1
+
+        started = time.monotonic()
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda done: self._finished(done, started))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            # Drops the call if it has not started; a running one finishes unobserved
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def status(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "outstanding": self.outstanding,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "avg_ms": round(1000 * self.total_seconds / finished, 1) if finished else None
+        }
+
+    def _finished(self, future, started: float):
+        with self._lock:
+            self.outstanding -= 1
+            self.total_seconds += time.monotonic() - started
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+
+def io_executor(workers: int = BLOCKING_IO_WORKERS, name: str = "irys_io",
+                max_queue: int = BLOCKING_QUEUE_LIMIT) -> BoundedExecutor:
+    executor = ThreadPoolExecutor(workers, thread_name_prefix=name.replace("_", "-"))
+    return BoundedExecutor(name, executor, workers, max_queue=max_queue)
+
+
+# Signer state inside each signing process
+_signer = None
+
+
+def _init_signer(private_key: str):
+    global _signer
+    from eth_account import Account
+    _signer = Account.from_key(private_key)
+
+
+def sign_text(message: str, account=None) -> str:
+    """Sign an EIP-191 text message; uses the process-local signer when no account is given."""
+    from eth_account.messages import encode_defunct
+    signer = account if account is not None else _signer
+    return signer.sign_message(encode_defunct(text=message)).signature.hex()
+
+
+class Signer:
+    """Signs messages with the server key in a thread or, optionally, a process pool.
+
+    In process mode the key is handed to each worker once, at start-up.
+    """
+
+    def __init__(self, account, use_processes: bool = SIGNING_PROCESS_POOL,
+                 workers: int = SIGNING_WORKERS):
+        if use_processes:
+            executor = ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_signer,
+                initargs=(account.key.hex(),)
+            )
+            self.account = None
+        else:
+            executor = ThreadPoolExecutor(workers, thread_name_prefix="signing")
+            self.account = account
+        self.executor = BoundedExecutor("signing", executor, workers)
+
+    async def sign(self, message: str) -> str:
+        return await self.executor.run(sign_text, message, self.account)
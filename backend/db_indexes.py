@@ -0,0 +1,114 @@
+import asyncio
+
+# Indexes per collection, each matching a real query shape:
+#   (keys, options)
+INDEXES = {
+    "scores": [
+        # get_leaderboard with a game_mode filter, sorted by time (id breaks ties
+        # for keyset pagination and rank counts)
+        ([("game_mode", 1), ("time", 1), ("id", 1)], {}),
+        # get_leaderboard for endurance, sorted by hits_count desc
+        ([("game_mode", 1), ("hits_count", -1), ("id", 1)], {}),
+        # get_leaderboard across all modes
+        ([("time", 1), ("id", 1)], {}),
+        # get_player_scores: {player} sort time
+        ([("player", 1), ("time", 1)], {}),
+        # get_player_stats: {player} sort timestamp desc
+        ([("player", 1), ("timestamp", -1)], {}),
+        # Lookups and verifier updates by score id
+        ([("id", 1)], {"unique": True}),
+        # Unique only for non-null tx_id values
+        ([("tx_id", 1)], {"unique": True, "sparse": True}),
+        # Idempotent submissions: one score per (player, Idempotency-Key / client_nonce)
+        ([("player", 1), ("idempotency_key", 1)], {
+            "unique": True,
+            "partialFilterExpression": {"idempotency_key": {"$exists": True}}
+        }),
+        # ScoreVerifier: pending scores that are due
+        ([("verification_state", 1), ("verification_next_attempt", 1)], {}),
+    ],
+    "achievements": [
+        # get_player_achievements: {player} sort unlocked_at
+        ([("player", 1), ("unlocked_at", -1)], {}),
+        # unlock_achievement duplicate check
+        ([("player", 1), ("achievement_type", 1)], {}),
+    ],
+    "player_stats": [
+        # get_player_stats: one document per player
+        ([("player", 1)], {"unique": True}),
+    ],
+    "verified_transactions": [
+        ([("tx_id", 1)], {"unique": True}),
+    ],
+}
+
+# Single-field indexes made redundant by the compound indexes above
+OBSOLETE_INDEXES = {
+    "scores": [
+        "player_1",
+        "game_mode_1",
+        "time_1",
+        "game_mode_1_time_1",
+        "game_mode_1_hits_count_-1",
+    ],
+}
+
+
+async def ensure_indexes(db):
+    """Create every declared index (a no-op for ones that already exist)."""
+    created = 0
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        for keys, options in indexes:
+            try:
+                await collection.create_index(keys, **options)
+                created += 1
+            except Exception as e:
+                print(f"Failed to create index {keys} on {collection_name}: {e}")
+
+    for collection_name, names in OBSOLETE_INDEXES.items():
+        collection = db[collection_name]
+        try:
+            existing = await collection.index_information()
+        except Exception as e:
+            print(f"Failed to list indexes on {collection_name}: {e}")
+            continue
+        for name in names:
+            if name in existing:
+                try:
+                    await collection.drop_index(name)
+                    print(f"Dropped redundant index {name} on {collection_name}")
+                except Exception as e:
+                    print(f"Failed to drop index {name} on {collection_name}: {e}")
+
+    print(f"Database indexes ensured ({created} declared)")
+
+
+# Keeps background build tasks referenced until they finish
+_background_tasks = set()
+
+
+def ensure_indexes_in_background(db) -> asyncio.Task:
+    """Build indexes without holding up startup."""
+    task = asyncio.create_task(ensure_indexes(db))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def index_stats(db) -> dict:
+    """Report per-index usage counters from $indexStats for each managed collection."""
+    stats = {}
+    for collection_name in INDEXES:
+        cursor = db[collection_name].aggregate([{"$indexStats": {}}])
+        rows = await cursor.to_list(length=None)
+        stats[collection_name] = [
+            {
+                "name": row.get("name"),
+                "key": row.get("key"),
+                "ops": row.get("accesses", {}).get("ops", 0),
+                "since": row.get("accesses", {}).get("since")
+            }
+            for row in rows
+        ]
+    return stats
@@ -0,0 +1,55 @@
+import os
+import json
+from typing import Any, Callable, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Opt-in: serve hot read endpoints through orjson, skipping pydantic re-validation
+FAST_JSON_ENABLED = os.environ.get('FAST_JSON', 'false').lower() == 'true' and orjson is not None
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson (stdlib json when it is not installed).
+
+    Content is serialized as-is: no response_model validation and no
+    jsonable_encoder pass, so it must only be used for trusted data.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def row_shaper(model: Type[BaseModel]) -> Callable[[dict], dict]:
+    """Build a function that gives a trusted DB row the shape `model` would output.
+
+    Fields come out in model order, missing optional ones take the model's
+    default and unknown keys are dropped - the same document FastAPI would
+    produce via response_model, minus the per-field validation. A row missing
+    a required field raises KeyError, as response_model would have failed too.
+    """
+    required = [name for name, field in model.model_fields.items() if field.is_required()]
+    defaults = {
+        name: field.get_default(call_default_factory=True)
+        for name, field in model.model_fields.items()
+        if not field.is_required()
+    }
+    names = list(model.model_fields)
+
+    def shape(row: dict) -> dict:
+        missing = [name for name in required if name not in row]
+        if missing:
+            raise KeyError(f"{model.__name__} row is missing required fields: {', '.join(missing)}")
+        return {name: row[name] if name in row else defaults[name] for name in names}
+
+    return shape
+
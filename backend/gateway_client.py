@@ -0,0 +1,94 @@
+import os
+import httpx
+from typing import Optional
+
+# Gateway used to look up uploaded transactions (uploads go to devnet)
+VERIFY_GATEWAY_URL = os.environ.get('VERIFY_GATEWAY_URL', 'https://devnet.irys.xyz')
+
+# Connection pool and timeout settings
+GATEWAY_MAX_CONNECTIONS = int(os.environ.get('GATEWAY_MAX_CONNECTIONS', '20'))
+GATEWAY_MAX_KEEPALIVE = int(os.environ.get('GATEWAY_MAX_KEEPALIVE', '10'))
+GATEWAY_KEEPALIVE_EXPIRY = float(os.environ.get('GATEWAY_KEEPALIVE_EXPIRY', '60'))
+GATEWAY_TIMEOUT = float(os.environ.get('GATEWAY_TIMEOUT', '10'))
+
+# Status codes meaning "this kind of request is not supported here, try another"
+_UNSUPPORTED_STATUSES = {405, 501}
+
+
+class GatewayClient:
+    """Application-scoped HTTP/2 client for all Irys gateway traffic.
+
+    Keeping one client alive reuses TCP+TLS connections to the gateway instead
+    of paying a fresh handshake on every verification.
+    """
+
+    def __init__(self, base_url: str = VERIFY_GATEWAY_URL,
+                 max_connections: int = GATEWAY_MAX_CONNECTIONS,
+                 max_keepalive: int = GATEWAY_MAX_KEEPALIVE,
+                 timeout: float = GATEWAY_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=GATEWAY_KEEPALIVE_EXPIRY
+        )
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 5.0))
+        self._client: Optional[httpx.AsyncClient] = None
+        # Flipped off the first time the gateway rejects a probe style
+        self.head_supported = True
+        self.range_supported = True
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so the client also works if startup hooks did not run
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=True,
+                limits=self.limits,
+                timeout=self.timeout
+            )
+        return self._client
+
+    async def start(self):
+        _ = self.client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def tx_url(self, tx_id: str) -> str:
+        return f"{self.base_url}/{tx_id}"
+
+    async def check_tx(self, tx_id: str, timeout: Optional[float] = None) -> int:
+        """Return 200 if the transaction exists, otherwise the gateway's status code.
+
+        Existence is probed with HEAD, then a one-byte range request, and only
+        falls back to a GET when the gateway rejects both. The fallback streams
+        the response and closes it without reading the payload.
+        """
+        path = f"/{tx_id}"
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+
+        if self.head_supported:
+            response = await self.client.head(path, **kwargs)
+            if response.status_code not in _UNSUPPORTED_STATUSES:
+                return response.status_code
+            self.head_supported = False
+
+        if self.range_supported:
+            # Streamed so a gateway that ignores Range never sends us the full body
+            async with self.client.stream("GET", path, headers={"Range": "bytes=0-0"}, **kwargs) as response:
+                status_code = response.status_code
+            if status_code in (200, 206):
+                return 200
+            # 416 means the range could not be served, which still proves the tx exists
+            if status_code == 416:
+                return 200
+            if status_code not in _UNSUPPORTED_STATUSES:
+                return status_code
+            self.range_supported = False
+
+        async with self.client.stream("GET", path, **kwargs) as response:
+            return response.status_code
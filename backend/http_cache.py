@@ -0,0 +1,85 @@
+import os
+import hashlib
+import uuid
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+# Cache lifetimes (seconds) handed to browsers and any CDN in front of us
+LEADERBOARD_MAX_AGE = int(os.environ.get('LEADERBOARD_MAX_AGE', '5'))
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', '3600'))
+
+# Generation counters restart with the process, so tags also carry a process epoch
+_EPOCH = uuid.uuid4().hex[:8]
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already names this entity tag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+class ResourceVersions:
+    """Generation counters for dynamic resources, bumped whenever they change."""
+
+    def __init__(self):
+        self.generations: Dict[str, int] = {}
+
+    def bump(self, *keys: str):
+        for key in keys:
+            self.generations[key] = self.generations.get(key, 0) + 1
+
+    def bump_all(self):
+        for key in list(self.generations):
+            self.generations[key] += 1
+        self.generations["*"] = self.generations.get("*", 0) + 1
+
+    def etag(self, key: str, *variant) -> str:
+        """Weak tag for `key` at its current generation; `variant` covers query params."""
+        generation = f"{self.generations.get(key, 0)}.{self.generations.get('*', 0)}"
+        suffix = hashlib.sha1(repr(variant).encode()).hexdigest()[:8]
+        return f'W/"{key}-{_EPOCH}-{generation}-{suffix}"'
+
+
+class StaticResource:
+    """A response body that never changes for the life of the process.
+
+    It is rendered once, and its ETag is a hash of the rendered bytes.
+    """
+
+    def __init__(self, payload, max_age: int = STATIC_MAX_AGE):
+        rendered = JSONResponse(payload)
+        self.body = rendered.body
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:16] + '"'
+        self.cache_control = f"public, max-age={max_age}"
+
+    def respond(self, request: Request) -> Response:
+        if etag_matches(request, self.etag):
+            return not_modified(self.etag, self.cache_control)
+        return Response(
+            content=self.body,
+            media_type="application/json",
+            headers={"ETag": self.etag, "Cache-Control": self.cache_control}
+        )
+
+
+def leaderboard_cache_control(max_age: Optional[int] = None) -> str:
+    max_age = LEADERBOARD_MAX_AGE if max_age is None else max_age
+    return f"public, max-age={max_age}, stale-while-revalidate={max_age * 6}"
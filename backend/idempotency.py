@@ -0,0 +1,80 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Tuple
+
+# How long (seconds) a completed request is remembered in memory
+IDEMPOTENCY_TTL = float(os.environ.get('IDEMPOTENCY_TTL', '600'))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', '10000'))
+# Longest Idempotency-Key / client_nonce accepted
+MAX_IDEMPOTENCY_KEY_LENGTH = 200
+
+
+class IdempotencyStore:
+    """Short-lived in-memory map of idempotency key -> result.
+
+    A retry that arrives while the original request is still running waits
+    for it and gets the same result. A retry that arrives later gets the
+    remembered result. Failed requests are forgotten so they can be retried.
+    Anything older than the TTL (or lost in a restart) falls back to the
+    unique index in Mongo.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_entries: int = IDEMPOTENCY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()  # key -> (future, expires_at)
+        self.hits = 0
+        self.misses = 0
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable]) -> Tuple[object, bool]:
+        """Return (result, replayed), calling fn only if key has no live entry."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            future, expires_at = entry
+            if expires_at > time.monotonic():
+                self.hits += 1
+                return await asyncio.shield(future), True
+            del self._entries[key]
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._remember(key, future)
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._forget(key, future)
+            future.cancel()
+            raise
+        except Exception as e:
+            self._forget(key, future)
+            future.set_exception(e)
+            # Mark the exception as retrieved when no retry was waiting on it
+            future.exception()
+            raise
+        future.set_result(result)
+        return result, False
+
+    def status(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def _remember(self, key: Hashable, future: asyncio.Future):
+        now = time.monotonic()
+        self._entries[key] = (future, now + self.ttl)
+        self._entries.move_to_end(key)
+        # Entries share one TTL, so the oldest are the first to expire
+        while self._entries:
+            _, expires_at = next(iter(self._entries.values()))
+            if len(self._entries) <= self.max_entries and expires_at > now:
+                break
+            self._entries.popitem(last=False)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is future:
+            del self._entries[key]
@@ -0,0 +1,157 @@
+import os
+import importlib
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageOps, features
+
+from blocking_executor import BoundedExecutor
+
+# pillow-avif-plugin registers an AVIF codec with Pillow as a side effect of being imported
+if importlib.util.find_spec("pillow_avif") is not None:
+    importlib.import_module("pillow_avif")
+
+# Processes that transcode uploads (CPU-bound, so separate from the event loop)
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '1'))
+IMAGE_TIMEOUT = float(os.environ.get('IMAGE_TIMEOUT', '30'))
+# Uploads are scaled down to fit within this many pixels on the long side
+IMAGE_MAX_DIMENSION = int(os.environ.get('IMAGE_MAX_DIMENSION', '2048'))
+# Refuse images whose decoded size would exceed this (decompression bombs)
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', str(40_000_000)))
+
+# Twitter summary_large_image card
+CARD_SIZE = (1200, 628)
+THUMBNAIL_SIZE = (320, 320)
+
+AVIF_SUPPORTED = "AVIF" in Image.registered_extensions().values()
+WEBP_SUPPORTED = features.check("webp")
+
+# Variant file name -> media type, best first for content negotiation
+VARIANT_MEDIA_TYPES = {
+    "image.avif": "image/avif",
+    "image.webp": "image/webp",
+    "card.jpg": "image/jpeg",
+    "thumb.jpg": "image/jpeg",
+}
+# Variants that are alternative encodings of the full image
+FULL_IMAGE_VARIANTS = ["image.avif", "image.webp"]
+
+# Formats accepted for upload: Pillow format -> stored extension
+UPLOAD_FORMATS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp", "GIF": "gif"}
+# Stored extension -> the only Content-Type an original is served with
+UPLOAD_MEDIA_TYPES = {"png": "image/png", "jpg": "image/jpeg", "webp": "image/webp", "gif": "image/gif"}
+
+
+class InvalidImage(Exception):
+    pass
+
+
+def sniff_extension(path) -> str:
+    """The stored extension for the format Pillow detects in the file (reads the header only).
+
+    The client's filename is never trusted: a GIF named x.html is stored as .gif.
+    """
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+    try:
+        with Image.open(path) as opened:
+            image_format = opened.format
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise InvalidImage("Not a supported image")
+    extension = UPLOAD_FORMATS.get(image_format)
+    if extension is None:
+        raise InvalidImage(f"Unsupported image format {image_format}; use PNG, JPEG, WebP or GIF")
+    return extension
+
+
+def transcode(source: str, variants_dir: str) -> Dict[str, int]:
+    """Decode, normalize and re-encode one upload; returns variant name -> bytes.
+
+    Runs in a worker process. Normalizing applies the EXIF orientation, drops
+    metadata, flattens to RGB and caps the size. Variants are written to
+    temporary names and renamed, so readers never see a partial file.
+    """
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+    try:
+        with Image.open(source) as opened:
+            opened.load()
+            image = ImageOps.exif_transpose(opened)
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise InvalidImage("Not a supported image")
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # Share cards are shown on light and dark backgrounds alike; flatten onto white
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    else:
+        image = image.convert("RGB")
+    image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.LANCZOS)
+
+    out = Path(variants_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    outputs = []
+    if AVIF_SUPPORTED:
+        outputs.append(("image.avif", image, {"format": "AVIF", "quality": 60}))
+    if WEBP_SUPPORTED:
+        outputs.append(("image.webp", image, {"format": "WEBP", "quality": 80, "method": 4}))
+    outputs.append(("card.jpg", ImageOps.fit(image, CARD_SIZE, Image.LANCZOS),
+                    {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True}))
+    thumbnail = image.copy()
+    thumbnail.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+    outputs.append(("thumb.jpg", thumbnail, {"format": "JPEG", "quality": 80, "optimize": True}))
+
+    sizes = {}
+    for name, variant, options in outputs:
+        temp = out / f".{name}.tmp"
+        variant.save(temp, **options)
+        os.replace(temp, out / name)
+        sizes[name] = (out / name).stat().st_size
+    return sizes
+
+
+def _quality(params: List[str]) -> float:
+    for param in params:
+        name, _, value = param.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 1.0
+    return 1.0
+
+
+def best_variant(accept: Optional[str], available: List[str]) -> Optional[str]:
+    """Pick the most compact full-image encoding the client explicitly accepts, if any."""
+    accepted = set()
+    for part in (accept or "").split(","):
+        media_type, *params = part.split(";")
+        if _quality(params) > 0:
+            accepted.add(media_type.strip().lower())
+    for name in FULL_IMAGE_VARIANTS:
+        if name in available and VARIANT_MEDIA_TYPES[name] in accepted:
+            return name
+    return None
+
+
+class ImagePipeline:
+    """Runs transcode() for uploaded screenshots on a bounded process pool."""
+
+    def __init__(self, workers: int = IMAGE_WORKERS, timeout: float = IMAGE_TIMEOUT):
+        executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        self.executor = BoundedExecutor("images", executor, workers, timeout=timeout)
+
+    async def process(self, source: Path, variants_dir: Path) -> Dict[str, int]:
+        return await self.executor.run(transcode, str(source), str(variants_dir))
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+    def status(self) -> dict:
+        return {
+            "avif": AVIF_SUPPORTED,
+            "webp": WEBP_SUPPORTED,
+            **self.executor.status()
+        }
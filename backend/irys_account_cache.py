@@ -0,0 +1,184 @@
+import os
+import math
+import time
+import asyncio
+from typing import Dict
+
+# Seconds between background balance refreshes
+BALANCE_REFRESH_INTERVAL = float(os.environ.get('BALANCE_REFRESH_INTERVAL', '60'))
+# Seconds a price sample is used before it is refreshed
+PRICE_TTL = float(os.environ.get('PRICE_TTL', '300'))
+# Smallest size bucket (bytes); buckets double from here
+PRICE_MIN_BUCKET = int(os.environ.get('PRICE_MIN_BUCKET', '1024'))
+
+
+def size_bucket(data_size: int) -> int:
+    """The power-of-two bucket (>= PRICE_MIN_BUCKET) that covers data_size."""
+    bucket = PRICE_MIN_BUCKET
+    while bucket < data_size:
+        bucket *= 2
+    return bucket
+
+
+class IrysAccountCache:
+    """In-memory balance and upload price for the server's Irys account.
+
+    The balance is refreshed on a timer and right after funding. Prices are
+    sampled once per size bucket and refreshed after PRICE_TTL. Sizes are
+    priced from a least-squares price-per-byte line fitted through the
+    samples, so most lookups never wait on the RPC. Every answer says how old
+    it is.
+    """
+
+    def __init__(self, irys_client, executor,
+                 balance_interval: float = BALANCE_REFRESH_INTERVAL,
+                 price_ttl: float = PRICE_TTL):
+        self.irys_client = irys_client
+        self.executor = executor
+        self.balance_interval = balance_interval
+        self.price_ttl = price_ttl
+        self._balance = None
+        self._balance_at = None
+        self._balance_error = None
+        # Set by funding: the cached balance is known to be out of date
+        self._balance_invalidated = False
+        # Bumped by every invalidation; a fetch started under an older one is discarded
+        self._balance_generation = 0
+        # bucket size -> (price, fetched_at)
+        self._prices: Dict[int, tuple] = {}
+        self._curve = None  # (base, per_byte)
+        self._inflight: Dict[object, asyncio.Task] = {}
+        self._task = None
+
+    async def start(self):
+        # Warm the balance so the first pre-upload check is served from memory
+        self._spawn("balance", self._refresh_balance)
+        if self._task is None and self.balance_interval > 0:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def balance(self) -> dict:
+        if self._balance_at is None or self._balance_invalidated:
+            await self._fetch("balance", self._refresh_balance)
+        age = time.monotonic() - self._balance_at
+        return {
+            "balance": self._balance,
+            "age_seconds": round(age, 3),
+            "stale": age > 2 * self.balance_interval or self._balance_error is not None or self._balance_invalidated,
+            "refresh_error": self._balance_error
+        }
+
+    def invalidate_balance(self):
+        """Refetch the balance now (after funding) instead of waiting for the timer.
+
+        A refresh already in flight may have read the balance before the
+        funding landed, so it restarts rather than answering for this one.
+        """
+        self._balance_generation += 1
+        self._balance_invalidated = True
+        self._spawn("balance", self._refresh_balance)
+
+    async def price(self, data_size: int) -> dict:
+        bucket = size_bucket(data_size)
+        entry = self._prices.get(bucket)
+        if entry is None and self._curve is None:
+            # Nothing to estimate from yet
+            await self._fetch(("price", bucket), lambda: self._refresh_price(bucket))
+            entry = self._prices[bucket]
+
+        now = time.monotonic()
+        if entry is None or now - entry[1] > self.price_ttl:
+            self._spawn(("price", bucket), lambda: self._refresh_price(bucket))
+
+        if self._curve is not None:
+            base, per_byte = self._curve
+            price = max(0, math.ceil(base + per_byte * data_size))
+            source = "curve"
+            age = now - min(fetched_at for _, fetched_at in self._prices.values())
+        else:
+            # A single sample: the bucket's price is an upper bound for any size in it
+            price, fetched_at = entry
+            source = "bucket"
+            age = now - fetched_at
+
+        return {
+            "price": price,
+            "source": source,
+            "bucket": bucket,
+            "age_seconds": round(age, 3),
+            "stale": age > self.price_ttl
+        }
+
+    def status(self) -> dict:
+        return {
+            "balance_age_seconds": round(time.monotonic() - self._balance_at, 3) if self._balance_at else None,
+            "balance_error": self._balance_error,
+            "price_buckets": sorted(self._prices),
+            "price_curve": {"base": self._curve[0], "per_byte": self._curve[1]} if self._curve else None
+        }
+
+    async def _refresh_balance(self):
+        while True:
+            generation = self._balance_generation
+            try:
+                balance = await self.executor.run(self.irys_client.get_balance)
+            except Exception as e:
+                self._balance_error = str(e) or type(e).__name__
+                if self._balance_at is None:
+                    raise
+                return
+            if generation != self._balance_generation:
+                # Invalidated while fetching: this reading may predate the funding
+                continue
+            self._balance = balance
+            self._balance_at = time.monotonic()
+            self._balance_error = None
+            self._balance_invalidated = False
+            return
+
+    async def _refresh_price(self, bucket: int):
+        price = await self.executor.run(self.irys_client.get_price, bucket)
+        self._prices[bucket] = (price, time.monotonic())
+        self._fit()
+
+    def _fit(self):
+        """Least-squares line price = base + per_byte * size through the bucket samples."""
+        points = [(bucket, float(price)) for bucket, (price, _) in self._prices.items()]
+        if len(points) < 2:
+            self._curve = None
+            return
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        var_x = sum((x - mean_x) ** 2 for x, _ in points)
+        per_byte = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+        self._curve = (mean_y - per_byte * mean_x, per_byte)
+
+    async def _fetch(self, key, refresh):
+        """Run refresh once per key, letting concurrent callers share it."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._spawn(key, refresh)
+        await asyncio.shield(task)
+
+    def _spawn(self, key, refresh) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(refresh())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._settled(key, done))
+        return task
+
+    def _settled(self, key, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Irys {key} refresh failed: {task.exception()}")
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.balance_interval)
+            self._spawn("balance", self._refresh_balance)
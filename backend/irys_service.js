@@ -55,20 +55,7 @@ class IrysService {
 
             console.log('Uploading to Irys devnet...');
             
-            // Add default tags
-            // Ensure tags is an array and each tag is properly formatted
-            const validTags = Array.isArray(tags) ? tags.filter(tag => 
-                tag && typeof tag === 'object' && 
-                typeof tag.name === 'string' && 
-                typeof tag.value === 'string'
-            ) : [];
-
-            const allTags = [
-                { name: "App-Name", value: "IrysReflex" },
-                { name: "Content-Type", value: "application/json" },
-                { name: "Timestamp", value: Date.now().toString() },
-                ...validTags
-            ];
+            const allTags = this.buildTags(tags);
 
             const receipt = await this.uploader.upload(JSON.stringify(data), { tags: allTags });
             
@@ -94,6 +81,93 @@ class IrysService {
         }
     }
 
+    buildTags(tags = []) {
+        // Add default tags
+        // Ensure tags is an array and each tag is properly formatted
+        const validTags = Array.isArray(tags) ? tags.filter(tag => 
+            tag && typeof tag === 'object' && 
+            typeof tag.name === 'string' && 
+            typeof tag.value === 'string'
+        ) : [];
+
+        return [
+            { name: "App-Name", value: "IrysReflex" },
+            { name: "Content-Type", value: "application/json" },
+            { name: "Timestamp", value: Date.now().toString() },
+            ...validTags
+        ];
+    }
+
+    // Upload several items as a single bundle: every item is signed as its own
+    // data item (so each caller still gets its own id), but only one bundle
+    // goes over the wire.
+    async uploadBatch(items = []) {
+        try {
+            if (!this.initialized) {
+                const initResult = await this.initialize();
+                if (!initResult.success) {
+                    throw new Error(initResult.error);
+                }
+            }
+
+            if (!Array.isArray(items) || items.length === 0) {
+                return { success: true, items: [], network: 'devnet' };
+            }
+
+            const prepared = items.map(item => ({
+                data: JSON.stringify(item.data),
+                tags: this.buildTags(item.tags || [])
+            }));
+
+            // Older uploaders without bundle support fall back to one upload per item
+            if (typeof this.uploader.uploader?.uploadBundle !== 'function') {
+                const results = [];
+                for (const item of items) {
+                    results.push(await this.upload(item.data, item.tags || []));
+                }
+                return { success: true, items: results, network: 'devnet' };
+            }
+
+            console.log(`Uploading bundle of ${prepared.length} items to Irys devnet...`);
+
+            const transactions = [];
+            for (const item of prepared) {
+                const tx = this.uploader.createTransaction(item.data, { tags: item.tags });
+                await tx.sign();
+                transactions.push(tx);
+            }
+
+            const receipt = await this.uploader.uploader.uploadBundle(transactions);
+            const bundleId = receipt?.data?.id || null;
+
+            console.log(`✅ Bundle upload successful: ${bundleId} (${transactions.length} items)`);
+
+            return {
+                success: true,
+                bundle_id: bundleId,
+                items: transactions.map((tx, index) => ({
+                    success: true,
+                    tx_id: tx.id,
+                    bundle_id: bundleId,
+                    gateway_url: `https://devnet.irys.xyz/${tx.id}`,
+                    explorer_url: `https://devnet.irys.xyz/${tx.id}`,
+                    timestamp: receipt?.data?.timestamp,
+                    tags: prepared[index].tags,
+                    network: 'devnet',
+                    verified: true
+                })),
+                network: 'devnet'
+            };
+        } catch (error) {
+            console.error('❌ Bundle upload failed:', error.message);
+            return {
+                success: false,
+                error: error.message,
+                network: 'devnet'
+            };
+        }
+    }
+
     async getBalance() {
         try {
             if (!this.initialized) {
@@ -137,7 +211,26 @@ class IrysService {
     }
 }
 
-// Main execution
+async function handleRequest(service, request) {
+    switch (request.action) {
+        case 'initialize':
+            return await service.initialize();
+        case 'upload':
+            return await service.upload(request.data, request.tags || []);
+        case 'upload_batch':
+            return await service.uploadBatch(request.data || []);
+        case 'balance':
+            return await service.getBalance();
+        case 'address':
+            return await service.getAddress();
+        case 'ping':
+            return { success: true, initialized: service.initialized, pid: process.pid };
+        default:
+            return { success: false, error: 'Unknown action' };
+    }
+}
+
+// Main execution (one-shot mode: a single JSON request on stdin)
 async function main() {
     const service = new IrysService();
     
@@ -160,24 +253,7 @@ async function main() {
             }
 
             const request = JSON.parse(inputData);
-            let response;
-
-            switch (request.action) {
-                case 'initialize':
-                    response = await service.initialize();
-                    break;
-                case 'upload':
-                    response = await service.upload(request.data, request.tags || []);
-                    break;
-                case 'balance':
-                    response = await service.getBalance();
-                    break;
-                case 'address':
-                    response = await service.getAddress();
-                    break;
-                default:
-                    response = { success: false, error: 'Unknown action' };
-            }
+            const response = await handleRequest(service, request);
 
             // Ensure we always output valid JSON
             console.log(JSON.stringify(response));
@@ -190,8 +266,84 @@ async function main() {
     });
 }
 
+// How long a worker keeps running after stdin closes so in-flight uploads can finish
+const DRAIN_TIMEOUT_MS = parseFloat(process.env.IRYS_WORKER_DRAIN_TIMEOUT || '30') * 1000;
+
+// Worker mode: long-lived process speaking newline-delimited JSON.
+// Each request line is {"id": ..., "action": ..., ...} and gets exactly one
+// response line carrying the same id. Logs go to stderr so stdout stays clean.
+async function serve() {
+    const readline = require('readline');
+    const service = new IrysService();
+
+    console.log = (...args) => console.error(...args);
+
+    const respond = (id, response) => {
+        process.stdout.write(JSON.stringify({ id, ...response }) + '\n');
+    };
+
+    // Warm up the uploader once so requests only pay the network round-trip
+    await service.initialize();
+
+    // Requests still running; stdin closing only ends the process once they finish
+    const inFlight = new Set();
+    let closing = false;
+
+    const exitWhenDrained = () => {
+        if (closing && inFlight.size === 0) {
+            process.exit(0);
+        }
+    };
+
+    const rl = readline.createInterface({ input: process.stdin, terminal: false });
+    rl.on('line', async (line) => {
+        if (!line.trim()) {
+            return;
+        }
+
+        let request;
+        try {
+            request = JSON.parse(line);
+        } catch (error) {
+            respond(null, { success: false, error: `Invalid JSON request: ${error.message}` });
+            return;
+        }
+
+        const token = Symbol(request.id);
+        inFlight.add(token);
+        try {
+            respond(request.id, await handleRequest(service, request));
+        } catch (error) {
+            respond(request.id, {
+                success: false,
+                error: error.message || 'Unknown error occurred'
+            });
+        } finally {
+            inFlight.delete(token);
+            exitWhenDrained();
+        }
+    });
+
+    rl.on('close', () => {
+        closing = true;
+        if (inFlight.size > 0) {
+            console.error(`stdin closed, waiting for ${inFlight.size} requests to finish`);
+            // Give up on uploads that hang past the drain timeout
+            setTimeout(() => {
+                console.error(`Exiting with ${inFlight.size} requests unfinished`);
+                process.exit(1);
+            }, DRAIN_TIMEOUT_MS).unref();
+        }
+        exitWhenDrained();
+    });
+}
+
 if (require.main === module) {
-    main();
+    if (process.argv.includes('--serve')) {
+        serve();
+    } else {
+        main();
+    }
 }
 
 module.exports = IrysService;
\ No newline at end of file
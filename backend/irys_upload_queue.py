@@ -0,0 +1,99 @@
+import os
+import asyncio
+from typing import List, Optional
+
+# Coalescing window and batch size for Irys uploads
+IRYS_UPLOAD_BATCH_WINDOW_MS = int(os.environ.get('IRYS_UPLOAD_BATCH_WINDOW_MS', '250'))
+IRYS_UPLOAD_BATCH_MAX = int(os.environ.get('IRYS_UPLOAD_BATCH_MAX', '25'))
+
+
+class IrysUploadQueue:
+    """Coalesces concurrent Irys uploads into bundles.
+
+    Callers `await submit(...)` and get back their own item receipt. Pending
+    items are flushed as one `upload_batch` request to the worker pool once the
+    window elapses or the batch is full, whichever comes first.
+    """
+
+    def __init__(self, worker_pool, window_ms: int = IRYS_UPLOAD_BATCH_WINDOW_MS,
+                 max_items: int = IRYS_UPLOAD_BATCH_MAX):
+        self.worker_pool = worker_pool
+        self.window = max(0, window_ms) / 1000
+        self.max_items = max(1, max_items)
+        self._pending = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._inflight = set()
+        self.batches_sent = 0
+        self.items_sent = 0
+
+    async def submit(self, data, tags: Optional[List[dict]] = None) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((data, tags or [], future))
+
+        if len(self._pending) >= self.max_items:
+            self._flush_now()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+
+        return await future
+
+    async def drain(self):
+        """Flush anything still queued and wait for in-flight bundles (used on shutdown)."""
+        if self._pending:
+            self._flush_now()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def status(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "inflight_batches": len(self._inflight),
+            "batches_sent": self.batches_sent,
+            "items_sent": self.items_sent,
+            "window_ms": int(self.window * 1000),
+            "max_items": self.max_items
+        }
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window)
+        self._flush_task = None
+        self._flush_now()
+
+    def _flush_now(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._send(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, batch):
+        items = [{"data": data, "tags": tags} for data, tags, _ in batch]
+        try:
+            print(f"📦 Sending Irys bundle with {len(items)} items")
+            response = await self.worker_pool.call("upload_batch", items)
+            self.batches_sent += 1
+            self.items_sent += len(items)
+
+            if not response.get("success"):
+                error = response.get("error", "Bundle upload failed")
+                results = [{"success": False, "error": error} for _ in batch]
+            else:
+                results = response.get("items", [])
+                if len(results) != len(batch):
+                    mismatch = {"success": False, "error": "Bundle receipt does not match request"}
+                    results = [mismatch for _ in batch]
+
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            print(f"Irys bundle upload error: {str(e)}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
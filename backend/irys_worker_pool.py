@@ -0,0 +1,252 @@
+import os
+import asyncio
+import json
+import uuid
+from typing import Optional
+
+# Pool configuration
+IRYS_WORKER_POOL_SIZE = int(os.environ.get('IRYS_WORKER_POOL_SIZE', '2'))
+IRYS_WORKER_TIMEOUT = float(os.environ.get('IRYS_WORKER_TIMEOUT', '60'))
+IRYS_WORKER_HEALTH_INTERVAL = float(os.environ.get('IRYS_WORKER_HEALTH_INTERVAL', '30'))
+# Seconds a stopping worker gets to finish in-flight requests (read by irys_service.js too)
+IRYS_WORKER_DRAIN_TIMEOUT = float(os.environ.get('IRYS_WORKER_DRAIN_TIMEOUT', '30'))
+
+# Largest single response line we accept from a worker
+_STREAM_LIMIT = 4 * 1024 * 1024
+
+
+class IrysWorker:
+    """One long-lived `node irys_service.js --serve` process.
+
+    Requests and responses are newline-delimited JSON objects matched by `id`,
+    so several requests can be in flight on the same worker at once.
+    """
+
+    def __init__(self, script_path: str, cwd: str, index: int):
+        self.script_path = script_path
+        self.cwd = cwd
+        self.index = index
+        self.process = None
+        self.pending = {}
+        self.restarts = 0
+        # Set while the pool replaces this worker's process; requests go elsewhere
+        self.restarting = False
+        self._reader_task = None
+        self._stderr_task = None
+        self._write_lock = asyncio.Lock()
+        self._restart_lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    @property
+    def available(self) -> bool:
+        return self.alive and not self.restarting
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            'node', self.script_path, '--serve',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.cwd,
+            limit=_STREAM_LIMIT
+        )
+        self._reader_task = asyncio.create_task(self._read_responses())
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+        print(f"🔧 Irys worker {self.index} started (pid {self.process.pid})")
+
+    async def stop(self, drain: bool = True):
+        """Stop the process, letting in-flight requests finish first unless drain is False."""
+        if self.alive:
+            try:
+                if not drain:
+                    raise RuntimeError("not draining")
+                # The worker exits once its in-flight requests have answered
+                self.process.stdin.close()
+                await asyncio.wait_for(self.process.wait(), timeout=IRYS_WORKER_DRAIN_TIMEOUT + 5)
+            except Exception:
+                self.process.kill()
+                await self.process.wait()
+        tasks = [task for task in (self._reader_task, self._stderr_task) if task is not None]
+        for task in tasks:
+            task.cancel()
+        # Let the old reader finish before a new process registers requests
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._fail_pending("Irys worker stopped")
+
+    async def request(self, payload: dict, timeout: float) -> dict:
+        if not self.alive:
+            raise RuntimeError(f"Irys worker {self.index} is not running")
+
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+
+        try:
+            line = json.dumps({"id": request_id, **payload}) + "\n"
+            async with self._write_lock:
+                self.process.stdin.write(line.encode())
+                await self.process.stdin.drain()
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def _read_responses(self):
+        try:
+            while True:
+                line = await self.process.stdout.readline()
+                if not line:
+                    break
+                try:
+                    response = json.loads(line.decode())
+                except json.JSONDecodeError:
+                    print(f"🔧 Irys worker {self.index} wrote non-JSON output: {line[:200]!r}")
+                    continue
+
+                future = self.pending.get(response.pop("id", None))
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except Exception as e:
+            print(f"🔧 Irys worker {self.index} reader error: {str(e)}")
+        finally:
+            self._fail_pending(f"Irys worker {self.index} exited")
+
+    async def _drain_stderr(self):
+        while True:
+            line = await self.process.stderr.readline()
+            if not line:
+                break
+            print(f"🔧 [irys worker {self.index}] {line.decode().rstrip()}")
+
+    def _fail_pending(self, message: str):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError(message))
+        self.pending.clear()
+
+
+class IrysWorkerPool:
+    """Fixed-size pool of Irys workers with health checks and automatic respawn."""
+
+    def __init__(self, script_path: str, size: int = IRYS_WORKER_POOL_SIZE,
+                 request_timeout: float = IRYS_WORKER_TIMEOUT,
+                 health_interval: float = IRYS_WORKER_HEALTH_INTERVAL):
+        self.script_path = script_path
+        self.cwd = os.path.dirname(script_path)
+        self.size = max(1, size)
+        self.request_timeout = request_timeout
+        self.health_interval = health_interval
+        self.workers = []
+        self.started = False
+        self._start_lock = None
+        self._health_task = None
+
+    async def start(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+
+        async with self._start_lock:
+            if self.started:
+                return
+            if not os.path.exists(self.script_path):
+                raise Exception(f"Irys service file not found at: {self.script_path}")
+
+            self.workers = [IrysWorker(self.script_path, self.cwd, i) for i in range(self.size)]
+            try:
+                for worker in self.workers:
+                    await worker.start()
+            except Exception:
+                for worker in self.workers:
+                    await worker.stop()
+                raise
+
+            self._health_task = asyncio.create_task(self._health_loop())
+            self.started = True
+            print(f"Irys worker pool started with {self.size} workers")
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for worker in self.workers:
+            await worker.stop()
+        self.workers = []
+        self.started = False
+
+    async def call(self, action: str, data=None, tags=None, timeout: Optional[float] = None) -> dict:
+        """Send one request to the least busy live worker and return its response."""
+        if not self.started:
+            await self.start()
+
+        worker = await self._pick_worker()
+        return await worker.request(
+            {"action": action, "data": data, "tags": tags or []},
+            timeout or self.request_timeout
+        )
+
+    def status(self) -> dict:
+        return {
+            "size": self.size,
+            "started": self.started,
+            "workers": [
+                {
+                    "index": worker.index,
+                    "pid": worker.process.pid if worker.process else None,
+                    "alive": worker.alive,
+                    "restarting": worker.restarting,
+                    "pending": len(worker.pending),
+                    "restarts": worker.restarts
+                }
+                for worker in self.workers
+            ]
+        }
+
+    async def _pick_worker(self) -> IrysWorker:
+        live = [worker for worker in self.workers if worker.available]
+        if not live:
+            # Every worker died between health checks - respawn them inline.
+            # Concurrent callers share each worker's respawn instead of repeating it.
+            await asyncio.gather(*(self._respawn(worker) for worker in self.workers))
+            live = [worker for worker in self.workers if worker.available]
+            if not live:
+                raise RuntimeError("No Irys workers available")
+        return min(live, key=lambda worker: len(worker.pending))
+
+    async def _respawn(self, worker: IrysWorker, drain: bool = True):
+        """Replace a worker's process, once, however many callers ask at the same time."""
+        restarts = worker.restarts
+        async with worker._restart_lock:
+            if worker.restarts != restarts and worker.alive:
+                # Someone else respawned it while we waited
+                return
+            worker.restarting = True
+            try:
+                print(f"🔧 Respawning Irys worker {worker.index}")
+                await worker.stop(drain=drain)
+                worker.restarts += 1
+                try:
+                    await worker.start()
+                except Exception as e:
+                    print(f"Failed to respawn Irys worker {worker.index}: {str(e)}")
+            finally:
+                worker.restarting = False
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for worker in list(self.workers):
+                if worker.restarting:
+                    continue
+                if not worker.alive:
+                    await self._respawn(worker)
+                    continue
+                try:
+                    response = await worker.request({"action": "ping"}, timeout=10)
+                    if not response.get("success"):
+                        raise RuntimeError(response.get("error", "ping failed"))
+                except Exception as e:
+                    print(f"🔧 Irys worker {worker.index} failed health check: {str(e)}")
+                    # A hung worker would never drain: kill it rather than wait
+                    await self._respawn(worker, drain=False)
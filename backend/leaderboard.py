@@ -0,0 +1,294 @@
+import os
+import asyncio
+import base64
+import bisect
+import json
+from typing import Dict, List, Optional
+
+# Number of entries kept in memory per board
+LEADERBOARD_SIZE = int(os.environ.get('LEADERBOARD_SIZE', '100'))
+# Boards are rebuilt from Mongo this often to pick up writes from other instances
+LEADERBOARD_REFRESH_INTERVAL = float(os.environ.get('LEADERBOARD_REFRESH_INTERVAL', '300'))
+
+# Modes that get an in-memory board; other modes are always read from Mongo
+DEFAULT_GAME_MODES = ["classic", "sequence", "endurance", "precision"]
+
+# Board key for the unfiltered leaderboard
+ALL_MODES = None
+
+
+def ranking_for(game_mode: Optional[str]):
+    """Return (field, direction) used to rank a board, mirroring the Mongo sort."""
+    if game_mode == "endurance":
+        return "hits_count", -1
+    return "time", 1
+
+
+def sort_spec(game_mode: Optional[str]) -> list:
+    """Mongo sort for a leaderboard; score id breaks ties so pages are stable."""
+    field, direction = ranking_for(game_mode)
+    return [(field, direction), ("id", 1)]
+
+
+def encode_cursor(entry: dict, game_mode: Optional[str]) -> str:
+    """Opaque cursor pointing just past `entry`."""
+    field, _ = ranking_for(game_mode)
+    raw = json.dumps([entry.get(field), entry.get("id")], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Return (value, id) from a cursor. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, entry_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(entry_id, str) or not (value is None or isinstance(value, (int, float))):
+        raise ValueError("Invalid cursor")
+    return value, entry_id
+
+
+def after_filter(game_mode: Optional[str], value, entry_id: str) -> dict:
+    """Mongo filter for rows ranked strictly after (value, id)."""
+    field, direction = ranking_for(game_mode)
+    if value is None:
+        return {field: None, "id": {"$gt": entry_id}}
+
+    clauses = [
+        {field: {"$gt" if direction == 1 else "$lt": value}},
+        {field: value, "id": {"$gt": entry_id}}
+    ]
+    if direction == -1:
+        # Missing values sort last in a descending sort
+        clauses.append({field: None})
+    return {"$or": clauses}
+
+
+def before_filter(game_mode: Optional[str], value, entry_id: str) -> dict:
+    """Mongo filter for rows ranked strictly before (value, id)."""
+    field, direction = ranking_for(game_mode)
+    if value is None:
+        return {"$or": [{field: {"$ne": None}}, {field: None, "id": {"$lt": entry_id}}]}
+
+    return {"$or": [
+        {field: {"$lt" if direction == 1 else "$gt": value}},
+        {field: value, "id": {"$lt": entry_id}}
+    ]}
+
+
+class TopKBoard:
+    """Sorted, bounded list of the best K score rows for one game mode."""
+
+    def __init__(self, game_mode: Optional[str], size: int):
+        self.game_mode = game_mode
+        self.size = size
+        self.field, self.direction = ranking_for(game_mode)
+        self.keys = []
+        self.entries = []
+        self.warm = False
+
+    def sort_key(self, entry: dict):
+        return self.key_for(entry.get(self.field), entry.get("id", ""))
+
+    def key_for(self, value, entry_id: str):
+        # Missing values rank last, like nulls in a descending Mongo sort
+        if value is None:
+            return (1, 0, entry_id)
+        return (0, value * self.direction, entry_id)
+
+    def replace(self, entries: List[dict]):
+        ranked = sorted(entries, key=self.sort_key)[:self.size]
+        self.keys = [self.sort_key(entry) for entry in ranked]
+        self.entries = ranked
+        self.warm = True
+
+    def add(self, entry: dict) -> Optional[tuple]:
+        """Insert entry if it makes the top K.
+
+        Returns (index, dropped entry or None), or None if the board is unchanged.
+        """
+        key = self.sort_key(entry)
+        if len(self.entries) >= self.size and key >= self.keys[-1]:
+            return None
+
+        index = bisect.bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.entries.insert(index, entry)
+        dropped = None
+        if len(self.entries) > self.size:
+            self.keys.pop()
+            dropped = self.entries.pop()
+        return index, dropped
+
+    def remove(self, entry_id: str) -> bool:
+        """Drop an entry by id; a full board is marked cold, since a row below it may now belong."""
+        for index, entry in enumerate(self.entries):
+            if entry.get("id") == entry_id:
+                if len(self.entries) >= self.size:
+                    self.warm = False
+                del self.keys[index]
+                del self.entries[index]
+                return True
+        return False
+
+    def page(self, after: Optional[tuple], limit: int) -> List[dict]:
+        start = 0 if after is None else bisect.bisect_right(self.keys, self.key_for(*after))
+        return self.entries[start:start + limit]
+
+    @property
+    def complete(self) -> bool:
+        # Boards only grow between rebuilds, so a board below capacity holds every row
+        return len(self.entries) < self.size
+
+
+class LeaderboardEngine:
+    """Serves leaderboard reads from memory.
+
+    One TopKBoard per game mode (plus one across all modes) is warmed from
+    Mongo and then updated incrementally from accepted submissions, so reads
+    never touch the database unless they ask for more than the board holds.
+    """
+
+    def __init__(self, collection, projection: dict, size: int = LEADERBOARD_SIZE,
+                 refresh_interval: float = LEADERBOARD_REFRESH_INTERVAL):
+        self.collection = collection
+        self.excluded_fields = {field for field, include in projection.items() if not include}
+        self.projection = projection
+        self.size = max(1, size)
+        self.refresh_interval = refresh_interval
+        self.game_modes = set(DEFAULT_GAME_MODES)
+        self.boards: Dict[Optional[str], TopKBoard] = {}
+        self._warming: Dict[Optional[str], list] = {}
+        # Bumped whenever boards are reloaded from Mongo (which may pick up
+        # writes from other instances), so cached reads can be revalidated
+        self.generation = 0
+        self._refresh_task = None
+
+    async def start(self, game_modes: List[str] = DEFAULT_GAME_MODES):
+        self.game_modes = set(game_modes)
+        await self.warm_all(game_modes)
+        if self._refresh_task is None and self.refresh_interval > 0:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    async def warm_all(self, game_modes: List[str]):
+        modes = [ALL_MODES] + [mode for mode in game_modes if mode is not ALL_MODES]
+        for mode in modes:
+            try:
+                await self.warm(mode)
+            except Exception as e:
+                print(f"Failed to warm leaderboard for {mode or 'all modes'}: {e}")
+        print(f"Leaderboard warmed for {len(modes)} boards")
+
+    async def warm(self, game_mode: Optional[str]):
+        board = self._board(game_mode)
+        filter_query = {"game_mode": game_mode} if game_mode is not ALL_MODES else {}
+
+        # Submissions accepted while the query runs are replayed on top of its result
+        self._warming[game_mode] = []
+        try:
+            cursor = self.collection.find(filter_query, self.projection).sort(sort_spec(game_mode)).limit(self.size)
+            rows = await cursor.to_list(length=self.size)
+            board.replace(rows)
+            for entry in self._warming[game_mode]:
+                if not any(row.get("id") == entry.get("id") for row in board.entries):
+                    board.add(entry)
+            self.generation += 1
+        finally:
+            self._warming.pop(game_mode, None)
+
+    def add(self, score_doc: dict) -> List[dict]:
+        """Record an accepted score.
+
+        Returns one change per board the score entered, with its 1-based rank
+        and the id of the entry it pushed off the board, if any.
+        """
+        entry = {key: value for key, value in score_doc.items() if key not in self.excluded_fields}
+        changes = []
+        for mode in (ALL_MODES, entry.get("game_mode", "classic")):
+            if mode in self._warming:
+                self._warming[mode].append(entry)
+            board = self.boards.get(mode)
+            if board is None or not board.warm:
+                continue
+            placed = board.add(entry)
+            if placed is not None:
+                index, dropped = placed
+                changes.append({
+                    "game_mode": mode,
+                    "rank": index + 1,
+                    "entry": entry,
+                    "removed_id": dropped.get("id") if dropped else None
+                })
+        return changes
+
+    async def get(self, game_mode: Optional[str], limit: int,
+                  after: Optional[tuple] = None) -> Optional[List[dict]]:
+        """Return up to `limit` rows ranked after the `after` (value, id) key.
+
+        Returns None if the request can't be served from memory, i.e. the page
+        runs past the end of a board that does not hold every row.
+        """
+        # Unknown modes are not cached so arbitrary query strings can't grow memory
+        if limit > self.size or (game_mode is not ALL_MODES and game_mode not in self.game_modes):
+            return None
+
+        board = self.boards.get(game_mode)
+        if board is None or not board.warm:
+            await self.warm(game_mode)
+            board = self.boards[game_mode]
+
+        rows = board.page(after, limit)
+        if len(rows) < limit and not board.complete:
+            return None
+        return rows
+
+    def remove(self, score_doc: dict) -> bool:
+        """Take back a score that was added but never stored."""
+        removed = False
+        for mode in (ALL_MODES, score_doc.get("game_mode", "classic")):
+            warming = self._warming.get(mode)
+            if warming is not None:
+                warming[:] = [entry for entry in warming if entry.get("id") != score_doc["id"]]
+            board = self.boards.get(mode)
+            if board is not None and board.remove(score_doc["id"]):
+                removed = True
+        return removed
+
+    def update_verification(self, score_id: str, verified: bool, state: str):
+        """Reflect a background verification result in any cached rows."""
+        for board in self.boards.values():
+            for entry in board.entries:
+                if entry.get("id") == score_id:
+                    entry["verified"] = verified
+                    entry["verification_state"] = state
+
+    def status(self) -> dict:
+        return {
+            "size": self.size,
+            "boards": {
+                (mode or "all"): len(board.entries)
+                for mode, board in self.boards.items() if board.warm
+            }
+        }
+
+    def _board(self, game_mode: Optional[str]) -> TopKBoard:
+        board = self.boards.get(game_mode)
+        if board is None:
+            board = TopKBoard(game_mode, self.size)
+            self.boards[game_mode] = board
+        return board
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            for mode in list(self.boards):
+                try:
+                    await self.warm(mode)
+                except Exception as e:
+                    print(f"Failed to refresh leaderboard for {mode or 'all modes'}: {e}")
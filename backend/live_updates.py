@@ -0,0 +1,98 @@
+import os
+import asyncio
+import json
+from typing import Dict, Optional, Set
+
+# Events buffered per subscriber before it is told to resync instead
+LIVE_QUEUE_SIZE = int(os.environ.get('LIVE_QUEUE_SIZE', '32'))
+# Seconds between keep-alive comments on idle streams
+LIVE_KEEPALIVE_INTERVAL = float(os.environ.get('LIVE_KEEPALIVE_INTERVAL', '15'))
+
+_RESYNC_MESSAGE = "event: resync\ndata: {}\n\n"
+
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class Subscriber:
+    """One connected client with its own bounded outbox."""
+
+    def __init__(self, game_mode: Optional[str], queue_size: int):
+        self.game_mode = game_mode
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A slow client never holds up the producer: throw away its backlog
+            # and tell it to refetch the board instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(_RESYNC_MESSAGE)
+
+
+class LeaderboardBroadcaster:
+    """Fans leaderboard changes out to Server-Sent Events subscribers.
+
+    Each change is serialized once and then offered to every subscriber of
+    the affected board. Subscribers that fall behind by more than their queue
+    size get a single `resync` event rather than an unbounded backlog.
+    """
+
+    def __init__(self, queue_size: int = LIVE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: Dict[Optional[str], Set[Subscriber]] = {}
+        self.events_published = 0
+
+    def subscribe(self, game_mode: Optional[str]) -> Subscriber:
+        subscriber = Subscriber(game_mode, self.queue_size)
+        self.subscribers.setdefault(game_mode, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self.subscribers.get(subscriber.game_mode)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[subscriber.game_mode]
+
+    def publish(self, game_mode: Optional[str], event: str, data: dict):
+        subscribers = self.subscribers.get(game_mode)
+        if not subscribers:
+            return
+        message = format_event(event, data)
+        for subscriber in subscribers:
+            subscriber.offer(message)
+        self.events_published += 1
+
+    def publish_everywhere(self, event: str, data: dict):
+        message = format_event(event, data)
+        for subscribers in self.subscribers.values():
+            for subscriber in subscribers:
+                subscriber.offer(message)
+        self.events_published += 1
+
+    def status(self) -> dict:
+        return {
+            "subscribers": sum(len(subscribers) for subscribers in self.subscribers.values()),
+            "events_published": self.events_published
+        }
+
+    async def stream(self, request, subscriber: Subscriber, snapshot: dict):
+        """Async generator of SSE messages for one client, starting with a snapshot."""
+        try:
+            yield format_event("snapshot", snapshot)
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), timeout=LIVE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    message = ": keep-alive\n\n"
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
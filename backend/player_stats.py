@@ -0,0 +1,396 @@
+import re
+import uuid
+from datetime import datetime, date, timedelta
+from typing import Optional
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+# Marker document ids in the migrations collection
+BACKFILL_MIGRATION_ID = "player_stats_v1"
+STREAK_BACKFILL_MIGRATION_ID = "player_streaks_v1"
+
+# Bulk write size used while backfilling
+_BACKFILL_BATCH = 1000
+# How long a running backfill owns its migration before another instance may take over
+MIGRATION_LEASE = timedelta(minutes=10)
+# Consecutive days of play that unlock the streak_legend achievement
+STREAK_LEGEND_DAYS = 7
+
+_UNSAFE_KEY_CHARS = re.compile(r"[.$]")
+
+
+def mode_key(game_mode: Optional[str]) -> str:
+    """Game modes become field names under games_by_mode, so strip path characters."""
+    return _UNSAFE_KEY_CHARS.sub("_", game_mode or "classic")
+
+
+def utc_day(moment: datetime) -> int:
+    """Days since the Unix epoch for a naive UTC datetime."""
+    return (moment.date() - date(1970, 1, 1)).days
+
+
+def _increment(field: str, amount):
+    return {"$add": [{"$ifNull": [f"${field}", 0]}, amount]}
+
+
+def current_streak(stats: dict, today: Optional[int] = None) -> int:
+    """The run ending on the last active day only counts if it reaches today or yesterday."""
+    last_active_day = stats.get("last_active_day")
+    if last_active_day is None:
+        return 0
+    if today is None:
+        today = utc_day(datetime.utcnow())
+    return stats.get("streak_run", 0) if last_active_day >= today - 1 else 0
+
+
+def streak_runs(days) -> tuple:
+    """Return (last_day, run ending on last_day, best run) for a set of active days."""
+    ordered = sorted(set(days))
+    best = run = 0
+    previous = None
+    for day in ordered:
+        run = run + 1 if previous is not None and day == previous + 1 else 1
+        best = max(best, run)
+        previous = day
+    return previous, run, best
+
+
+def _guarded_update(player: str, migration_id: str, *stages: dict) -> UpdateOne:
+    """Apply the $set stages to a player's document unless migration_id was already applied.
+
+    Every field is wrapped in a $cond on the document's `migrations` list and
+    the id is added in the same atomic update, so each player gets a given
+    backfill exactly once however many times it runs.
+    """
+    # `migrations` only changes in the last stage, so every stage sees the original list
+    applied = {"$in": [migration_id, {"$ifNull": ["$migrations", []]}]}
+    pipeline = [
+        {"$set": {
+            field: {"$cond": [applied, f"${field}", expression]}
+            for field, expression in stage.items()
+        }}
+        for stage in stages
+    ]
+    pipeline.append({"$set": {"migrations": {"$setUnion": [{"$ifNull": ["$migrations", []]}, [migration_id]]}}})
+    return UpdateOne({"player": player}, pipeline, upsert=True)
+
+
+class PlayerStatsStore:
+    """Per-player aggregates kept up to date with atomic $inc/$min/$max updates.
+
+    Each accepted score adjusts the player's document in place, so reading a
+    player's stats is a single indexed lookup instead of a scan of their history.
+    """
+
+    def __init__(self, collection, migrations_collection):
+        self.collection = collection
+        self.migrations_collection = migrations_collection
+        self.instance_id = uuid.uuid4().hex
+        # Set once both backfills are known to be complete
+        self._ready = False
+
+    async def ready(self) -> bool:
+        """Whether the stats documents are complete, i.e. every backfill has finished."""
+        if not self._ready:
+            done = await self.migrations_collection.count_documents({
+                "_id": {"$in": [BACKFILL_MIGRATION_ID, STREAK_BACKFILL_MIGRATION_ID]},
+                "completed_at": {"$exists": True}
+            })
+            self._ready = done == 2
+        return self._ready
+
+    async def aggregate(self, player: str, scores_collection, achievements_collection) -> Optional[dict]:
+        """A stats document computed from the player's history, for use until ready()."""
+        stats = None
+        days = set()
+        cursor = scores_collection.find(
+            {"player": player},
+            {"_id": 0, "time": 1, "penalty": 1, "game_mode": 1, "timestamp": 1, "created_at": 1}
+        )
+        async for score_doc in cursor:
+            if stats is None:
+                stats = {"player": player, "total_games": 0, "timed_games": 0, "time_sum": 0,
+                         "best_time": None, "games_by_mode": {}, "last_played": None}
+            stats["total_games"] += 1
+            mode = mode_key(score_doc.get("game_mode"))
+            stats["games_by_mode"][mode] = stats["games_by_mode"].get(mode, 0) + 1
+            if not score_doc.get("penalty", False):
+                stats["timed_games"] += 1
+                stats["time_sum"] += score_doc["time"]
+                if stats["best_time"] is None or score_doc["time"] < stats["best_time"]:
+                    stats["best_time"] = score_doc["time"]
+            if score_doc.get("timestamp") and (stats["last_played"] is None or score_doc["timestamp"] > stats["last_played"]):
+                stats["last_played"] = score_doc["timestamp"]
+            if score_doc.get("created_at"):
+                days.add(utc_day(score_doc["created_at"]))
+        if stats is None:
+            return None
+
+        if days:
+            stats["last_active_day"], stats["streak_run"], stats["streak_best"] = streak_runs(days)
+        if achievements_collection is not None:
+            stats["total_achievements"] = await achievements_collection.count_documents({"player": player})
+        return stats
+
+    async def _claim_migration(self, migration_id: str) -> Optional[datetime]:
+        """Take (or renew) the lease on a migration; returns its cutoff, or None.
+
+        None means the migration is complete or another instance holds a live
+        lease. The cutoff is fixed when the migration is first claimed, so a
+        run resumed after a crash aggregates exactly the same history.
+        """
+        now = datetime.utcnow()
+        try:
+            doc = await self.migrations_collection.find_one_and_update(
+                {
+                    "_id": migration_id,
+                    "completed_at": {"$exists": False},
+                    "$or": [
+                        {"owner": self.instance_id},
+                        {"lease_until": {"$exists": False}},
+                        {"lease_until": {"$lt": now}}
+                    ]
+                },
+                {
+                    "$set": {"owner": self.instance_id, "lease_until": now + MIGRATION_LEASE},
+                    "$setOnInsert": {"cutoff": now}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The marker exists but did not match: completed, or leased elsewhere
+            return None
+        return doc["cutoff"]
+
+    async def _complete_migration(self, migration_id: str):
+        await self.migrations_collection.update_one(
+            {"_id": migration_id},
+            {"$set": {"completed_at": datetime.utcnow()}, "$unset": {"owner": "", "lease_until": ""}}
+        )
+
+    async def _write_backfill(self, migration_id: str, operations: list):
+        """Apply a batch of guarded backfill updates and renew the lease."""
+        await self.collection.bulk_write(operations, ordered=False)
+        await self._claim_migration(migration_id)
+
+    async def record_score(self, score_doc: dict) -> bool:
+        """Fold one score into the player's aggregates with a single atomic update.
+
+        Returns whether the player's run now reaches STREAK_LEGEND_DAYS without
+        the achievement marked, so callers only look for legends when needed.
+        """
+        stats = await self.collection.find_one_and_update(
+            *self._score_update(score_doc),
+            projection={"_id": 0, "streak_run": 1, "streak_legend": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return stats.get("streak_run", 0) >= STREAK_LEGEND_DAYS and not stats.get("streak_legend", False)
+
+    async def record_scores(self, score_docs: list):
+        """Fold many scores in with one ordered bulk write (same-player updates apply in order)."""
+        if score_docs:
+            await self.collection.bulk_write(
+                [UpdateOne(*self._score_update(score_doc), upsert=True) for score_doc in score_docs],
+                ordered=True
+            )
+
+    def _score_update(self, score_doc: dict) -> tuple:
+        """(filter, pipeline update) folding one score into the player's document.
+
+        Streaks are kept as (last_active_day, streak_run, streak_best), where
+        streak_run is the length of the run of consecutive UTC days ending on
+        last_active_day, so each update and each read is O(1).
+        """
+        day = utc_day(score_doc["created_at"])
+        mode_field = f"games_by_mode.{mode_key(score_doc.get('game_mode'))}"
+
+        counters = {
+            "total_games": _increment("total_games", 1),
+            mode_field: _increment(mode_field, 1),
+            "last_played": {"$max": ["$last_played", score_doc["timestamp"]]},
+            "streak_run": {"$switch": {
+                "branches": [
+                    # Already counted today (or an out-of-order older day)
+                    {"case": {"$gte": [{"$ifNull": ["$last_active_day", -1]}, day]}, "then": "$streak_run"},
+                    # Played yesterday - the run continues
+                    {"case": {"$eq": ["$last_active_day", day - 1]}, "then": {"$add": ["$streak_run", 1]}}
+                ],
+                "default": 1
+            }}
+        }
+
+        # Penalised attempts count as games but not towards best/average time
+        if not score_doc.get("penalty", False):
+            counters["timed_games"] = _increment("timed_games", 1)
+            counters["time_sum"] = _increment("time_sum", score_doc["time"])
+            counters["best_time"] = {"$min": ["$best_time", score_doc["time"]]}
+
+        return (
+            {"player": score_doc["player"]},
+            [
+                {"$set": counters},
+                {"$set": {
+                    "streak_best": {"$max": ["$streak_best", "$streak_run"]},
+                    "last_active_day": {"$max": ["$last_active_day", day]}
+                }}
+            ]
+        )
+
+    async def streak_legends(self, players) -> list:
+        """Players whose current run has reached STREAK_LEGEND_DAYS and who are not marked yet."""
+        cursor = self.collection.find(
+            {"player": {"$in": list(set(players))}, "streak_run": {"$gte": STREAK_LEGEND_DAYS}, "streak_legend": {"$ne": True}},
+            {"_id": 0, "player": 1}
+        )
+        return [doc["player"] for doc in await cursor.to_list(length=None)]
+
+    async def mark_streak_legend(self, player: str):
+        await self.collection.update_one({"player": player}, {"$set": {"streak_legend": True}})
+
+    async def record_achievement(self, player: str):
+        await self.collection.update_one(
+            {"player": player},
+            {"$inc": {"total_achievements": 1}},
+            upsert=True
+        )
+
+    async def get(self, player: str) -> Optional[dict]:
+        return await self.collection.find_one({"player": player}, {"_id": 0})
+
+    async def backfill(self, scores_collection, achievements_collection):
+        """One-off migration that builds stats documents from existing history.
+
+        Only scores created before the migration's cutoff are aggregated, and
+        the results are added to whatever live submissions have recorded
+        since, so those are neither lost nor counted twice.
+
+        Safe to re-run: the cutoff is stored with the lease, and each player's
+        document records the migration that was folded into it, so a resumed
+        or concurrent run never adds the same history to a player twice.
+        """
+        cutoff = await self._claim_migration(BACKFILL_MIGRATION_ID)
+        if cutoff is None:
+            return
+
+        print("Backfilling player_stats from score history...")
+
+        not_penalised = {"$ne": ["$penalty", True]}
+        cursor = scores_collection.aggregate([
+            {"$match": {"created_at": {"$lte": cutoff}}},
+            {"$group": {
+                "_id": {"player": "$player", "mode": {"$ifNull": ["$game_mode", "classic"]}},
+                "games": {"$sum": 1},
+                "timed_games": {"$sum": {"$cond": [not_penalised, 1, 0]}},
+                "time_sum": {"$sum": {"$cond": [not_penalised, "$time", 0]}},
+                "best_time": {"$min": {"$cond": [not_penalised, "$time", None]}},
+                "last_played": {"$max": "$timestamp"}
+            }}
+        ], allowDiskUse=True)
+
+        players = {}
+        async for row in cursor:
+            player = row["_id"]["player"]
+            stats = players.setdefault(player, {
+                "inc": {"total_games": 0, "timed_games": 0, "time_sum": 0},
+                "best_time": None,
+                "last_played": None
+            })
+            stats["inc"]["total_games"] += row["games"]
+            stats["inc"]["timed_games"] += row["timed_games"]
+            stats["inc"]["time_sum"] += row["time_sum"]
+            key = f"games_by_mode.{mode_key(row['_id']['mode'])}"
+            stats["inc"][key] = stats["inc"].get(key, 0) + row["games"]
+            if row["best_time"] is not None and (stats["best_time"] is None or row["best_time"] < stats["best_time"]):
+                stats["best_time"] = row["best_time"]
+            if row["last_played"] is not None and (stats["last_played"] is None or row["last_played"] > stats["last_played"]):
+                stats["last_played"] = row["last_played"]
+
+        if achievements_collection is not None:
+            cursor = achievements_collection.aggregate([
+                {"$match": {"unlocked_at": {"$lte": cutoff.isoformat()}}},
+                {"$group": {"_id": "$player", "count": {"$sum": 1}}}
+            ])
+            async for row in cursor:
+                stats = players.setdefault(row["_id"], {"inc": {}, "best_time": None, "last_played": None})
+                stats["inc"]["total_achievements"] = row["count"]
+
+        operations = []
+        for player, stats in players.items():
+            merged = {field: _increment(field, amount) for field, amount in stats["inc"].items()}
+            if stats["best_time"] is not None:
+                merged["best_time"] = {"$min": ["$best_time", stats["best_time"]]}
+            if stats["last_played"] is not None:
+                merged["last_played"] = {"$max": ["$last_played", stats["last_played"]]}
+            operations.append(_guarded_update(player, BACKFILL_MIGRATION_ID, merged))
+
+            if len(operations) >= _BACKFILL_BATCH:
+                await self._write_backfill(BACKFILL_MIGRATION_ID, operations)
+                operations = []
+        if operations:
+            await self._write_backfill(BACKFILL_MIGRATION_ID, operations)
+
+        await self._complete_migration(BACKFILL_MIGRATION_ID)
+        print(f"Backfilled player_stats for {len(players)} players")
+
+    async def backfill_streaks(self, scores_collection):
+        """One-off migration that derives streak fields from existing score history.
+
+        Active days before the cutoff are collected per player and reduced to
+        (last_active_day, streak_run, streak_best). These are merged with any
+        run recorded live since the cutoff: if the live run starts no later
+        than the day after the historical one ends, the two runs join.
+        Re-runs are guarded the same way as backfill().
+        """
+        cutoff = await self._claim_migration(STREAK_BACKFILL_MIGRATION_ID)
+        if cutoff is None:
+            return
+
+        print("Backfilling player streaks from score history...")
+
+        cursor = scores_collection.aggregate([
+            {"$match": {"created_at": {"$lte": cutoff}}},
+            {"$group": {
+                "_id": {
+                    "player": "$player",
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}
+                }
+            }}
+        ], allowDiskUse=True)
+
+        days_by_player = {}
+        async for row in cursor:
+            day = utc_day(datetime.strptime(row["_id"]["day"], "%Y-%m-%d"))
+            days_by_player.setdefault(row["_id"]["player"], []).append(day)
+
+        operations = []
+        for player, days in days_by_player.items():
+            last_day, run, best = streak_runs(days)
+            run_start = last_day - run + 1
+            live_start = {"$add": [{"$subtract": ["$last_active_day", "$streak_run"]}, 1]}
+            merged_run = {"$cond": [
+                {"$eq": [{"$ifNull": ["$last_active_day", None]}, None]},
+                run,
+                {"$cond": [
+                    {"$and": [
+                        {"$lte": [live_start, last_day + 1]},
+                        {"$gte": ["$last_active_day", last_day]}
+                    ]},
+                    {"$add": [{"$subtract": ["$last_active_day", run_start]}, 1]},
+                    {"$cond": [{"$gt": ["$last_active_day", last_day]}, "$streak_run", run]}
+                ]}
+            ]}
+            operations.append(_guarded_update(player, STREAK_BACKFILL_MIGRATION_ID, {"streak_run": merged_run}, {
+                "streak_best": {"$max": ["$streak_best", "$streak_run", best]},
+                "last_active_day": {"$max": ["$last_active_day", last_day]}
+            }))
+
+            if len(operations) >= _BACKFILL_BATCH:
+                await self._write_backfill(STREAK_BACKFILL_MIGRATION_ID, operations)
+                operations = []
+        if operations:
+            await self._write_backfill(STREAK_BACKFILL_MIGRATION_ID, operations)
+
+        await self._complete_migration(STREAK_BACKFILL_MIGRATION_ID)
+        print(f"Backfilled streaks for {len(days_by_player)} players")
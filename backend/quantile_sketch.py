@@ -0,0 +1,372 @@
+import os
+import math
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from leaderboard import ranking_for, DEFAULT_GAME_MODES, ALL_MODES
+
+# Relative accuracy of reported quantiles (0.01 = within 1%)
+SKETCH_RELATIVE_ACCURACY = float(os.environ.get('SKETCH_RELATIVE_ACCURACY', '0.01'))
+# How often dirty sketches are written back to Mongo (seconds)
+SKETCH_PERSIST_INTERVAL = float(os.environ.get('SKETCH_PERSIST_INTERVAL', '60'))
+
+REPORTED_PERCENTILES = [10, 25, 50, 75, 90, 95, 99]
+HISTOGRAM_BINS = 20
+
+# Document id used for the all-modes sketch
+_ALL_MODES_KEY = "all"
+
+
+class DDSketch:
+    """Streaming quantile sketch with relative-error guarantees (DDSketch).
+
+    Values are counted in logarithmically sized buckets, so memory depends on
+    the range of values rather than how many were added, and every query walks
+    at most a few hundred buckets.
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float, count: int = 1):
+        if value <= 0:
+            self.zero_count += count
+        else:
+            index = self._index(value)
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def remove(self, value: float, count: int = 1):
+        """Take back values added earlier; min and max are not narrowed."""
+        if value <= 0:
+            self.zero_count = max(0, self.zero_count - count)
+        else:
+            index = self._index(value)
+            remaining = self.bins.get(index, 0) - count
+            if remaining > 0:
+                self.bins[index] = remaining
+            else:
+                self.bins.pop(index, None)
+        self.count = max(0, self.count - count)
+
+    def merge(self, other: "DDSketch"):
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        for bound in (other.min, other.max):
+            if bound is not None:
+                self.min = bound if self.min is None else min(self.min, bound)
+                self.max = bound if self.max is None else max(self.max, bound)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def count_at_most(self, value: float) -> int:
+        """Approximate number of values <= value (values in value's bucket count)."""
+        if value <= 0:
+            return self.zero_count if value == 0 else 0
+        limit = self._index(value)
+        return self.zero_count + sum(count for index, count in self.bins.items() if index <= limit)
+
+    def count_below(self, value: float) -> int:
+        """Approximate number of values < value (values in value's bucket don't count)."""
+        if value <= 0:
+            return 0
+        limit = self._index(value)
+        return self.zero_count + sum(count for index, count in self.bins.items() if index < limit)
+
+    def histogram(self, bins: int = HISTOGRAM_BINS) -> list:
+        if self.count == 0:
+            return []
+
+        width = (self.max - self.min) / bins or 1
+        counts = [0] * bins
+        counts[0] += self.zero_count if self.min <= 0 else 0
+        for index, count in self.bins.items():
+            value = min(max(self._value(index), self.min), self.max)
+            counts[min(int((value - self.min) / width), bins - 1)] += count
+
+        return [
+            {
+                "start": round(self.min + i * width, 2),
+                "end": round(self.min + (i + 1) * width, 2),
+                "count": counts[i]
+            }
+            for i in range(bins)
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "bins": {str(index): count for index, count in self.bins.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "min": self.min,
+            "max": self.max
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DDSketch":
+        sketch = cls(data.get("relative_accuracy", SKETCH_RELATIVE_ACCURACY))
+        # Buckets emptied by retractions stay behind as zero counters in Mongo
+        sketch.bins = {int(index): count for index, count in data.get("bins", {}).items() if count > 0}
+        sketch.zero_count = data.get("zero_count", 0)
+        sketch.count = data.get("count", 0)
+        sketch.min = data.get("min")
+        sketch.max = data.get("max")
+        return sketch
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _value(self, index: int) -> float:
+        # Midpoint (in relative terms) of the bucket (gamma^(i-1), gamma^i]
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+
+class ScoreDistribution:
+    """Per-mode sketches of the ranking metric, fed from submit_score.
+
+    Sketches are loaded from Mongo at startup. Every instance then writes
+    only what it recorded since its last write, as $inc on the stored bucket
+    counters, so several API instances add up instead of overwriting each
+    other. Each write reads the merged document back, which is how an instance
+    picks up the scores recorded by the others. When a mode has no stored
+    sketch it is rebuilt from scores created before startup; only the first
+    instance to store a rebuilt sketch keeps it.
+    """
+
+    def __init__(self, collection, scores_collection,
+                 persist_interval: float = SKETCH_PERSIST_INTERVAL):
+        self.collection = collection
+        self.scores_collection = scores_collection
+        self.persist_interval = persist_interval
+        self.sketches: Dict[str, DDSketch] = {
+            key: DDSketch() for key in [_ALL_MODES_KEY] + DEFAULT_GAME_MODES
+        }
+        # Per key, what this instance recorded since its last write:
+        # {"bins": {index: delta}, "zero_count": delta, "count": delta, "min", "max"}
+        self._pending: Dict[str, dict] = {}
+        # Scores created before this point are only known through Mongo
+        self._started_at = datetime.utcnow()
+        self._persist_task = None
+
+    async def start(self):
+        missing = []
+        for key in self.sketches:
+            doc = await self.collection.find_one({"_id": key})
+            if doc:
+                if doc.get("min") is None:
+                    # Null sorts below every number, so $min could never replace it
+                    await self.collection.update_one({"_id": key, "min": None}, {"$unset": {"min": "", "max": ""}})
+                self.sketches[key].merge(DDSketch.from_dict(doc))
+            else:
+                missing.append(key)
+
+        if missing:
+            await self._rebuild(missing)
+        if self._persist_task is None and self.persist_interval > 0:
+            self._persist_task = asyncio.create_task(self._persist_loop())
+
+    async def stop(self):
+        if self._persist_task is not None:
+            self._persist_task.cancel()
+            self._persist_task = None
+        await self.persist()
+
+    def record_score(self, score_doc: dict):
+        for key, value in self._values(score_doc):
+            if key in self.sketches:
+                self.sketches[key].add(value)
+                self._track(key, value, 1)
+
+    def retract_score(self, score_doc: dict):
+        """Undo record_score for a score that was never stored (min/max are left as they are)."""
+        for key, value in self._values(score_doc):
+            sketch = self.sketches.get(key)
+            if sketch is not None:
+                sketch.remove(value)
+                self._track(key, value, -1)
+
+    def describe(self, game_mode: Optional[str], value: Optional[float] = None) -> Optional[dict]:
+        key = game_mode or _ALL_MODES_KEY
+        sketch = self.sketches.get(key)
+        if sketch is None:
+            return None
+
+        field, direction = ranking_for(game_mode)
+        result = {
+            "game_mode": game_mode,
+            "metric": field,
+            "higher_is_better": direction == -1,
+            "count": sketch.count,
+            "min": sketch.min,
+            "max": sketch.max,
+            "percentiles": {
+                f"p{p}": sketch.quantile(p / 100) for p in REPORTED_PERCENTILES
+            },
+            "histogram": sketch.histogram()
+        }
+
+        if value is not None and sketch.count:
+            # Share of recorded scores this value beats
+            if direction == 1:
+                beaten = sketch.count - sketch.count_at_most(value)
+            else:
+                beaten = sketch.count_below(value)
+            result["value"] = value
+            result["better_than_percent"] = round(100 * beaten / sketch.count, 2)
+
+        return result
+
+    async def persist(self):
+        """Add this instance's changes to the stored sketches and reload the merged result."""
+        for key in self.sketches:
+            pending = self._pending.pop(key, None)
+            try:
+                if pending is None:
+                    doc = await self.collection.find_one({"_id": key})
+                else:
+                    doc = await self.collection.find_one_and_update(
+                        {"_id": key},
+                        self._increment(pending),
+                        upsert=True,
+                        return_document=ReturnDocument.AFTER
+                    )
+            except Exception as e:
+                if pending is not None:
+                    self._restore(key, pending)
+                print(f"Failed to persist {key} sketch: {e}")
+                continue
+            if doc:
+                self._reload(key, doc)
+
+    def _track(self, key: str, value: float, count: int):
+        pending = self._pending.setdefault(key, {"bins": {}, "zero_count": 0, "count": 0, "min": None, "max": None})
+        sketch = self.sketches[key]
+        if value <= 0:
+            pending["zero_count"] += count
+        else:
+            index = sketch._index(value)
+            pending["bins"][index] = pending["bins"].get(index, 0) + count
+        pending["count"] += count
+        if count > 0:
+            pending["min"] = value if pending["min"] is None else min(pending["min"], value)
+            pending["max"] = value if pending["max"] is None else max(pending["max"], value)
+
+    def _restore(self, key: str, pending: dict):
+        """Put back changes whose write failed, merged with any recorded since."""
+        newer = self._pending.get(key)
+        if newer is None:
+            self._pending[key] = pending
+            return
+        for index, count in newer["bins"].items():
+            pending["bins"][index] = pending["bins"].get(index, 0) + count
+        for field in ("zero_count", "count"):
+            pending[field] += newer[field]
+        for field, pick in (("min", min), ("max", max)):
+            values = [value for value in (pending[field], newer[field]) if value is not None]
+            pending[field] = pick(values) if values else None
+        self._pending[key] = pending
+
+    def _increment(self, pending: dict) -> dict:
+        update = {
+            "$inc": {
+                **{f"bins.{index}": count for index, count in pending["bins"].items() if count},
+                "zero_count": pending["zero_count"],
+                "count": pending["count"]
+            },
+            "$set": {"updated_at": datetime.utcnow()},
+            "$setOnInsert": {"relative_accuracy": SKETCH_RELATIVE_ACCURACY}
+        }
+        if pending["min"] is not None:
+            update["$min"] = {"min": pending["min"]}
+            update["$max"] = {"max": pending["max"]}
+        return update
+
+    def _reload(self, key: str, doc: dict):
+        """Adopt the stored (all-instance) sketch plus whatever was recorded during the write."""
+        sketch = DDSketch.from_dict(doc)
+        pending = self._pending.get(key)
+        if pending is not None:
+            for index, count in pending["bins"].items():
+                remaining = sketch.bins.get(index, 0) + count
+                if remaining > 0:
+                    sketch.bins[index] = remaining
+                else:
+                    sketch.bins.pop(index, None)
+            sketch.zero_count = max(0, sketch.zero_count + pending["zero_count"])
+            sketch.count = max(0, sketch.count + pending["count"])
+            for bound in (pending["min"], pending["max"]):
+                if bound is not None:
+                    sketch.min = bound if sketch.min is None else min(sketch.min, bound)
+                    sketch.max = bound if sketch.max is None else max(sketch.max, bound)
+        self.sketches[key] = sketch
+
+    def _values(self, score_doc: dict):
+        """Yield (sketch key, value) pairs a score contributes to."""
+        game_mode = score_doc.get("game_mode", "classic")
+        field, _ = ranking_for(game_mode)
+        # Penalised (false start) times are not real reaction times
+        if field == "time" and score_doc.get("penalty", False):
+            return
+        value = score_doc.get(field)
+        if value is None:
+            return
+
+        yield game_mode, value
+        # The all-modes sketch only mixes modes ranked by the same metric
+        if field == ranking_for(ALL_MODES)[0]:
+            yield _ALL_MODES_KEY, value
+
+    async def _rebuild(self, keys):
+        print(f"Building score distribution sketches for {', '.join(keys)}...")
+        rebuilt = {key: DDSketch() for key in keys}
+        cursor = self.scores_collection.find(
+            {"created_at": {"$lt": self._started_at}},
+            {"_id": 0, "game_mode": 1, "time": 1, "hits_count": 1, "penalty": 1}
+        )
+        async for score_doc in cursor:
+            for key, value in self._values(score_doc):
+                if key in rebuilt:
+                    rebuilt[key].add(value)
+
+        for key, sketch in rebuilt.items():
+            try:
+                stored = {field: value for field, value in sketch.to_dict().items() if value is not None}
+                await self.collection.insert_one({"_id": key, **stored, "updated_at": datetime.utcnow()})
+            except DuplicateKeyError:
+                # Another instance stored its rebuild first; persist() loads that one
+                continue
+            self.sketches[key].merge(sketch)
+        await self.persist()
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            await self.persist()
@@ -0,0 +1,383 @@
+import os
+import asyncio
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+from blocking_executor import BoundedExecutor, io_executor
+
+# Opt-in: buffer accepted scores and write them with insert_many
+SCORE_WRITE_BEHIND = os.environ.get('SCORE_WRITE_BEHIND', 'false').lower() == 'true'
+# Flush once this many scores are waiting...
+SCORE_BUFFER_BATCH = int(os.environ.get('SCORE_BUFFER_BATCH', '200'))
+# ...or this long after the first one arrived (milliseconds)
+SCORE_BUFFER_FLUSH_MS = float(os.environ.get('SCORE_BUFFER_FLUSH_MS', '200'))
+# Scores held before submissions are refused (Mongo unreachable for too long)
+SCORE_BUFFER_MAX_PENDING = int(os.environ.get('SCORE_BUFFER_MAX_PENDING', '5000'))
+# Directory holding the append-only spool segments; next to this module by
+# default, so a restart from another working directory still finds them
+SCORE_SPOOL_DIR = os.environ.get('SCORE_SPOOL_DIR', str(Path(__file__).parent / 'spool'))
+# fsync every spooled score (survives power loss, not just a process crash)
+SCORE_SPOOL_FSYNC = os.environ.get('SCORE_SPOOL_FSYNC', 'false').lower() == 'true'
+
+_DUPLICATE_KEY = 11000
+
+# Set on buffered scores until on_stored has run for them, so a replay can
+# tell a score stored just before a crash from one that was fully recorded
+BOOKKEEPING_FIELD = "bookkeeping_pending"
+
+# Fields returned when a new score collides with a stored one
+_EXISTING_PROJECTION = {
+    "_id": 0, "id": 1, "player": 1, "tx_id": 1, "idempotency_key": 1,
+    "verified": 1, "verification_state": 1
+}
+
+
+class BufferFullError(Exception):
+    pass
+
+
+class DuplicateScoreError(Exception):
+    """The score's tx_id or (player, idempotency_key) is already taken by `existing`."""
+
+    def __init__(self, existing: dict):
+        super().__init__(f"Score {existing.get('id')} already uses this tx_id or idempotency key")
+        self.existing = existing
+
+
+def unique_keys(score_doc: dict) -> List[tuple]:
+    """The values the unique indexes on scores (other than `id`) hold this score to."""
+    keys = []
+    if score_doc.get("tx_id"):
+        keys.append(("tx_id", score_doc["tx_id"]))
+    if score_doc.get("idempotency_key"):
+        keys.append(("idempotency_key", score_doc["player"], score_doc["idempotency_key"]))
+    return keys
+
+
+def _unique_filter(keys: List[tuple]) -> dict:
+    clauses = []
+    for key in keys:
+        if key[0] == "tx_id":
+            clauses.append({"tx_id": key[1]})
+        else:
+            clauses.append({"player": key[1], "idempotency_key": key[2]})
+    return {"$or": clauses}
+
+
+class _Segment:
+    """One spool file and the scores written to it.
+
+    File methods block and run on the buffer's single spool thread, in order.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.docs: List[dict] = []
+        self.file = None
+
+    def write(self, line: str, fsync: bool):
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(line)
+        self.file.flush()
+        if fsync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class ScoreWriteBuffer:
+    """Write-behind buffer for score inserts with group commit.
+
+    Accepted scores are appended to a local spool file and held in memory,
+    then written with one unordered insert_many when enough are waiting or
+    the flush interval has passed. A spool segment is deleted only once all
+    its scores are in Mongo, and leftover segments are replayed at startup.
+    Replays are safe because the unique index on `id` rejects scores that
+    were already stored; those still carrying BOOKKEEPING_FIELD are handed
+    to `on_stored` again, since the crash came before it ran for them.
+
+    The other unique indexes (tx_id, player + idempotency_key) are checked
+    when a score is added: its keys are claimed in memory and looked up in
+    Mongo before it is accepted. A score Mongo still refuses at flush time
+    (another instance got there first) is handed to `on_rejected` so the
+    caller can take it back out of anything it was already counted in.
+    """
+
+    def __init__(self, collection, spool_dir: str = SCORE_SPOOL_DIR,
+                 batch_size: int = SCORE_BUFFER_BATCH,
+                 flush_ms: float = SCORE_BUFFER_FLUSH_MS,
+                 max_pending: int = SCORE_BUFFER_MAX_PENDING,
+                 fsync: bool = SCORE_SPOOL_FSYNC,
+                 on_stored: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+                 on_rejected: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+                 executor: Optional[BoundedExecutor] = None):
+        self.collection = collection
+        self.spool_dir = Path(spool_dir)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_ms / 1000
+        self.max_pending = max(self.batch_size, max_pending)
+        self.fsync = fsync
+        # Called with the scores each flush actually inserted
+        self.on_stored = on_stored
+        # Called with accepted scores that Mongo refused to store
+        self.on_rejected = on_rejected
+        # One thread, so spool writes, closes and deletes happen in order
+        self.executor = executor or io_executor(1, name="score_spool", max_queue=self.max_pending)
+        # Unique key -> the pending score holding it
+        self._claims: Dict[tuple, dict] = {}
+        self._sealed: List[_Segment] = []
+        self._active: Optional[_Segment] = None
+        self._sequence = 0
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.flushes = 0
+        self.stored = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.last_error = None
+
+    @property
+    def pending(self) -> int:
+        active = len(self._active.docs) if self._active is not None else 0
+        return active + sum(len(segment.docs) for segment in self._sealed)
+
+    async def start(self):
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        await self._replay()
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        segments = self._sealed + ([self._active] if self._active is not None else [])
+        for segment in segments:
+            await self.executor.run(segment.close)
+        self.executor.shutdown()
+        if self.pending:
+            print(f"Score buffer stopped with {self.pending} scores left in the spool")
+
+    async def add(self, score_doc: dict):
+        """Spool a score and queue it for the next group commit.
+
+        Raises DuplicateScoreError if its tx_id or idempotency key is already
+        pending or stored, and BufferFullError if too many scores are waiting.
+        """
+        if self.pending >= self.max_pending:
+            await self.flush()
+            if self.pending >= self.max_pending:
+                raise BufferFullError(f"{self.pending} scores waiting to be stored")
+
+        keys = unique_keys(score_doc)
+        for key in keys:
+            if key in self._claims:
+                raise DuplicateScoreError(self._claims[key])
+        # Claimed before the first await, so a concurrent duplicate sees it
+        for key in keys:
+            self._claims[key] = score_doc
+
+        try:
+            if keys:
+                existing = await self.collection.find_one(_unique_filter(keys), _EXISTING_PROJECTION)
+                if existing:
+                    raise DuplicateScoreError(existing)
+
+            if self._active is None:
+                self._active = _Segment(self._next_path())
+            segment = self._active
+            if self.on_stored is not None:
+                score_doc[BOOKKEEPING_FIELD] = True
+            # In memory first: a flush that seals the segment meanwhile still
+            # inserts the score, and its spool write lands before the close
+            segment.docs.append(score_doc)
+            try:
+                await self.executor.run(segment.write, json_util.dumps(score_doc) + "\n", self.fsync)
+            except BaseException:
+                if score_doc in segment.docs:
+                    segment.docs.remove(score_doc)
+                raise
+        except BaseException:
+            self._release([score_doc])
+            raise
+
+        # The first score of a batch starts the flush timer; a full batch ends it
+        if segment is self._active and (len(segment.docs) == 1 or len(segment.docs) >= self.batch_size):
+            self._wakeup.set()
+
+    def find(self, **fields) -> Optional[dict]:
+        """An accepted but not yet stored score matching all `fields`, if any."""
+        segments = self._sealed + ([self._active] if self._active is not None else [])
+        for segment in segments:
+            for score_doc in segment.docs:
+                if all(score_doc.get(name) == value for name, value in fields.items()):
+                    return score_doc
+        return None
+
+    async def flush(self):
+        async with self._flush_lock:
+            if self._active is not None and self._active.docs:
+                self._sealed.append(self._active)
+                self._active = None
+
+            while self._sealed:
+                segment = self._sealed[0]
+                try:
+                    stored, rejected = await self._insert(segment.docs)
+                except Exception as e:
+                    # Keep the segment (and its spool file) for the next attempt
+                    self.last_error = str(e)
+                    print(f"Score buffer flush failed, {self.pending} scores waiting: {e}")
+                    return
+
+                self._sealed.pop(0)
+                self._release(segment.docs)
+                self.flushes += 1
+                self.stored += len(stored)
+                self.rejected += len(rejected)
+                self.last_error = None
+                for callback, docs in ((self.on_stored, stored), (self.on_rejected, rejected)):
+                    if docs and callback is not None:
+                        try:
+                            await callback(docs)
+                        except Exception as e:
+                            print(f"Score buffer callback {callback.__name__} failed: {e}")
+                        else:
+                            if callback is self.on_stored:
+                                await self._clear_bookkeeping(docs)
+                # Only now: a crash before this point replays the segment
+                await self.executor.run(segment.discard)
+
+    def status(self) -> dict:
+        return {
+            "pending": self.pending,
+            "spool_segments": len(self._sealed) + (1 if self._active is not None else 0),
+            "flushes": self.flushes,
+            "stored": self.stored,
+            "replayed": self.replayed,
+            "rejected": self.rejected,
+            "last_error": self.last_error
+        }
+
+    async def _insert(self, docs: List[dict]):
+        """insert_many the docs; returns (stored, rejected).
+
+        Raises only for failures worth retrying. A duplicate whose `id` is
+        already stored is a replay of this very score: it counts as stored
+        only if its bookkeeping never ran. Any other refused document would
+        fail again, so it is rejected rather than holding the segment back.
+        """
+        # insert_many adds _id to the documents it is given
+        batch = [dict(score_doc) for score_doc in docs]
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            return docs, []
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                raise
+            errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+
+        duplicate_ids = [docs[index]["id"] for index, error in errors.items() if error.get("code") == _DUPLICATE_KEY]
+        already_stored = {}
+        if duplicate_ids:
+            cursor = self.collection.find({"id": {"$in": duplicate_ids}}, {"_id": 0, "id": 1, BOOKKEEPING_FIELD: 1})
+            already_stored = {doc["id"]: doc.get(BOOKKEEPING_FIELD, False) async for doc in cursor}
+
+        inserted, rejected = [], []
+        for index, score_doc in enumerate(docs):
+            error = errors.get(index)
+            if error is None or already_stored.get(score_doc["id"]):
+                inserted.append(score_doc)
+            elif score_doc["id"] not in already_stored:
+                print(f"Dropping buffered score {score_doc.get('id')}: {error.get('errmsg')}")
+                rejected.append(score_doc)
+        return inserted, rejected
+
+    async def _clear_bookkeeping(self, docs: List[dict]):
+        try:
+            await self.collection.update_many(
+                {"id": {"$in": [score_doc["id"] for score_doc in docs]}},
+                {"$unset": {BOOKKEEPING_FIELD: ""}}
+            )
+        except Exception as e:
+            print(f"Failed to clear bookkeeping marker on {len(docs)} scores: {e}")
+
+    def _release(self, docs: List[dict]):
+        for score_doc in docs:
+            for key in unique_keys(score_doc):
+                if self._claims.get(key) is score_doc:
+                    del self._claims[key]
+
+    async def _replay(self):
+        segments = sorted(self.spool_dir.glob("scores-*.spool"))
+        for path in segments:
+            segment = _Segment(path)
+            with open(path, encoding="utf-8") as spool:
+                for line in spool:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        score_doc = json_util.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write
+                        print(f"Skipping unreadable line in {path.name}")
+                        continue
+                    segment.docs.append(score_doc)
+                    for key in unique_keys(score_doc):
+                        self._claims.setdefault(key, score_doc)
+            self._sealed.append(segment)
+            self.replayed += len(segment.docs)
+            self._sequence = max(self._sequence, self._segment_number(path))
+
+        if segments:
+            print(f"Replaying {self.replayed} spooled scores from {len(segments)} segments")
+            await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Give the batch up to the flush interval to fill
+            if self._active is not None and len(self._active.docs) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._batch_full(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self.flush()
+            if self._sealed:
+                # Mongo is failing: back off before retrying
+                await asyncio.sleep(max(self.flush_interval, 1))
+                self._wakeup.set()
+
+    async def _batch_full(self):
+        while self._active is not None and len(self._active.docs) < self.batch_size:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+    def _next_path(self) -> Path:
+        self._sequence += 1
+        return self.spool_dir / f"scores-{self._sequence:012d}.spool"
+
+    @staticmethod
+    def _segment_number(path: Path) -> int:
+        try:
+            return int(path.stem.split("-", 1)[1])
+        except (IndexError, ValueError):
+            return 0
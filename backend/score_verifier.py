@@ -0,0 +1,148 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+
+# Background verification settings
+VERIFIER_BATCH_SIZE = int(os.environ.get('VERIFIER_BATCH_SIZE', '50'))
+VERIFIER_CONCURRENCY = int(os.environ.get('VERIFIER_CONCURRENCY', '8'))
+VERIFIER_MAX_ATTEMPTS = int(os.environ.get('VERIFIER_MAX_ATTEMPTS', '5'))
+VERIFIER_RETRY_DELAY = float(os.environ.get('VERIFIER_RETRY_DELAY', '30'))
+VERIFIER_POLL_INTERVAL = float(os.environ.get('VERIFIER_POLL_INTERVAL', '2'))
+
+# Values of the `verification_state` field on score documents
+STATE_NONE = "none"          # no tx_id submitted
+STATE_PENDING = "pending"    # waiting for the background verifier
+STATE_VERIFIED = "verified"
+STATE_FAILED = "failed"      # gave up after VERIFIER_MAX_ATTEMPTS
+
+
+class ScoreVerifier:
+    """Background task that verifies submitted tx_ids off the request path.
+
+    Pending scores live in Mongo (`verification_state: pending`), so the queue
+    survives restarts. Each pass picks up a batch of due documents, checks
+    their tx_ids with bounded concurrency and writes all outcomes back with a
+    single bulk update. Gateway misses are retried with linear backoff because
+    fresh uploads can take a while to appear on the gateway.
+    """
+
+    def __init__(self, collection, verify_fn, batch_size: int = VERIFIER_BATCH_SIZE,
+                 concurrency: int = VERIFIER_CONCURRENCY,
+                 max_attempts: int = VERIFIER_MAX_ATTEMPTS,
+                 retry_delay: float = VERIFIER_RETRY_DELAY,
+                 poll_interval: float = VERIFIER_POLL_INTERVAL,
+                 on_resolved=None):
+        self.collection = collection
+        self.verify_fn = verify_fn
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        # Called as on_resolved(score_id, verified, state) once a score is settled
+        self.on_resolved = on_resolved
+        self._wakeup = None
+        self._task = None
+        self.verified_count = 0
+        self.failed_count = 0
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """Wake the verifier early after a new pending score was stored."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def status(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "verified": self.verified_count,
+            "failed": self.failed_count,
+            "batch_size": self.batch_size,
+            "concurrency": self.concurrency
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Score verifier error: {e}")
+                processed = 0
+
+            # Keep draining while there is a backlog, otherwise sleep until poked
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def process_batch(self) -> int:
+        now = datetime.utcnow()
+        cursor = self.collection.find(
+            {
+                "verification_state": STATE_PENDING,
+                "verification_next_attempt": {"$lte": now}
+            },
+            {"_id": 0, "id": 1, "tx_id": 1, "verification_attempts": 1}
+        ).sort("verification_next_attempt", 1).limit(self.batch_size)
+        pending = await cursor.to_list(length=self.batch_size)
+        if not pending:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def check(doc):
+            async with semaphore:
+                try:
+                    return await self.verify_fn(doc["tx_id"])
+                except Exception as e:
+                    print(f"Verification of {doc['tx_id']} failed: {e}")
+                    return False
+
+        results = await asyncio.gather(*(check(doc) for doc in pending))
+
+        operations = []
+        resolved = []
+        for doc, verified in zip(pending, results):
+            attempts = doc.get("verification_attempts", 0) + 1
+            if verified:
+                update = {"verified": True, "verification_state": STATE_VERIFIED}
+                self.verified_count += 1
+                resolved.append((doc["id"], True, STATE_VERIFIED))
+            elif attempts >= self.max_attempts:
+                update = {"verified": False, "verification_state": STATE_FAILED}
+                self.failed_count += 1
+                resolved.append((doc["id"], False, STATE_FAILED))
+            else:
+                update = {"verification_next_attempt": now + timedelta(seconds=self.retry_delay * attempts)}
+            update["verification_attempts"] = attempts
+
+            operations.append(UpdateOne(
+                {"id": doc["id"], "verification_state": STATE_PENDING},
+                {"$set": update}
+            ))
+
+        await self.collection.bulk_write(operations, ordered=False)
+
+        if self.on_resolved is not None:
+            for score_id, verified, state in resolved:
+                self.on_resolved(score_id, verified, state)
+
+        return len(pending)
@@ -0,0 +1,245 @@
+import os
+import re
+import time
+import shutil
+import asyncio
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+# Total bytes of screenshots, variants and stats cards kept on disk
+SCREENSHOT_QUOTA_BYTES = int(os.environ.get('SCREENSHOT_QUOTA_BYTES', str(512 * 1024 * 1024)))
+# Files not served for this long (seconds) are removed
+SCREENSHOT_MAX_AGE = float(os.environ.get('SCREENSHOT_MAX_AGE', str(30 * 24 * 3600)))
+# Free disk space always left for everything else on the node
+SCREENSHOT_MIN_FREE_BYTES = int(os.environ.get('SCREENSHOT_MIN_FREE_BYTES', str(100 * 1024 * 1024)))
+# Seconds between background retention passes
+RETENTION_INTERVAL = float(os.environ.get('RETENTION_INTERVAL', '60'))
+# Seconds between writes of a file's last-served time back to its mtime
+SCREENSHOT_ACCESS_RESOLUTION = float(os.environ.get('SCREENSHOT_ACCESS_RESOLUTION', '3600'))
+# An over-quota pass evicts down to this fraction of the quota
+RETENTION_LOW_WATERMARK = 0.9
+
+SCREENSHOT = "screenshot"
+CARD = "card"
+
+_SHARD = re.compile(r"[0-9a-f]{2}")
+
+
+class StorageFull(Exception):
+    pass
+
+
+class ScreenshotRetention:
+    """Keeps screenshot storage under a byte quota and a maximum age.
+
+    Every stored item is one entry in an OrderedDict kept in last-served
+    order. An entry is either a screenshot with its variants, or a stats
+    card. Serving moves the entry to the end in O(1). A background pass
+    evicts from the front: first whatever is older than the max age, then
+    least-recently-served entries until usage is back under the low
+    watermark and enough disk is free. Writes call make_room() first.
+    Eviction then happens before the write, so a share spike cannot fill the
+    disk.
+
+    Last-served times are kept in memory and written back to each file's
+    mtime (off the event loop, at most once per SCREENSHOT_ACCESS_RESOLUTION),
+    so after a restart the scan of modification times restores the LRU order
+    and a file served yesterday is not expired as if it were never served.
+    """
+
+    def __init__(self, store, cards_root: Optional[Path] = None,
+                 quota: int = SCREENSHOT_QUOTA_BYTES,
+                 max_age: float = SCREENSHOT_MAX_AGE,
+                 min_free: int = SCREENSHOT_MIN_FREE_BYTES,
+                 interval: float = RETENTION_INTERVAL,
+                 access_resolution: float = SCREENSHOT_ACCESS_RESOLUTION):
+        self.store = store
+        self.cards_root = Path(cards_root) if cards_root is not None else None
+        self.quota = quota
+        self.max_age = max_age
+        self.min_free = min_free
+        self.interval = interval
+        self.access_resolution = access_resolution
+        # (kind, name) -> [size, last_served, last_persisted], least recently served first
+        self._entries: OrderedDict = OrderedDict()
+        self.usage = 0
+        # Refreshed on every pass and decremented as files are added in between
+        self._disk_free = None
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task = None
+        self.evicted = 0
+        self.evicted_bytes = 0
+        self.expired = 0
+        self.refused = 0
+
+    async def start(self):
+        entries = await asyncio.to_thread(self._scan)
+        for key, size, modified in sorted(entries, key=lambda entry: entry[2]):
+            self._entries[key] = [size, modified, modified]
+            self.usage += size
+        print(f"Screenshot storage: {len(self._entries)} files, {self.usage} bytes")
+        await self.enforce()
+        if self._task is None:
+            self._task = asyncio.create_task(self._retention_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def touch(self, kind: str, name: str) -> bool:
+        """Mark an entry as just served; False if it is not tracked."""
+        entry = self._entries.get((kind, name))
+        if entry is None:
+            return False
+        now = time.time()
+        entry[1] = now
+        self._entries.move_to_end((kind, name))
+        if now - entry[2] >= self.access_resolution:
+            entry[2] = now
+            asyncio.get_running_loop().run_in_executor(None, self._persist_access, self._path(kind, name), now)
+        return True
+
+    def add(self, kind: str, name: str, size: int):
+        """Track a newly written entry, or its new size (e.g. once variants exist)."""
+        entry = self._entries.get((kind, name))
+        grown = size - (entry[0] if entry else 0)
+        # The file was just written, so its mtime is already current
+        now = time.time()
+        self._entries[(kind, name)] = [size, now, now]
+        self._entries.move_to_end((kind, name))
+        self.usage += grown
+        if self._disk_free is not None:
+            self._disk_free -= grown
+        if self._over_limits():
+            self._wake.set()
+
+    def forget(self, kind: str, name: str):
+        """Stop tracking an entry whose files were deleted elsewhere."""
+        entry = self._entries.pop((kind, name), None)
+        if entry is not None:
+            self.usage -= entry[0]
+
+    async def make_room(self, incoming: int):
+        """Evict before a write of up to `incoming` bytes; StorageFull if it still won't fit."""
+        if not self._over_limits(incoming):
+            return
+        await self.enforce(incoming)
+        if self._over_limits(incoming):
+            self.refused += 1
+            raise StorageFull("Screenshot storage is full, try again later")
+
+    async def enforce(self, incoming: int = 0):
+        """Expire old entries, then evict LRU ones until the write fits under the limits."""
+        async with self._lock:
+            self._disk_free = await asyncio.to_thread(self._free_bytes)
+            cutoff = time.time() - self.max_age
+            target = int(self.quota * RETENTION_LOW_WATERMARK) - incoming
+            needed_free = self.min_free + incoming
+
+            victims = []
+            freed = 0
+            for key, (size, served, _) in self._entries.items():
+                expired = served < cutoff
+                if not expired and self.usage - freed <= target and self._disk_free + freed >= needed_free:
+                    break
+                victims.append((key, size))
+                freed += size
+                if expired:
+                    self.expired += 1
+
+            for key, size in victims:
+                del self._entries[key]
+                self.usage -= size
+                try:
+                    await self._delete(*key)
+                except Exception as e:
+                    print(f"Failed to evict {key[1]}: {e}")
+                    continue
+                self._disk_free += size
+                self.evicted += 1
+                self.evicted_bytes += size
+            if victims:
+                print(f"Evicted {len(victims)} screenshot files ({freed} bytes)")
+
+    def status(self) -> dict:
+        return {
+            "files": len(self._entries),
+            "bytes": self.usage,
+            "quota_bytes": self.quota,
+            "used_fraction": round(self.usage / self.quota, 4) if self.quota else None,
+            "disk_free_bytes": self._disk_free,
+            "max_age_seconds": self.max_age,
+            "oldest_served_seconds_ago": round(time.time() - next(iter(self._entries.values()))[1], 1) if self._entries else None,
+            "evicted": self.evicted,
+            "evicted_bytes": self.evicted_bytes,
+            "expired": self.expired,
+            "refused": self.refused
+        }
+
+    def _over_limits(self, incoming: int = 0) -> bool:
+        if self.usage + incoming > self.quota:
+            return True
+        return self._disk_free is not None and self._disk_free - incoming < self.min_free
+
+    def _path(self, kind: str, name: str) -> Path:
+        if kind == SCREENSHOT:
+            return self.store.path_for(name)
+        return self.cards_root / name
+
+    @staticmethod
+    def _persist_access(path: Path, served: float):
+        try:
+            os.utime(path, (served, served))
+        except OSError:
+            # Evicted (or replaced) in the meantime
+            pass
+
+    async def _delete(self, kind: str, name: str):
+        if kind == SCREENSHOT:
+            await self.store.evict(name)
+        else:
+            await asyncio.to_thread((self.cards_root / name).unlink, True)
+
+    def _free_bytes(self) -> int:
+        return shutil.disk_usage(self.store.root).free
+
+    def _scan(self):
+        """(key, size, mtime) for everything on disk; also clears abandoned temp uploads."""
+        entries = []
+        root = self.store.root
+        for path in root.iterdir():
+            if path.name.startswith(".upload-"):
+                path.unlink(missing_ok=True)
+            elif path.is_file() and not path.name.startswith("."):
+                # Flat uploads from before content addressing
+                stat = path.stat()
+                entries.append(((SCREENSHOT, path.name), stat.st_size, stat.st_mtime))
+            elif path.is_dir() and _SHARD.fullmatch(path.name):
+                for shard in path.iterdir():
+                    if not shard.is_dir():
+                        continue
+                    for item in shard.iterdir():
+                        if item.is_file():
+                            stat = item.stat()
+                            size = stat.st_size + sum(self.store.stored_variants(item.name).values())
+                            entries.append(((SCREENSHOT, item.name), size, stat.st_mtime))
+        if self.cards_root is not None and self.cards_root.is_dir():
+            for item in self.cards_root.glob("*.png"):
+                stat = item.stat()
+                entries.append(((CARD, item.name), stat.st_size, stat.st_mtime))
+        return entries
+
+    async def _retention_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.enforce()
+            except Exception as e:
+                print(f"Screenshot retention pass failed: {e}")
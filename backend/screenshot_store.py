@@ -0,0 +1,238 @@
+import os
+import re
+import uuid
+import asyncio
+import hashlib
+import shutil
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import UploadFile
+from pymongo import ReturnDocument
+
+from image_pipeline import sniff_extension, UPLOAD_MEDIA_TYPES
+
+# Largest screenshot accepted (bytes)
+SCREENSHOT_MAX_BYTES = int(os.environ.get('SCREENSHOT_MAX_BYTES', str(5 * 1024 * 1024)))
+# Bytes read from the upload per step
+SCREENSHOT_CHUNK_SIZE = int(os.environ.get('SCREENSHOT_CHUNK_SIZE', str(64 * 1024)))
+SCREENSHOTS_DIR = os.environ.get('SCREENSHOTS_DIR', 'screenshots')
+
+# Content-addressed files never change, so they can be cached forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+
+class ScreenshotTooLarge(Exception):
+    pass
+
+
+def is_content_addressed(filename: str) -> bool:
+    return bool(_DIGEST.fullmatch(filename.split(".", 1)[0]))
+
+
+class ScreenshotStore:
+    """Content-addressed screenshots on local disk.
+
+    Files are named by the SHA-256 of their bytes and sharded two levels deep
+    (ab/cd/abcd....png), so identical share cards are stored once. Each
+    upload of the same content adds a reference instead of a new file.
+    Reference counts live in Mongo when a collection is given, and in memory
+    otherwise.
+
+    Uploads are streamed in chunks to a temporary file off the event loop and
+    hashed on the way; one over the byte cap is abandoned at once. Saving,
+    releasing and evicting the same digest are serialised, so a file is
+    never deleted between an upload finding it and referencing it.
+    """
+
+    def __init__(self, root: str = SCREENSHOTS_DIR, collection=None,
+                 max_bytes: int = SCREENSHOT_MAX_BYTES,
+                 chunk_size: int = SCREENSHOT_CHUNK_SIZE):
+        self.root = Path(root)
+        self.collection = collection
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self._refs: Dict[str, int] = {}
+        # Digest -> [lock, tasks holding or waiting for it]
+        self._locks: Dict[str, list] = {}
+        self.deduplicated = 0
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, filename: str) -> Path:
+        digest = filename.split(".", 1)[0]
+        if _DIGEST.fullmatch(digest):
+            return self.root / digest[:2] / digest[2:4] / filename
+        # Uploads from before content addressing sit flat in the root
+        return self.root / filename
+
+    def variants_dir(self, filename: str) -> Path:
+        """Where transcoded variants of a content-addressed file live (ab/cd/<sha256>/)."""
+        digest = filename.split(".", 1)[0]
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def stored_variants(self, filename: str) -> Dict[str, int]:
+        """Variant name -> size for the variants written so far (blocking)."""
+        variants_dir = self.variants_dir(filename)
+        if not variants_dir.is_dir():
+            return {}
+        return {
+            path.name: path.stat().st_size
+            for path in variants_dir.iterdir()
+            if not path.name.startswith(".")
+        }
+
+    async def save_upload(self, upload: UploadFile) -> dict:
+        """Stream an upload to disk, or reference the copy that is already there.
+
+        The extension comes from the image format Pillow detects, so only
+        whitelisted image types are ever stored. Raises InvalidImage otherwise.
+        Returns the filename, size, sha256, reference count and whether the
+        content was a duplicate.
+        """
+        temp_path, size, digest = await self._stream_to_temp(upload)
+        try:
+            extension = await asyncio.to_thread(sniff_extension, temp_path)
+        except BaseException:
+            await asyncio.to_thread(temp_path.unlink, True)
+            raise
+        filename = f"{digest}.{extension}"
+
+        async with self._locked(digest):
+            existing = await asyncio.to_thread(self._find_existing, digest)
+            if existing is not None:
+                await asyncio.to_thread(temp_path.unlink, True)
+                filename = existing.name
+                self.deduplicated += 1
+            else:
+                final_path = self.path_for(filename)
+                await asyncio.to_thread(final_path.parent.mkdir, parents=True, exist_ok=True)
+                await asyncio.to_thread(os.replace, temp_path, final_path)
+
+            refs = await self._add_ref(digest, filename, size)
+        return {
+            "filename": filename,
+            "size": size,
+            "sha256": digest,
+            "refs": refs,
+            "duplicate": existing is not None
+        }
+
+    async def release(self, filename: str) -> int:
+        """Drop one reference; the file is deleted when none are left."""
+        digest = filename.split(".", 1)[0]
+        async with self._locked(digest):
+            if self.collection is not None:
+                doc = await self.collection.find_one_and_update(
+                    {"_id": digest}, {"$inc": {"refs": -1}}, return_document=ReturnDocument.AFTER
+                )
+                refs = doc["refs"] if doc else 0
+                if refs <= 0:
+                    await self.collection.delete_one({"_id": digest, "refs": {"$lte": 0}})
+            else:
+                refs = self._refs.get(digest, 0) - 1
+                if refs <= 0:
+                    self._refs.pop(digest, None)
+                else:
+                    self._refs[digest] = refs
+
+            if refs <= 0:
+                await self._delete_files(filename)
+        return max(refs, 0)
+
+    async def evict(self, filename: str):
+        """Delete a file, its variants and its references regardless of the count."""
+        digest = filename.split(".", 1)[0]
+        async with self._locked(digest):
+            if self.collection is not None and _DIGEST.fullmatch(digest):
+                await self.collection.delete_one({"_id": digest})
+            self._refs.pop(digest, None)
+            await self._delete_files(filename)
+
+    @asynccontextmanager
+    async def _locked(self, digest: str):
+        entry = self._locks.setdefault(digest, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[digest]
+
+    async def _delete_files(self, filename: str):
+        await asyncio.to_thread(self.path_for(filename).unlink, True)
+        if is_content_addressed(filename):
+            await asyncio.to_thread(shutil.rmtree, self.variants_dir(filename), True)
+            await asyncio.to_thread(self._prune_shard, filename)
+
+    def _prune_shard(self, filename: str):
+        """Remove the ab/cd/ shard directories once they hold nothing else."""
+        shard = self.path_for(filename).parent
+        for directory in (shard, shard.parent):
+            try:
+                directory.rmdir()
+            except OSError:
+                # Not empty (or already gone): leave it
+                return
+
+    def status(self) -> dict:
+        return {"deduplicated": self.deduplicated}
+
+    def _find_existing(self, digest: str) -> Optional[Path]:
+        """The stored file for this digest, whatever image extension it was saved with."""
+        shard = self.root / digest[:2] / digest[2:4]
+        if not shard.is_dir():
+            return None
+        for extension in UPLOAD_MEDIA_TYPES:
+            path = shard / f"{digest}.{extension}"
+            if path.exists():
+                return path
+        return None
+
+    async def _add_ref(self, digest: str, filename: str, size: int) -> int:
+        if self.collection is None:
+            self._refs[digest] = self._refs.get(digest, 0) + 1
+            return self._refs[digest]
+
+        doc = await self.collection.find_one_and_update(
+            {"_id": digest},
+            {
+                "$inc": {"refs": 1},
+                "$set": {"filename": filename, "size": size},
+                "$setOnInsert": {"created_at": datetime.utcnow()}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["refs"]
+
+    async def _stream_to_temp(self, upload: UploadFile):
+        # The multipart parser already knows the size: refuse without copying
+        if upload.size is not None and upload.size > self.max_bytes:
+            raise ScreenshotTooLarge(f"Screenshot is larger than {self.max_bytes} bytes")
+
+        temp_path = self.root / f".upload-{uuid.uuid4().hex}.tmp"
+        sha256 = hashlib.sha256()
+        size = 0
+        output = await asyncio.to_thread(open, temp_path, "wb")
+        try:
+            while True:
+                chunk = await upload.read(self.chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise ScreenshotTooLarge(f"Screenshot is larger than {self.max_bytes} bytes")
+                sha256.update(chunk)
+                await asyncio.to_thread(output.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(output.close)
+            await asyncio.to_thread(temp_path.unlink, True)
+            raise
+        await asyncio.to_thread(output.close)
+        return temp_path, size, sha256.hexdigest()
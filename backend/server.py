@@ -1,24 +1,41 @@
 import os
 import asyncio
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from typing import List, Optional
-import httpx
 from dotenv import load_dotenv
 import json
 import uuid
 from datetime import datetime
 import requests
 from eth_account import Account
-from eth_account.messages import encode_defunct
 import time
 import hashlib
 from irys_sdk import Builder
-import shutil
-from pathlib import Path
+from irys_worker_pool import IrysWorkerPool
+from irys_upload_queue import IrysUploadQueue
+from gateway_client import GatewayClient
+from verification_cache import VerificationCache
+from leaderboard import LeaderboardEngine, DEFAULT_GAME_MODES, sort_spec, encode_cursor, decode_cursor, after_filter, before_filter
+import db_indexes
+from live_updates import LeaderboardBroadcaster
+from fast_json import FAST_JSON_ENABLED, FastJSONResponse, row_shaper
+from http_cache import ResourceVersions, StaticResource, etag_matches, not_modified, leaderboard_cache_control
+from quantile_sketch import ScoreDistribution
+from player_stats import PlayerStatsStore, current_streak
+from blocking_executor import io_executor, Signer, ExecutorBusyError
+from irys_account_cache import IrysAccountCache
+from screenshot_store import ScreenshotStore, ScreenshotTooLarge, is_content_addressed, IMMUTABLE_CACHE_CONTROL
+from image_pipeline import ImagePipeline, InvalidImage, VARIANT_MEDIA_TYPES, UPLOAD_MEDIA_TYPES, FULL_IMAGE_VARIANTS, best_variant
+from stats_card import StatsCardRenderer, is_card_key, share_page, STATS_CARD_MAX_BYTES
+from screenshot_retention import ScreenshotRetention, StorageFull, SCREENSHOT, CARD
+from idempotency import IdempotencyStore, MAX_IDEMPOTENCY_KEY_LENGTH
+from score_buffer import ScoreWriteBuffer, BufferFullError, DuplicateScoreError, BOOKKEEPING_FIELD, SCORE_WRITE_BEHIND
+from score_verifier import ScoreVerifier, STATE_NONE, STATE_PENDING, STATE_VERIFIED, STATE_FAILED
 
 load_dotenv()
 
@@ -38,6 +55,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-Cursor"],  # Leaderboard pagination
 )
 
 # MongoDB connection
@@ -79,20 +97,54 @@ if PRIVATE_KEY or IRYS_PRIVATE_KEY:
 else:
     print("WARNING: IRYS_PRIVATE_KEY not set. Irys operations will be disabled.")
 
+# irys_sdk and eth_account are synchronous, so their calls run off the event loop
+irys_io = io_executor()
+signer = Signer(account) if account else None
+# Balance and upload prices served from memory, refreshed in the background
+irys_account_cache = IrysAccountCache(irys_client, irys_io) if irys_client else None
+# Funding waits for an on-chain transaction
+IRYS_FUND_TIMEOUT = float(os.environ.get('IRYS_FUND_TIMEOUT', '120'))
+
 if MONGO_URL:
     client = AsyncIOMotorClient(MONGO_URL)
     db = client[DB_NAME]
     scores_collection = db.scores
     achievements_collection = db.achievements
     player_stats_collection = db.player_stats
+    verified_transactions_collection = db.verified_transactions
 else:
     client = None
     db = None
     scores_collection = None
     achievements_collection = None
     player_stats_collection = None
+    verified_transactions_collection = None
     print("WARNING: MONGO_URL not set. Database operations will be disabled.")
 
+# Long-lived Node.js workers for Irys uploads (started on app startup)
+irys_worker_pool = IrysWorkerPool(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'irys_service.js')
+)
+
+# Concurrent uploads are coalesced into Irys bundles
+irys_upload_queue = IrysUploadQueue(irys_worker_pool)
+
+# Shared keep-alive client for Irys gateway lookups
+gateway_client = GatewayClient()
+
+# Cache of gateway verification results (positives persisted when Mongo is available)
+verification_cache = VerificationCache(verified_transactions_collection)
+
+# Internal bookkeeping fields that are never returned to clients
+SCORE_PROJECTION = {
+    "_id": 0,
+    "created_at": 0,
+    "verification_attempts": 0,
+    "verification_next_attempt": 0,
+    "idempotency_key": 0,
+    BOOKKEEPING_FIELD: 0
+}
+
 class ScoreSubmission(BaseModel):
     player: str
     username: str
@@ -106,6 +158,12 @@ class ScoreSubmission(BaseModel):
     accuracy: Optional[float] = None  # for precision mode
     sequence_times: Optional[List[int]] = None  # for sequence mode
     total_targets: Optional[int] = None  # for sequence/precision modes
+    # Repeat on retries so the score is only stored once (same as Idempotency-Key)
+    client_nonce: Optional[str] = Field(None, max_length=MAX_IDEMPOTENCY_KEY_LENGTH)
+
+class ScoreBatch(BaseModel):
+    # Items are validated one by one so a bad entry only fails itself
+    scores: List[dict]
 
 class LeaderboardEntry(BaseModel):
     id: str
@@ -116,12 +174,16 @@ class LeaderboardEntry(BaseModel):
     timestamp: str
     tx_id: Optional[str] = None
     verified: bool = False
+    verification_state: Optional[str] = None
     game_mode: str = "classic"
     hits_count: Optional[int] = None
     accuracy: Optional[float] = None
     sequence_times: Optional[List[int]] = None
     total_targets: Optional[int] = None
 
+# Gives trusted leaderboard rows the LeaderboardEntry shape on the fast JSON path
+shape_leaderboard_entry = row_shaper(LeaderboardEntry)
+
 class IrysUploadRequest(BaseModel):
     data: str
     tags: Optional[List[dict]] = None
@@ -152,126 +214,658 @@ class PlayerStats(BaseModel):
     games_by_mode: dict
     last_played: str
 
+# Keeps fire-and-forget startup tasks referenced until they finish
+background_tasks = set()
+
 @app.on_event("startup")
 async def startup_event():
     # Create indexes for efficient queries (only if database is available)
-    if scores_collection is not None:
+    if db is not None:
+        db_indexes.ensure_indexes_in_background(db)
+        for job in (backfill_player_stats(), start_score_distribution()):
+            task = asyncio.create_task(job)
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+    else:
+        print("Database not available - running without persistence")
+
+    await gateway_client.start()
+
+    # Replay spooled scores before the leaderboard is warmed from Mongo
+    if score_buffer is not None:
         try:
-            await scores_collection.create_index([("time", 1)])  # Ascending for best times
-            await scores_collection.create_index([("player", 1)])
-            await scores_collection.create_index([("game_mode", 1)])  # Index for game mode filtering
-            # Create unique index only for non-null tx_id values
-            await scores_collection.create_index([("tx_id", 1)], unique=True, sparse=True)
-            print("Database indexes created successfully")
+            await score_buffer.start()
         except Exception as e:
-            print(f"Failed to create database indexes: {e}")
+            print(f"Failed to start score write buffer: {e}")
+
+    if leaderboard_engine is not None:
+        await leaderboard_engine.start()
+
+    if score_verifier is not None:
+        score_verifier.start()
+
+    if irys_account_cache is not None:
+        await irys_account_cache.start()
+
+    try:
+        await screenshot_retention.start()
+    except Exception as e:
+        print(f"Failed to start screenshot retention: {e}")
+
+    try:
+        await irys_worker_pool.start()
+    except Exception as e:
+        print(f"Failed to start Irys worker pool: {e}")
+
+async def backfill_player_stats():
+    try:
+        await player_stats_store.backfill(scores_collection, achievements_collection)
+        await player_stats_store.backfill_streaks(scores_collection)
+    except Exception as e:
+        print(f"Failed to backfill player stats: {e}")
+
+async def start_score_distribution():
+    try:
+        await score_distribution.start()
+    except Exception as e:
+        print(f"Failed to load score distribution sketches: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if score_buffer is not None:
+        await score_buffer.stop()
+    if score_verifier is not None:
+        await score_verifier.stop()
+    if leaderboard_engine is not None:
+        await leaderboard_engine.stop()
+    if score_distribution is not None:
+        await score_distribution.stop()
+    await irys_upload_queue.drain()
+    if irys_account_cache is not None:
+        await irys_account_cache.stop()
+    await screenshot_retention.stop()
+    await irys_worker_pool.stop()
+    await gateway_client.close()
+    irys_io.shutdown()
+    image_pipeline.shutdown()
+    stats_card_renderer.shutdown()
+    if signer is not None:
+        signer.executor.shutdown()
+
+async def verify_tx_id(tx_id: str) -> bool:
+    """Check that a transaction exists on the gateway, consulting the cache first"""
+    cached = await verification_cache.get(tx_id)
+    if cached is not None:
+        return cached
+    
+    status_code = await gateway_client.check_tx(tx_id)
+    verified = status_code == 200
+    
+    # Only cache definitive answers - gateway errors should be retried
+    if verified or 400 <= status_code < 500:
+        await verification_cache.set(tx_id, verified)
+    
+    return verified
+
+# Per-player aggregates updated on every accepted score
+player_stats_store = PlayerStatsStore(player_stats_collection, db.migrations) if db is not None else None
+
+# Streaming per-mode quantile sketches for percentile lookups
+score_distribution = ScoreDistribution(db.stats_sketches, scores_collection) if db is not None else None
+
+# In-memory top-K boards per game mode, warmed at startup
+leaderboard_engine = LeaderboardEngine(scores_collection, SCORE_PROJECTION) if scores_collection is not None else None
+
+# Pushes leaderboard changes to Server-Sent Events subscribers
+leaderboard_broadcaster = LeaderboardBroadcaster()
+
+# Version counters behind the leaderboard ETags
+resource_versions = ResourceVersions()
+
+def leaderboard_version_key(game_mode: Optional[str]) -> str:
+    # game_mode is client-supplied: only known modes get their own counter,
+    # anything else shares the all-modes one (bumped by every score anyway)
+    if game_mode not in DEFAULT_GAME_MODES:
+        return "leaderboard:all"
+    return f"leaderboard:{game_mode}"
+
+def on_score_verified(score_id: str, verified: bool, state: str):
+    leaderboard_engine.update_verification(score_id, verified, state)
+    resource_versions.bump_all()
+    leaderboard_broadcaster.publish_everywhere("verified", {
+        "id": score_id,
+        "verified": verified,
+        "verification_state": state
+    })
+
+# Background verification of submitted tx_ids (needs the database as its queue)
+score_verifier = ScoreVerifier(
+    scores_collection,
+    verify_tx_id,
+    on_resolved=on_score_verified
+) if scores_collection is not None else None
+
+def build_score_doc(score: ScoreSubmission, idempotency_key: Optional[str] = None) -> dict:
+    """Turn a submission into the document stored in the scores collection"""
+    score_doc = {
+        "id": str(uuid.uuid4()),
+        "player": score.player,
+        "username": score.username,
+        "time": score.time,
+        "penalty": score.penalty,
+        "timestamp": score.timestamp,
+        "verified": False,
+        "created_at": datetime.utcnow(),
+        "game_mode": score.game_mode
+    }
+    
+    # Add mode-specific fields if provided
+    if score.hits_count is not None:
+        score_doc["hits_count"] = score.hits_count
+    if score.accuracy is not None:
+        score_doc["accuracy"] = score.accuracy
+    if score.sequence_times is not None:
+        score_doc["sequence_times"] = score.sequence_times
+    if score.total_targets is not None:
+        score_doc["total_targets"] = score.total_targets
+    
+    # Only add tx_id if it's provided (to avoid null values in unique index)
+    if score.tx_id:
+        score_doc["tx_id"] = score.tx_id
+    
+    # Unique per player, so a retried submission can't be stored twice
+    idempotency_key = idempotency_key or score.client_nonce
+    if idempotency_key:
+        score_doc["idempotency_key"] = idempotency_key
+    
+    return score_doc
+
+async def set_verification_state(score_doc: dict):
+    """Verify the score's tx_id - in the background unless the result is
+    already known, so the response never waits on the gateway"""
+    score_doc["verification_state"] = STATE_NONE
+    tx_id = score_doc.get("tx_id")
+    if not tx_id:
+        return
+    
+    if await verification_cache.get(tx_id):
+        score_doc["verified"] = True
+        score_doc["verification_state"] = STATE_VERIFIED
+    elif score_verifier is not None:
+        score_doc["verification_state"] = STATE_PENDING
+        score_doc["verification_attempts"] = 0
+        score_doc["verification_next_attempt"] = score_doc["created_at"]
     else:
-        print("Database not available - running without persistence")
+        # Without a database there is nothing to update later
+        try:
+            score_doc["verified"] = await verify_tx_id(tx_id)
+        except:
+            score_doc["verified"] = False
+        score_doc["verification_state"] = STATE_VERIFIED if score_doc["verified"] else STATE_FAILED
+
+async def record_accepted_scores(score_docs: List[dict], buffered: bool = False):
+    """Fold accepted scores into the leaderboard, live streams, stats and sketches"""
+    for score_doc in score_docs:
+        resource_versions.bump(leaderboard_version_key(None), leaderboard_version_key(score_doc["game_mode"]))
+        for change in leaderboard_engine.add(score_doc):
+            leaderboard_broadcaster.publish(change["game_mode"], "entry", change)
+        score_distribution.record_score(score_doc)
+    
+    # Buffered scores get the rest once the write buffer has stored them
+    if not buffered:
+        await record_stored_scores(score_docs)
+
+async def record_after_insert(score_docs: List[dict], buffered: bool = False):
+    """record_accepted_scores for scores that are already stored (or spooled).
+
+    A failure is logged rather than raised: an error response would make the
+    client retry and store the score a second time.
+    """
+    try:
+        await record_accepted_scores(score_docs, buffered=buffered)
+    except Exception as e:
+        print(f"Bookkeeping failed for {len(score_docs)} stored scores: {e}")
+
+async def record_stored_scores(score_docs: List[dict]):
+    """Bookkeeping that follows a score into Mongo: player stats and the verifier"""
+    if len(score_docs) == 1:
+        # Single submissions learn from the update itself whether a legend is due
+        if await player_stats_store.record_score(score_docs[0]):
+            await unlock_streak_legends([score_docs[0]["player"]])
+    else:
+        await player_stats_store.record_scores(score_docs)
+        await unlock_streak_legends([score_doc["player"] for score_doc in score_docs])
+    
+    if any(score_doc["verification_state"] == STATE_PENDING for score_doc in score_docs):
+        score_verifier.notify()
+
+async def retract_rejected_scores(score_docs: List[dict]):
+    """Take buffered scores that Mongo refused back off the leaderboards and sketches"""
+    for score_doc in score_docs:
+        resource_versions.bump(leaderboard_version_key(None), leaderboard_version_key(score_doc["game_mode"]))
+        if leaderboard_engine.remove(score_doc):
+            leaderboard_broadcaster.publish_everywhere("removed", {"id": score_doc["id"]})
+        score_distribution.retract_score(score_doc)
+
+# Uploaded share screenshots on local disk, deduplicated by content hash
+screenshot_store = ScreenshotStore(collection=db.screenshots if db is not None else None)
+
+# Transcodes uploads to WebP/AVIF plus a Twitter card and thumbnail
+image_pipeline = ImagePipeline()
+
+# Renders stats_card_v1 share images, cached by the stats they show
+stats_card_renderer = StatsCardRenderer()
+
+# Byte quota, max age and LRU eviction for everything above
+screenshot_retention = ScreenshotRetention(screenshot_store, stats_card_renderer.root)
+
+# Optional write-behind buffer: scores are spooled locally and group-committed
+score_buffer = ScoreWriteBuffer(
+    scores_collection,
+    on_stored=record_stored_scores,
+    on_rejected=retract_rejected_scores
+) if scores_collection is not None and SCORE_WRITE_BEHIND else None
+
+def score_result(score_doc: dict) -> dict:
+    return {
+        "status": "success",
+        "id": score_doc["id"],
+        "verified": score_doc["verified"],
+        "verification_state": score_doc["verification_state"]
+    }
+
+# Results of recent idempotent submissions, so quick retries skip the database
+idempotency_store = IdempotencyStore()
+
+async def find_idempotent_score(player: str, idempotency_key: str) -> Optional[dict]:
+    """The score already stored (or buffered) for this player and key, if any"""
+    if score_buffer is not None:
+        buffered = score_buffer.find(player=player, idempotency_key=idempotency_key)
+        if buffered:
+            return buffered
+    return await scores_collection.find_one(
+        {"player": player, "idempotency_key": idempotency_key},
+        {"_id": 0, "id": 1, "verified": 1, "verification_state": 1}
+    )
+
+def replayed_result(score_doc: dict) -> dict:
+    return {**score_result(score_doc), "replayed": True}
 
 @app.post("/api/scores")
-async def submit_score(score: ScoreSubmission):
+async def submit_score(score: ScoreSubmission, idempotency_key: Optional[str] = Header(None)):
+    """Submit a score.
+
+    Retries that repeat the `Idempotency-Key` header (or `client_nonce`) get the
+    original result back, marked `replayed`, instead of storing the score again.
+    """
+    idempotency_key = idempotency_key or score.client_nonce
+    if not idempotency_key:
+        return await store_score(score)
+    if len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+    
+    result, replayed = await idempotency_store.run(
+        (score.player, idempotency_key),
+        lambda: store_score(score, idempotency_key)
+    )
+    return {**result, "replayed": True} if replayed else result
+
+async def store_score(score: ScoreSubmission, idempotency_key: Optional[str] = None) -> dict:
     try:
-        # Generate unique ID
-        score_id = str(uuid.uuid4())
-        
-        # Create score document
-        score_doc = {
-            "id": score_id,
-            "player": score.player,
-            "username": score.username,
-            "time": score.time,
-            "penalty": score.penalty,
-            "timestamp": score.timestamp,
-            "verified": False,
-            "created_at": datetime.utcnow(),
-            "game_mode": score.game_mode
-        }
+        score_doc = build_score_doc(score, idempotency_key)
+        await set_verification_state(score_doc)
         
-        # Add mode-specific fields if provided
-        if score.hits_count is not None:
-            score_doc["hits_count"] = score.hits_count
-        if score.accuracy is not None:
-            score_doc["accuracy"] = score.accuracy
-        if score.sequence_times is not None:
-            score_doc["sequence_times"] = score.sequence_times
-        if score.total_targets is not None:
-            score_doc["total_targets"] = score.total_targets
-        
-        # Only add tx_id if it's provided (to avoid null values in unique index)
-        if score.tx_id:
-            score_doc["tx_id"] = score.tx_id
-        
-        # If there's a transaction ID, verify it
-        if score.tx_id:
+        if score_buffer is not None:
+            # The buffer checks the unique tx_id / idempotency key before accepting,
+            # so leaderboards never show a score the next flush would refuse
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(f"https://devnet.irys.xyz/{score.tx_id}")
-                    if response.status_code == 200:
-                        # Try to parse the response as JSON
-                        try:
-                            irys_data = response.json()
-                            score_doc["verified"] = True
-                        except:
-                            # If it's not JSON, it might be raw text
-                            score_doc["verified"] = True
-                    else:
-                        score_doc["verified"] = False
-            except:
-                score_doc["verified"] = False
+                await score_buffer.add(score_doc)
+            except DuplicateScoreError as e:
+                return duplicate_score_result(score_doc, e.existing)
+            await record_after_insert([score_doc], buffered=True)
+            return score_result(score_doc)
         
         # Insert the score (only if database is available)
         if scores_collection is not None:
-            result = await scores_collection.insert_one(score_doc)
+            try:
+                result = await scores_collection.insert_one(score_doc)
+            except DuplicateKeyError:
+                existing = await find_idempotent_score(score.player, idempotency_key) if idempotency_key else None
+                if existing is None:
+                    raise HTTPException(status_code=409, detail="A score with this tx_id was already submitted")
+                return replayed_result(existing)
             
             if result.inserted_id:
-                return {
-                    "status": "success", 
-                    "id": score_id,
-                    "verified": score_doc["verified"]
-                }
+                await record_after_insert([score_doc])
+                return score_result(score_doc)
             else:
                 raise HTTPException(status_code=500, detail="Failed to store score")
         else:
             # Database not available - return success but don't store
             return {
-                "status": "success", 
-                "id": score_id,
-                "verified": score_doc["verified"],
+                **score_result(score_doc),
                 "note": "Score not stored - database not configured"
             }
         
+    except BufferFullError as e:
+        raise HTTPException(status_code=503, detail=f"Score buffer full: {e}")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def duplicate_score_result(score_doc: dict, existing: dict) -> dict:
+    """A retry of the same idempotent submission replays; any other collision is a conflict"""
+    if (score_doc.get("idempotency_key")
+            and existing.get("player") == score_doc["player"]
+            and existing.get("idempotency_key") == score_doc["idempotency_key"]):
+        return replayed_result(existing)
+    raise HTTPException(status_code=409, detail="A score with this tx_id was already submitted")
+
+# Most scores accepted by one batch request
+MAX_SCORE_BATCH = int(os.environ.get('MAX_SCORE_BATCH', '100'))
+
+@app.post("/api/scores/batch")
+async def submit_score_batch(batch: ScoreBatch, idempotency_key: Optional[str] = Header(None)):
+    """Submit many scores at once (offline clients, kiosks catching up).
+
+    Returns one result per item, in order. A bad item fails on its own without
+    rejecting the rest of the batch. Items that repeat a stored `client_nonce`
+    come back `replayed`. An `Idempotency-Key` header covers the whole batch:
+    items without a nonce are stored under `<key>:<index>`, so the per-player
+    unique index catches a retry even after a restart.
+    """
+    if len(batch.scores) > MAX_SCORE_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SCORE_BATCH} scores per batch")
+    if not idempotency_key:
+        return await store_score_batch(batch)
+    if len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+    
+    # Scoped to the batch's players so one player's key never replays another's batch
+    players = tuple(sorted({str(item.get("player")) for item in batch.scores}))
+    result, replayed = await idempotency_store.run(
+        ("batch", players, idempotency_key),
+        lambda: store_score_batch(batch, idempotency_key)
+    )
+    return {**result, "replayed": True} if replayed else result
+
+async def store_score_batch(batch: ScoreBatch, idempotency_key: Optional[str] = None) -> dict:
+    try:
+        results = [None] * len(batch.scores)
+        score_docs = {}
+        for index, item in enumerate(batch.scores):
+            try:
+                submission = ScoreSubmission.model_validate(item)
+                item_key = f"{idempotency_key}:{index}" if idempotency_key else None
+                score_docs[index] = build_score_doc(submission, submission.client_nonce or item_key)
+            except ValidationError as e:
+                results[index] = {
+                    "status": "error",
+                    "error": "Invalid score",
+                    "details": e.errors(include_url=False, include_context=False, include_input=False)
+                }
+        
+        # Cache lookups (and inline verification without a database) run concurrently
+        await asyncio.gather(*(set_verification_state(score_doc) for score_doc in score_docs.values()))
+        
+        if scores_collection is None:
+            for index, score_doc in score_docs.items():
+                results[index] = {**score_result(score_doc), "note": "Score not stored - database not configured"}
+            return {
+                "accepted": len(score_docs),
+                "rejected": len(results) - len(score_docs),
+                "results": results
+            }
+        
+        if score_buffer is not None:
+            return await buffer_score_batch(score_docs, results)
+        
+        indexes = list(score_docs)
+        failed = {}
+        if indexes:
+            try:
+                await scores_collection.insert_many([score_docs[index] for index in indexes], ordered=False)
+            except BulkWriteError as e:
+                # Unordered: everything but the reported documents was stored
+                for error in e.details.get("writeErrors", []):
+                    failed[indexes[error["index"]]] = error.get("errmsg", "Failed to store score")
+        
+        accepted = []
+        for index in indexes:
+            score_doc = score_docs[index]
+            if index in failed and score_doc.get("idempotency_key"):
+                # A retried item whose client_nonce (or batch key) is already stored
+                existing = await find_idempotent_score(score_doc["player"], score_doc["idempotency_key"])
+                if existing:
+                    results[index] = replayed_result(existing)
+                    continue
+            if index in failed:
+                results[index] = {"status": "error", "error": failed[index]}
+            else:
+                accepted.append(score_docs[index])
+                results[index] = score_result(score_docs[index])
+        
+        if accepted:
+            await record_after_insert(accepted)
+        
+        return {
+            "accepted": len(accepted),
+            "rejected": sum(1 for result in results if result["status"] == "error"),
+            "results": results
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def buffer_score_batch(score_docs: dict, results: list) -> dict:
+    """Store a batch through the write buffer, with the same checks as single submissions"""
+    async def add(index: int, score_doc: dict) -> bool:
+        try:
+            await score_buffer.add(score_doc)
+        except DuplicateScoreError as e:
+            try:
+                results[index] = duplicate_score_result(score_doc, e.existing)
+            except HTTPException as conflict:
+                results[index] = {"status": "error", "error": conflict.detail}
+            return False
+        except BufferFullError as e:
+            results[index] = {"status": "error", "error": f"Score buffer full: {e}"}
+            return False
+        results[index] = score_result(score_doc)
+        return True
+    
+    # Keys are claimed before each add's first await, so duplicates within the batch are still caught
+    added = await asyncio.gather(*(add(index, score_doc) for index, score_doc in score_docs.items()))
+    accepted = [score_doc for score_doc, ok in zip(score_docs.values(), added) if ok]
+    
+    if accepted:
+        await record_after_insert(accepted, buffered=True)
+    
+    return {
+        "accepted": len(accepted),
+        "rejected": sum(1 for result in results if result["status"] == "error"),
+        "results": results
+    }
+
+@app.get("/api/scores/{score_id}/verification")
+async def get_score_verification(score_id: str):
+    """Poll the verification state of a submitted score"""
+    if scores_collection is None:
+        raise HTTPException(status_code=404, detail="Score not found")
+    
+    try:
+        score_doc = await scores_collection.find_one(
+            {"id": score_id},
+            {"_id": 0, "id": 1, "tx_id": 1, "verified": 1, "verification_state": 1}
+        )
+        # Accepted but still waiting in the write buffer
+        if not score_doc and score_buffer is not None:
+            buffered = score_buffer.find(id=score_id)
+            if buffered:
+                score_doc = {key: buffered.get(key) for key in ("id", "tx_id", "verified", "verification_state")}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not score_doc:
+        raise HTTPException(status_code=404, detail="Score not found")
+    
+    # Scores stored before deferred verification have no state field
+    score_doc.setdefault("verification_state", STATE_VERIFIED if score_doc.get("verified") else STATE_NONE)
+    return score_doc
+
+# Upper bound for a single leaderboard page
+MAX_LEADERBOARD_LIMIT = 100
+
 @app.get("/api/leaderboard", response_model=List[LeaderboardEntry])
-async def get_leaderboard(limit: int = 10, game_mode: Optional[str] = None):
+async def get_leaderboard(
+    request: Request,
+    response: Response,
+    limit: int = 10,
+    game_mode: Optional[str] = None,
+    cursor: Optional[str] = None
+):
+    """Get a page of the leaderboard.
+
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next page.
+    Responses carry an ETag, so revalidating an unchanged page costs a 304.
+    """
+    etag = resource_versions.etag(
+        leaderboard_version_key(game_mode),
+        limit, cursor,
+        leaderboard_engine.generation if leaderboard_engine is not None else None
+    )
+    cache_control = leaderboard_cache_control()
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    
     try:
         # Return empty leaderboard if database not available
         if scores_collection is None:
             return []
+        
+        limit = max(1, min(limit, MAX_LEADERBOARD_LIMIT))
+        after = decode_cursor(cursor) if cursor else None
+        
+        # Serve from the in-memory boards whenever they cover the request
+        leaderboard = await leaderboard_engine.get(game_mode, limit, after)
+        
+        if leaderboard is None:
+            # Build filter query
+            filter_query = {}
+            if game_mode:
+                filter_query["game_mode"] = game_mode
+            if after is not None:
+                filter_query.update(after_filter(game_mode, *after))
             
-        # Build filter query
-        filter_query = {}
-        if game_mode:
-            filter_query["game_mode"] = game_mode
-        
-        # Get top scores - sorting depends on game mode
-        if game_mode == "endurance":
-            # For endurance mode, sort by hits_count (descending)
-            cursor = scores_collection.find(
-                filter_query, 
-                {"_id": 0, "created_at": 0}
-            ).sort("hits_count", -1).limit(limit)
-        else:
-            # For other modes, sort by time (ascending - lower is better)
-            cursor = scores_collection.find(
+            # Sorting depends on game mode: hits_count (descending) for
+            # endurance, time (ascending - lower is better) for the rest
+            db_cursor = scores_collection.find(
                 filter_query, 
-                {"_id": 0, "created_at": 0}
-            ).sort("time", 1).limit(limit)
+                SCORE_PROJECTION
+            ).sort(sort_spec(game_mode)).limit(limit)
+            leaderboard = await db_cursor.to_list(length=limit)
         
-        leaderboard = await cursor.to_list(length=limit)
+        if len(leaderboard) == limit:
+            headers["X-Next-Cursor"] = encode_cursor(leaderboard[-1], game_mode)
+        
+        if FAST_JSON_ENABLED:
+            # Rows come from our own collection, so skip response_model validation
+            return FastJSONResponse([shape_leaderboard_entry(row) for row in leaderboard], headers=headers)
+        response.headers.update(headers)
         return leaderboard
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/leaderboard/stream")
+async def stream_leaderboard(request: Request, game_mode: Optional[str] = None, limit: int = 10):
+    """Server-Sent Events stream of leaderboard changes.
+
+    Starts with a `snapshot` event, then sends `entry` events (rank, entry and
+    the id it pushed off the board), `verified` events, and `resync` when the
+    client fell too far behind and should refetch the board.
+    """
+    if scores_collection is None:
+        raise HTTPException(status_code=500, detail="Database not configured")
+    
+    limit = max(1, min(limit, MAX_LEADERBOARD_LIMIT))
+    subscriber = leaderboard_broadcaster.subscribe(game_mode)
+    try:
+        entries = await leaderboard_engine.get(game_mode, limit)
+        if entries is None:
+            entries = await scores_collection.find(
+                {"game_mode": game_mode} if game_mode else {},
+                SCORE_PROJECTION
+            ).sort(sort_spec(game_mode)).limit(limit).to_list(length=limit)
+    except Exception as e:
+        leaderboard_broadcaster.unsubscribe(subscriber)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    snapshot = {"game_mode": game_mode, "entries": entries}
+    return StreamingResponse(
+        leaderboard_broadcaster.stream(request, subscriber, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/leaderboard/rank/{player_address}")
+async def get_player_rank(player_address: str, game_mode: Optional[str] = None, neighbors: int = 2):
+    """Get the rank of a player's best score plus the entries around it"""
+    if scores_collection is None:
+        raise HTTPException(status_code=404, detail="Player has no scores")
+    
+    try:
+        neighbors = max(0, min(neighbors, 10))
+        mode_filter = {"game_mode": game_mode} if game_mode else {}
+        field = sort_spec(game_mode)[0][0]
+        
+        best = await scores_collection.find(
+            {"player": player_address, **mode_filter},
+            SCORE_PROJECTION
+        ).sort(sort_spec(game_mode)).limit(1).to_list(length=1)
+        if not best:
+            raise HTTPException(status_code=404, detail="Player has no scores")
+        entry = best[0]
+        key = (entry.get(field), entry["id"])
+        
+        # Rank is one more than the number of entries ahead - a counted index range scan
+        ahead = await scores_collection.count_documents({**mode_filter, **before_filter(game_mode, *key)})
+        if mode_filter:
+            # Counted from the game_mode prefix of the leaderboard index
+            total = await scores_collection.count_documents(mode_filter)
+        else:
+            # An unfiltered count_documents scans the whole collection; the metadata count doesn't
+            total = await scores_collection.estimated_document_count()
+        
+        above, below = [], []
+        if neighbors:
+            reverse_sort = [(name, -direction) for name, direction in sort_spec(game_mode)]
+            above = await scores_collection.find(
+                {**mode_filter, **before_filter(game_mode, *key)},
+                SCORE_PROJECTION
+            ).sort(reverse_sort).limit(neighbors).to_list(length=neighbors)
+            above.reverse()
+            below = await scores_collection.find(
+                {**mode_filter, **after_filter(game_mode, *key)},
+                SCORE_PROJECTION
+            ).sort(sort_spec(game_mode)).limit(neighbors).to_list(length=neighbors)
+        
+        return {
+            "player": player_address,
+            "game_mode": game_mode,
+            "rank": ahead + 1,
+            "total": total,
+            "entry": entry,
+            "above": above,
+            "below": below
+        }
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -289,16 +883,18 @@ async def get_player_scores(player_address: str):
             
         cursor = scores_collection.find(
             {"player": player_address},
-            {"_id": 0, "created_at": 0}
+            SCORE_PROJECTION
         ).sort("time", 1)
         
         scores = await cursor.to_list(length=None)
-        return {
+        result = {
             "player": player_address,
             "total_games": len(scores),
             "best_score": scores[0]["time"] if scores else None,
             "scores": scores
         }
+        # Unbounded history: skip the jsonable_encoder walk when the fast path is on
+        return FastJSONResponse(result) if FAST_JSON_ENABLED else result
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -306,28 +902,65 @@ async def get_player_scores(player_address: str):
 @app.get("/api/verify/{tx_id}")
 async def verify_transaction(tx_id: str):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"https://devnet.irys.xyz/{tx_id}")
-            if response.status_code == 200:
-                return {
-                    "verified": True,
-                    "url": f"https://devnet.irys.xyz/{tx_id}"
-                }
-            else:
-                return {"verified": False, "error": "Transaction not found"}
-                
+        if await verify_tx_id(tx_id):
+            return {
+                "verified": True,
+                "url": gateway_client.tx_url(tx_id)
+            }
+        else:
+            return {"verified": False, "error": "Transaction not found"}
+            
     except Exception as e:
         return {"verified": False, "error": str(e)}
 
+@app.get("/api/stats/distribution")
+async def get_score_distribution(game_mode: Optional[str] = None, value: Optional[float] = None):
+    """Get percentiles and a histogram of scores, optionally ranking a given value"""
+    if score_distribution is None:
+        raise HTTPException(status_code=500, detail="Database not configured")
+    
+    distribution = score_distribution.describe(game_mode, value)
+    if distribution is None:
+        raise HTTPException(status_code=404, detail=f"Unknown game mode: {game_mode}")
+    return distribution
+
 @app.get("/api/health")
 async def health_check():
     db_status = "connected" if scores_collection is not None else "not configured"
     return {
         "status": "healthy",
         "database": db_status,
+        "irys_workers": irys_worker_pool.status(),
+        "irys_upload_queue": irys_upload_queue.status(),
+        "verification_cache": verification_cache.status(),
+        "score_verifier": score_verifier.status() if score_verifier is not None else None,
+        "leaderboard": leaderboard_engine.status() if leaderboard_engine is not None else None,
+        "score_buffer": score_buffer.status() if score_buffer is not None else None,
+        "idempotency": idempotency_store.status(),
+        "screenshots": screenshot_store.status(),
+        "image_pipeline": image_pipeline.status(),
+        "stats_cards": stats_card_renderer.status(),
+        "screenshot_storage": screenshot_retention.status(),
+        "irys_account_cache": irys_account_cache.status() if irys_account_cache is not None else None,
+        "executors": {
+            "irys_io": irys_io.status(),
+            "signing": signer.executor.status() if signer is not None else None
+        },
+        "live_subscribers": leaderboard_broadcaster.status(),
         "timestamp": datetime.utcnow().isoformat()
     }
 
+@app.get("/api/db/index-stats")
+async def get_index_stats():
+    """Report index usage for the managed collections"""
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not configured")
+    
+    try:
+        return {"indexes": await db_indexes.index_stats(db)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/upload-screenshot")
 async def upload_screenshot(
     screenshot: UploadFile = File(...),
@@ -337,44 +970,125 @@ async def upload_screenshot(
 ):
     """Upload and serve screenshot for Twitter sharing"""
     try:
-        # Create screenshots directory if it doesn't exist
-        screenshots_dir = Path("screenshots")
-        screenshots_dir.mkdir(exist_ok=True)
+        # Evict old screenshots first if the upload and its variants might not fit
+        await screenshot_retention.make_room(2 * (screenshot.size or screenshot_store.max_bytes))
         
-        # Generate unique filename
-        file_extension = screenshot.filename.split('.')[-1] if '.' in screenshot.filename else 'png'
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = screenshots_dir / unique_filename
+        # Stream to disk in chunks (capped, hashed on the way) off the event loop;
+        # content that is already stored just gains a reference. The extension is
+        # taken from the detected image format, never from the client's filename
+        try:
+            saved = await screenshot_store.save_upload(screenshot)
+        except InvalidImage as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        unique_filename = saved["filename"]
         
-        # Save the uploaded file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(screenshot.file, buffer)
+        try:
+            variants = await screenshot_variants(unique_filename)
+        except InvalidImage as e:
+            if await screenshot_store.release(unique_filename) == 0:
+                screenshot_retention.forget(SCREENSHOT, unique_filename)
+            raise HTTPException(status_code=400, detail=str(e))
+        if variants is None:
+            # The transcode timed out but keeps running: count the room reserved
+            # for its variants until a later upload of this content sees their real size
+            variants = {}
+            screenshot_retention.add(SCREENSHOT, unique_filename, 2 * saved["size"])
+        else:
+            screenshot_retention.add(SCREENSHOT, unique_filename, saved["size"] + sum(variants.values()))
         
         # Generate the URL that will serve this image
         image_url = f"{os.environ.get('BACKEND_URL', 'http://localhost:8001')}/api/screenshots/{unique_filename}"
         
-        return {
+        result = {
             "success": True,
             "imageUrl": image_url,
-            "filename": unique_filename
+            "filename": unique_filename,
+            "size": saved["size"],
+            "sha256": saved["sha256"],
+            "duplicate": saved["duplicate"],
+            "variants": variants
         }
+        if "card.jpg" in variants:
+            result["cardUrl"] = f"{image_url}/card"
+        if "thumb.jpg" in variants:
+            result["thumbnailUrl"] = f"{image_url}/thumb"
+        return result
         
+    except ScreenshotTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except StorageFull as e:
+        raise HTTPException(status_code=507, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload screenshot: {str(e)}")
 
+async def screenshot_variants(filename: str) -> Optional[dict]:
+    """Variant name -> size for a stored screenshot, transcoding it if needed.
+
+    Raises InvalidImage for uploads Pillow cannot decode. If the pipeline is
+    busy, the screenshot is simply served as uploaded. None means the
+    transcode timed out and may still write its variants later.
+    """
+    existing = await asyncio.to_thread(screenshot_store.stored_variants, filename)
+    if existing:
+        return existing
+    
+    try:
+        return await image_pipeline.process(screenshot_store.path_for(filename), screenshot_store.variants_dir(filename))
+    except ExecutorBusyError as e:
+        print(f"Skipped transcoding {filename}: {e}")
+        return {}
+    except asyncio.TimeoutError:
+        print(f"Transcoding {filename} timed out, serving it as uploaded for now")
+        return None
+
+def screenshot_response(path, media_type: str, cache_control: str, vary: bool = False) -> FileResponse:
+    # The type is always a fixed image/* from our own tables; browsers must not sniff past it
+    headers = {"Cache-Control": cache_control, "X-Content-Type-Options": "nosniff"}
+    if vary:
+        headers["Vary"] = "Accept"
+    return FileResponse(path=path, media_type=media_type, headers=headers)
+
 @app.get("/api/screenshots/{filename}")
-async def serve_screenshot(filename: str):
-    """Serve uploaded screenshots"""
-    file_path = Path("screenshots") / filename
+async def serve_screenshot(filename: str, request: Request):
+    """Serve uploaded screenshots, as AVIF or WebP when the client accepts it"""
+    file_path = screenshot_store.path_for(filename)
+    content_addressed = is_content_addressed(filename)
+    # Only whitelisted image extensions are ever served as content-addressed originals
+    media_type = UPLOAD_MEDIA_TYPES.get(filename.rsplit(".", 1)[-1]) if content_addressed else "image/png"
     
-    if not file_path.exists():
+    if media_type is None or not file_path.is_file():
         raise HTTPException(status_code=404, detail="Screenshot not found")
+    screenshot_retention.touch(SCREENSHOT, filename)
     
-    return FileResponse(
-        path=file_path,
-        media_type="image/png",
-        headers={"Cache-Control": "public, max-age=3600"}
-    )
+    if not content_addressed:
+        # Uploads from before content addressing, served as PNG as they always were
+        return screenshot_response(file_path, media_type, "public, max-age=3600")
+    
+    # Content-addressed names never change meaning, so they are cached forever
+    variants_dir = screenshot_store.variants_dir(filename)
+    available = [name for name in FULL_IMAGE_VARIANTS if (variants_dir / name).exists()]
+    variant = best_variant(request.headers.get("accept"), available)
+    if variant is not None:
+        return screenshot_response(variants_dir / variant, VARIANT_MEDIA_TYPES[variant], IMMUTABLE_CACHE_CONTROL, vary=True)
+    return screenshot_response(file_path, media_type, IMMUTABLE_CACHE_CONTROL, vary=True)
+
+# Fixed-size renditions of a screenshot
+SCREENSHOT_RENDITIONS = {"card": "card.jpg", "thumb": "thumb.jpg"}
+
+@app.get("/api/screenshots/{filename}/{rendition}")
+async def serve_screenshot_rendition(filename: str, rendition: str):
+    """Serve the Twitter-card JPEG or the thumbnail of a screenshot"""
+    variant = SCREENSHOT_RENDITIONS.get(rendition)
+    if variant is None or not is_content_addressed(filename):
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+    
+    path = screenshot_store.variants_dir(filename) / variant
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+    screenshot_retention.touch(SCREENSHOT, filename)
+    return screenshot_response(path, VARIANT_MEDIA_TYPES[variant], IMMUTABLE_CACHE_CONTROL)
 
 @app.options("/api/{path:path}")
 async def options_handler(path: str):
@@ -401,37 +1115,40 @@ async def options_leaderboard():
     """Handle CORS preflight for leaderboard endpoint"""
     return {"message": "OK"}
 
+# Fixed for the life of the process: rendered once, served with an ETag
+GAME_MODES = StaticResource({
+    "modes": [
+        {
+            "id": "classic",
+            "name": "Classic",
+            "description": "Traditional single-target reaction time test",
+            "icon": "🎯"
+        },
+        {
+            "id": "sequence",
+            "name": "Sequence",
+            "description": "Hit multiple targets in sequence",
+            "icon": "🔄"
+        },
+        {
+            "id": "endurance",
+            "name": "Endurance",
+            "description": "Hit as many targets as possible in 60 seconds",
+            "icon": "⏱️"
+        },
+        {
+            "id": "precision",
+            "name": "Precision",
+            "description": "Smaller targets for accuracy testing",
+            "icon": "🎪"
+        }
+    ]
+})
+
 @app.get("/api/game-modes")
-async def get_game_modes():
+async def get_game_modes(request: Request):
     """Get available game modes with their descriptions"""
-    return {
-        "modes": [
-            {
-                "id": "classic",
-                "name": "Classic",
-                "description": "Traditional single-target reaction time test",
-                "icon": "🎯"
-            },
-            {
-                "id": "sequence",
-                "name": "Sequence",
-                "description": "Hit multiple targets in sequence",
-                "icon": "🔄"
-            },
-            {
-                "id": "endurance",
-                "name": "Endurance",
-                "description": "Hit as many targets as possible in 60 seconds",
-                "icon": "⏱️"
-            },
-            {
-                "id": "precision",
-                "name": "Precision",
-                "description": "Smaller targets for accuracy testing",
-                "icon": "🎪"
-            }
-        ]
-    }
+    return GAME_MODES.respond(request)
 
 # ============================
 # IRYS BLOCKCHAIN INTEGRATION
@@ -452,89 +1169,15 @@ async def sign_message(request: SignRequest):
         raise HTTPException(status_code=500, detail="Irys account not configured")
     
     try:
-        # Create message hash
-        message = encode_defunct(text=request.message)
-        
-        # Sign the message
-        signed_message = account.sign_message(message)
-        
-        return {"signature": signed_message.signature.hex()}
+        # ECDSA is CPU-bound: sign in the signing pool, not on the event loop
+        return {"signature": await signer.sign(request.message)}
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=f"Signing busy: {str(e)}")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Signing timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Signing failed: {str(e)}")
 
-import subprocess
-import json
-import asyncio
-
-async def call_irys_service(action, data=None, tags=None):
-    """Call the Node.js Irys service helper"""
-    try:
-        request_data = {
-            "action": action,
-            "data": data,
-            "tags": tags or []
-        }
-        
-        print(f"🔧 Calling Irys service with action: {action}")
-        
-        # Get the directory where this script is located
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        irys_service_path = os.path.join(current_dir, 'irys_service.js')
-        
-        print(f"Current directory: {current_dir}")
-        print(f"Irys service path: {irys_service_path}")
-        
-        # Check if the service file exists
-        if not os.path.exists(irys_service_path):
-            raise Exception(f"Irys service file not found at: {irys_service_path}")
-        
-        # Start the Node.js process
-        process = await asyncio.create_subprocess_exec(
-            'node', irys_service_path,
-            stdin=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=current_dir
-        )
-        
-        # Send request and get response
-        stdout, stderr = await process.communicate(input=json.dumps(request_data).encode())
-        
-        print(f"🔧 Node.js return code: {process.returncode}")
-        if stderr:
-            print(f"🔧 Node.js stderr: {stderr.decode()}")
-        
-        if process.returncode != 0:
-            print(f"Node.js process error: {stderr.decode()}")
-            return {"success": False, "error": "Node.js process failed"}
-        
-        # Parse response - get the last line which should be JSON
-        output_lines = stdout.decode().strip().split('\n')
-        print(f"🔧 Output lines count: {len(output_lines)}")
-        
-        if not output_lines or not output_lines[-1].strip():
-            print("🔧 No output from Node.js service")
-            return {"success": False, "error": "No output from Node.js service"}
-        
-        json_line = output_lines[-1].strip()  # Last line should be the JSON response
-        print(f"🔧 JSON line: {json_line}")
-        
-        if not json_line:
-            print("🔧 Empty JSON line")
-            return {"success": False, "error": "Empty response from Node.js service"}
-        
-        response = json.loads(json_line)
-        print(f"🔧 Parsed response success: {response.get('success', False)}")
-        return response
-        
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {str(e)}")
-        print(f"Raw output: {stdout.decode() if 'stdout' in locals() else 'No stdout'}")
-        return {"success": False, "error": f"JSON decode error: {str(e)}"}
-    except Exception as e:
-        print(f"Error calling Irys service: {str(e)}")
-        return {"success": False, "error": str(e)}
-
 @app.post("/api/irys/upload")
 async def upload_to_irys_via_node(request: IrysUploadRequest):
     """Upload data to Irys using Node.js helper (devnet - free uploads)"""
@@ -567,8 +1210,8 @@ async def upload_to_irys_via_node(request: IrysUploadRequest):
                     print(f"Warning: Invalid tag format: {tag}")
                     # Skip invalid tags instead of failing
         
-        # Call Node.js service
-        response = await call_irys_service("upload", data_to_upload, tags)
+        # Queue for the next Irys bundle; we get back our own item receipt
+        response = await irys_upload_queue.submit(data_to_upload, tags)
         
         if response.get("success"):
             tx_id = response.get("tx_id")
@@ -592,6 +1235,7 @@ async def upload_to_irys_via_node(request: IrysUploadRequest):
                 "tx_id": tx_id,
                 "gateway_url": response.get("gateway_url"),
                 "explorer_url": response.get("explorer_url"),
+                "bundle_id": response.get("bundle_id"),
                 "network": "devnet",
                 "message": "Upload successful (devnet - free)",
                 "tags": tags,
@@ -612,12 +1256,18 @@ async def get_irys_balance():
         raise HTTPException(status_code=500, detail="Irys client not configured")
     
     try:
-        balance = irys_client.get_balance()
+        cached = await irys_account_cache.balance()
         return {
-            "balance": balance,
+            "balance": cached["balance"],
             "address": account.address if account else None,
-            "network": IRYS_NETWORK
+            "network": IRYS_NETWORK,
+            "age_seconds": cached["age_seconds"],
+            "stale": cached["stale"]
         }
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=f"Irys RPC busy: {str(e)}")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Balance check timed out")
     except Exception as e:
         print(f"Balance check error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to check balance: {str(e)}")
@@ -629,13 +1279,18 @@ async def fund_irys_account(amount: int = 10000):
         raise HTTPException(status_code=500, detail="Irys client not configured")
     
     try:
-        fund_tx = irys_client.fund(amount)
+        fund_tx = await irys_io.run(irys_client.fund, amount, timeout=IRYS_FUND_TIMEOUT)
+        irys_account_cache.invalidate_balance()
         return {
             "success": True,
             "transaction": str(fund_tx),
             "amount": amount,
             "message": f"Account funded with {amount} atomic units"
         }
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=f"Irys RPC busy: {str(e)}")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Funding timed out - check the balance before retrying")
     except Exception as e:
         print(f"Funding error: {str(e)}")
         # Check if it's a balance issue
@@ -653,19 +1308,26 @@ async def get_upload_price(data_size: int):
         raise HTTPException(status_code=500, detail="Irys client not configured")
     
     try:
-        price = irys_client.get_price(data_size)
+        cached = await irys_account_cache.price(data_size)
         return {
             "data_size": data_size,
-            "price": price,
-            "network": IRYS_NETWORK
+            "price": cached["price"],
+            "network": IRYS_NETWORK,
+            # "curve" prices are estimated from nearby sampled sizes
+            "source": cached["source"],
+            "age_seconds": cached["age_seconds"],
+            "stale": cached["stale"]
         }
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=f"Irys RPC busy: {str(e)}")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Price check timed out")
     except Exception as e:
         print(f"Price check error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get price: {str(e)}")
 
-@app.get("/api/irys/network-info")
-async def get_network_info():
-    """Get current Irys network information"""
+def build_network_info() -> dict:
+    """Current Irys network information (fixed once the client is configured)"""
     network_config = {
         "devnet": {
             "name": "Irys Devnet",
@@ -699,59 +1361,68 @@ async def get_network_info():
         "client_status": "connected" if irys_client else "disconnected"
     }
 
+NETWORK_INFO = StaticResource(build_network_info(), max_age=300)
+
+@app.get("/api/irys/network-info")
+async def get_network_info(request: Request):
+    """Get current Irys network information"""
+    return NETWORK_INFO.respond(request)
+
 # ============================
 # ACHIEVEMENTS SYSTEM
 # ============================
 
+ACHIEVEMENTS = [
+    {
+        "id": "speed_demon",
+        "title": "Speed Demon",
+        "description": "React in under 200ms",
+        "icon": "⚡",
+        "condition": "reaction_time < 200"
+    },
+    {
+        "id": "consistency_master",
+        "title": "Consistency Master",
+        "description": "10 games within 50ms variance",
+        "icon": "🎯",
+        "condition": "variance < 50 over 10 games"
+    },
+    {
+        "id": "streak_legend",
+        "title": "Streak Legend",
+        "description": "Play 7 days in a row",
+        "icon": "🔥",
+        "condition": "daily_streak >= 7"
+    },
+    {
+        "id": "endurance_champion",
+        "title": "Endurance Champion",
+        "description": "Hit 50+ targets in endurance mode",
+        "icon": "💪",
+        "condition": "endurance_hits >= 50"
+    },
+    {
+        "id": "precision_master",
+        "title": "Precision Master",
+        "description": "95%+ accuracy in precision mode",
+        "icon": "🎪",
+        "condition": "precision_accuracy >= 95"
+    },
+    {
+        "id": "sequence_pro",
+        "title": "Sequence Pro",
+        "description": "Complete 10-target sequence flawlessly",
+        "icon": "🔄",
+        "condition": "sequence_completion == 10"
+    }
+]
+ACHIEVEMENTS_BY_ID = {achievement["id"]: achievement for achievement in ACHIEVEMENTS}
+ACHIEVEMENT_TYPES = StaticResource({"types": ACHIEVEMENTS})
+
 @app.get("/api/achievements/types")
-async def get_achievement_types():
+async def get_achievement_types(request: Request):
     """Get all available achievement types"""
-    return {
-        "types": [
-            {
-                "id": "speed_demon",
-                "title": "Speed Demon",
-                "description": "React in under 200ms",
-                "icon": "⚡",
-                "condition": "reaction_time < 200"
-            },
-            {
-                "id": "consistency_master",
-                "title": "Consistency Master",
-                "description": "10 games within 50ms variance",
-                "icon": "🎯",
-                "condition": "variance < 50 over 10 games"
-            },
-            {
-                "id": "streak_legend",
-                "title": "Streak Legend",
-                "description": "Play 7 days in a row",
-                "icon": "🔥",
-                "condition": "daily_streak >= 7"
-            },
-            {
-                "id": "endurance_champion",
-                "title": "Endurance Champion",
-                "description": "Hit 50+ targets in endurance mode",
-                "icon": "💪",
-                "condition": "endurance_hits >= 50"
-            },
-            {
-                "id": "precision_master",
-                "title": "Precision Master",
-                "description": "95%+ accuracy in precision mode",
-                "icon": "🎪",
-                "condition": "precision_accuracy >= 95"
-            },
-            {
-                "id": "sequence_pro",
-                "title": "Sequence Pro",
-                "description": "Complete 10-target sequence flawlessly",
-                "icon": "🔄",
-                "condition": "sequence_completion == 10"
-            }
-        ]
-    }
+    return ACHIEVEMENT_TYPES.respond(request)
 
 @app.get("/api/achievements/{player_address}")
 async def get_player_achievements(player_address: str):
@@ -771,6 +1442,63 @@ async def get_player_achievements(player_address: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def grant_achievement(player: str, achievement_type: str, title: str,
+                            description: str, icon: str) -> dict:
+    """Store an achievement unless the player already has it; returns the unlock response"""
+    # Check if achievement already exists
+    existing = await achievements_collection.find_one({
+        "player": player,
+        "achievement_type": achievement_type
+    })
+    
+    if existing:
+        # Remove MongoDB ObjectId before returning
+        existing.pop('_id', None)
+        return {"status": "already_unlocked", "achievement": existing}
+    
+    # Create achievement document
+    achievement_doc = {
+        "id": str(uuid.uuid4()),
+        "player": player,
+        "achievement_type": achievement_type,
+        "title": title,
+        "description": description,
+        "icon": icon,
+        "unlocked_at": datetime.utcnow().isoformat(),
+        "verified": False
+    }
+    
+    # Try to upload to Irys
+    if account:
+        try:
+            upload_data = json.dumps(achievement_doc)
+            # Mock Irys upload
+            mock_tx_id = f"achievement-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+            achievement_doc["tx_id"] = mock_tx_id
+            achievement_doc["verified"] = True
+        except Exception as e:
+            print(f"Failed to upload achievement to Irys: {e}")
+    
+    result = await achievements_collection.insert_one(achievement_doc)
+    
+    if result.inserted_id:
+        if player_stats_store is not None:
+            await player_stats_store.record_achievement(player)
+        # Remove ObjectId to avoid serialization issues
+        achievement_doc.pop('_id', None)
+        return {"status": "unlocked", "achievement": achievement_doc}
+    else:
+        raise HTTPException(status_code=500, detail="Failed to unlock achievement")
+
+async def unlock_streak_legends(players: List[str]):
+    """Grant streak_legend to players whose daily streak just reached STREAK_LEGEND_DAYS"""
+    if achievements_collection is None:
+        return
+    legend = ACHIEVEMENTS_BY_ID["streak_legend"]
+    for player in await player_stats_store.streak_legends(players):
+        await grant_achievement(player, legend["id"], legend["title"], legend["description"], legend["icon"])
+        await player_stats_store.mark_streak_legend(player)
+
 @app.post("/api/achievements/unlock")
 async def unlock_achievement(achievement: Achievement):
     """Unlock an achievement for a player"""
@@ -778,49 +1506,16 @@ async def unlock_achievement(achievement: Achievement):
         raise HTTPException(status_code=500, detail="Database not configured")
     
     try:
-        # Check if achievement already exists
-        existing = await achievements_collection.find_one({
-            "player": achievement.player,
-            "achievement_type": achievement.achievement_type
-        })
-        
-        if existing:
-            # Remove MongoDB ObjectId before returning
-            existing.pop('_id', None)
-            return {"status": "already_unlocked", "achievement": existing}
-        
-        # Create achievement document
-        achievement_doc = {
-            "id": str(uuid.uuid4()),
-            "player": achievement.player,
-            "achievement_type": achievement.achievement_type,
-            "title": achievement.title,
-            "description": achievement.description,
-            "icon": achievement.icon,
-            "unlocked_at": datetime.utcnow().isoformat(),
-            "verified": False
-        }
-        
-        # Try to upload to Irys
-        if account:
-            try:
-                upload_data = json.dumps(achievement_doc)
-                # Mock Irys upload
-                mock_tx_id = f"achievement-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
-                achievement_doc["tx_id"] = mock_tx_id
-                achievement_doc["verified"] = True
-            except Exception as e:
-                print(f"Failed to upload achievement to Irys: {e}")
-        
-        result = await achievements_collection.insert_one(achievement_doc)
-        
-        if result.inserted_id:
-            # Remove ObjectId to avoid serialization issues
-            achievement_doc.pop('_id', None)
-            return {"status": "unlocked", "achievement": achievement_doc}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to unlock achievement")
+        return await grant_achievement(
+            achievement.player,
+            achievement.achievement_type,
+            achievement.title,
+            achievement.description,
+            achievement.icon
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -845,15 +1540,13 @@ async def get_player_stats(player_address: str):
         }
     
     try:
-        # Get all player scores
-        cursor = scores_collection.find(
-            {"player": player_address},
-            {"_id": 0}
-        ).sort("timestamp", -1)
-        
-        scores = await cursor.to_list(length=None)
+        if await player_stats_store.ready():
+            stats = await player_stats_store.get(player_address)
+        else:
+            # Stats documents are partial until the backfill finishes
+            stats = await player_stats_store.aggregate(player_address, scores_collection, achievements_collection)
         
-        if not scores:
+        if not stats:
             return {
                 "player": player_address,
                 "total_games": 0,
@@ -866,33 +1559,19 @@ async def get_player_stats(player_address: str):
                 "last_played": None
             }
         
-        # Calculate statistics
-        total_games = len(scores)
-        times = [score["time"] for score in scores if not score.get("penalty", False)]
-        best_time = min(times) if times else None
-        average_time = sum(times) / len(times) if times else None
-        
-        # Games by mode
-        games_by_mode = {}
-        for score in scores:
-            mode = score.get("game_mode", "classic")
-            games_by_mode[mode] = games_by_mode.get(mode, 0) + 1
-        
-        # Get achievements count
-        achievements_count = 0
-        if achievements_collection is not None:
-            achievements_count = await achievements_collection.count_documents({"player": player_address})
+        timed_games = stats.get("timed_games", 0)
+        average_time = stats.get("time_sum", 0) / timed_games if timed_games else None
         
         return {
             "player": player_address,
-            "total_games": total_games,
-            "best_time": best_time,
+            "total_games": stats.get("total_games", 0),
+            "best_time": stats.get("best_time"),
             "average_time": round(average_time, 2) if average_time else None,
-            "total_achievements": achievements_count,
-            "streak_current": 0,  # TODO: Implement streak calculation
-            "streak_best": 0,     # TODO: Implement streak calculation
-            "games_by_mode": games_by_mode,
-            "last_played": scores[0]["timestamp"] if scores else None
+            "total_achievements": stats.get("total_achievements", 0),
+            "streak_current": current_streak(stats),
+            "streak_best": stats.get("streak_best", 0),
+            "games_by_mode": stats.get("games_by_mode", {}),
+            "last_played": stats.get("last_played")
         }
         
     except Exception as e:
@@ -905,18 +1584,54 @@ async def generate_stats_image(player_address: str):
         # Get player stats
         stats = await get_player_stats(player_address)
         
-        # For now, return a data structure that frontend can use to generate image
-        # In a real implementation, you might generate an actual image server-side
+        # Rendered once per distinct set of card stats; repeat shares hit the cache
+        await screenshot_retention.make_room(STATS_CARD_MAX_BYTES)
+        card_key, card_path = await stats_card_renderer.render(stats)
+        if not screenshot_retention.touch(CARD, card_path.name):
+            screenshot_retention.add(CARD, card_path.name, (await asyncio.to_thread(card_path.stat)).st_size)
         
         stats_data = {
             "player": player_address,
             "stats": stats,
             "share_text": f"🎯 My Irys Reflex Stats:\n⚡ Best Time: {stats['best_time']}ms\n🎮 Total Games: {stats['total_games']}\n🏆 Achievements: {stats['total_achievements']}\n\nPlay at IrysReflex.com",
             "image_template": "stats_card_v1",
+            "image_url": f"{os.environ.get('BACKEND_URL', 'http://localhost:8001')}/api/stats-cards/{card_key}.png",
+            # Link this one in posts: its meta tags make X/Twitter show the card
+            "share_url": f"{os.environ.get('BACKEND_URL', 'http://localhost:8001')}/api/share/stats/{card_key}",
             "timestamp": datetime.utcnow().isoformat()
         }
         
         return stats_data
         
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=f"Stats card renderer is busy: {e}")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out rendering stats card")
+    except StorageFull as e:
+        raise HTTPException(status_code=507, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/stats-cards/{card_key}.png")
+async def serve_stats_card(card_key: str):
+    """Serve a rendered stats card; its name is a hash of what it shows"""
+    path = stats_card_renderer.path_for(card_key)
+    if not is_card_key(card_key) or not path.exists():
+        raise HTTPException(status_code=404, detail="Stats card not found")
+    screenshot_retention.touch(CARD, path.name)
+    return screenshot_response(path, "image/png", IMMUTABLE_CACHE_CONTROL)
+
+@app.get("/api/share/stats/{card_key}")
+async def stats_share_page(card_key: str):
+    """Share page for a stats card, with the og:image/twitter:image tags link previews need"""
+    if not is_card_key(card_key) or not await asyncio.to_thread(stats_card_renderer.path_for(card_key).exists):
+        raise HTTPException(status_code=404, detail="Stats card not found")
+    backend_url = os.environ.get('BACKEND_URL', 'http://localhost:8001')
+    page = share_page(
+        f"{backend_url}/api/share/stats/{card_key}",
+        f"{backend_url}/api/stats-cards/{card_key}.png",
+        os.environ.get('FRONTEND_URL', 'http://localhost:3000')
+    )
+    return Response(content=page, media_type="text/html", headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL})
\ No newline at end of file
@@ -0,0 +1,254 @@
+import os
+import re
+import html
+import json
+import asyncio
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from blocking_executor import BoundedExecutor
+from screenshot_store import SCREENSHOTS_DIR
+
+# Rendered cards live next to the screenshots so they share the same disk housekeeping
+STATS_CARD_DIR = os.environ.get('STATS_CARD_DIR', os.path.join(SCREENSHOTS_DIR, 'cards'))
+STATS_CARD_WORKERS = int(os.environ.get('STATS_CARD_WORKERS', '1'))
+STATS_CARD_TIMEOUT = float(os.environ.get('STATS_CARD_TIMEOUT', '10'))
+# Optional TrueType fonts and background image; Pillow's built-in font is the fallback
+STATS_CARD_FONT = os.environ.get('STATS_CARD_FONT')
+STATS_CARD_BOLD_FONT = os.environ.get('STATS_CARD_BOLD_FONT')
+STATS_CARD_BACKGROUND = os.environ.get('STATS_CARD_BACKGROUND')
+
+TEMPLATE = "stats_card_v1"
+# Same 800x600 layout the client used to capture, at 2x like html2canvas did
+SCALE = 2
+WIDTH, HEIGHT = 800 * SCALE, 600 * SCALE
+# Generous upper bound on one rendered PNG, reserved on disk before rendering
+STATS_CARD_MAX_BYTES = 1024 * 1024
+# The only stats drawn on the card, so the only ones in the cache key
+CARD_FIELDS = ("best_time", "total_games", "total_achievements", "average_time")
+
+_FONT_CANDIDATES = {
+    "regular": [
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+        "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    ],
+    "bold": [
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+        "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf",
+    ],
+}
+
+_KEY = re.compile(r"[0-9a-f]{32}")
+
+WHITE = (255, 255, 255)
+ACCENT = (0, 255, 209)
+TITLE_GRADIENT = ((0, 255, 209), (58, 0, 122))
+
+
+def card_values(stats: dict) -> Dict[str, object]:
+    return {field: stats.get(field) for field in CARD_FIELDS}
+
+
+def card_key(stats: dict) -> str:
+    """Hash of the template and the stats it draws; equal pictures share a key."""
+    material = json.dumps([TEMPLATE, SCALE, card_values(stats)], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+
+def is_card_key(key: str) -> bool:
+    return bool(_KEY.fullmatch(key))
+
+
+_SHARE_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Irys Reflex Player Stats</title>
+<meta property="og:type" content="website">
+<meta property="og:title" content="Irys Reflex Player Stats">
+<meta property="og:description" content="How fast are your reflexes? Play at IrysReflex.com">
+<meta property="og:url" content="{page_url}">
+<meta property="og:image" content="{image_url}">
+<meta property="og:image:type" content="image/png">
+<meta property="og:image:width" content="{width}">
+<meta property="og:image:height" content="{height}">
+<meta name="twitter:card" content="summary_large_image">
+<meta name="twitter:title" content="Irys Reflex Player Stats">
+<meta name="twitter:image" content="{image_url}">
+<meta http-equiv="refresh" content="0; url={play_url}">
+</head>
+<body>
+<a href="{play_url}"><img src="{image_url}" alt="Irys Reflex player stats" width="800" height="600"></a>
+</body>
+</html>
+"""
+
+
+def share_page(page_url: str, image_url: str, play_url: str) -> str:
+    """HTML page for a card: crawlers read its og/twitter tags, people are sent on to the game."""
+    return _SHARE_PAGE.format(
+        page_url=html.escape(page_url),
+        image_url=html.escape(image_url),
+        play_url=html.escape(play_url),
+        width=WIDTH,
+        height=HEIGHT
+    )
+
+
+# Fonts and background, loaded once in each rendering process
+_assets = None
+
+
+def _load_font(path: Optional[str], weight: str, size: int):
+    for candidate in ([path] if path else []) + _FONT_CANDIDATES[weight]:
+        if os.path.exists(candidate):
+            return ImageFont.truetype(candidate, size * SCALE)
+    return ImageFont.load_default(size * SCALE)
+
+
+def _gradient(size: Tuple[int, int], start, end) -> Image.Image:
+    """A 135-degree linear gradient (top-left to bottom-right)."""
+    width, height = size
+    # Build it small and let resize interpolate; a per-pixel loop is too slow at 2x
+    small = Image.new("RGB", (64, 64))
+    pixels = small.load()
+    for x in range(64):
+        for y in range(64):
+            t = (x + y) / 126
+            pixels[x, y] = tuple(round(a + (b - a) * t) for a, b in zip(start, end))
+    return small.resize((width, height), Image.BILINEAR)
+
+
+def load_assets():
+    global _assets
+    if STATS_CARD_BACKGROUND and os.path.exists(STATS_CARD_BACKGROUND):
+        with Image.open(STATS_CARD_BACKGROUND) as opened:
+            background = opened.convert("RGB").resize((WIDTH, HEIGHT), Image.LANCZOS)
+    else:
+        background = _gradient((WIDTH, HEIGHT), (10, 10, 10), (26, 26, 26))
+    _assets = {
+        "background": background,
+        "title": _load_font(STATS_CARD_BOLD_FONT, "bold", 48),
+        "subtitle": _load_font(STATS_CARD_FONT, "regular", 32),
+        "label": _load_font(STATS_CARD_FONT, "regular", 18),
+        "value": _load_font(STATS_CARD_BOLD_FONT, "bold", 36),
+        "footer": _load_font(STATS_CARD_FONT, "regular", 20),
+    }
+
+
+def _format(value, unit: str = "") -> str:
+    if value is None:
+        return "--"
+    return f"{value}{unit}"
+
+
+def _fade(opacity: float, background=(14, 14, 14)) -> Tuple[int, int, int]:
+    """White text at the given opacity over the card background."""
+    return tuple(round(b + (255 - b) * opacity) for b in background)
+
+
+def render_card(values: dict, path: str) -> int:
+    """Draw stats_card_v1 to a PNG at path; returns its size in bytes.
+
+    Runs in a rendering process. Writes a temporary file and renames it so a
+    concurrent reader never sees a partial PNG.
+    """
+    if _assets is None:
+        load_assets()
+    image = _assets["background"].copy()
+    draw = ImageDraw.Draw(image)
+    center = WIDTH // 2
+
+    # Title with the accent gradient, pasted through a text mask
+    title_font = _assets["title"]
+    left, top, right, bottom = draw.textbbox((0, 0), "Irys Reflex", font=title_font)
+    mask = Image.new("L", (right, bottom))
+    ImageDraw.Draw(mask).text((0, 0), "Irys Reflex", font=title_font, fill=255)
+    gradient = _gradient((right, bottom), *TITLE_GRADIENT)
+    image.paste(gradient, (center - right // 2, 60 * SCALE), mask)
+
+    draw.text((center, 150 * SCALE), "Player Stats", font=_assets["subtitle"], fill=_fade(0.8), anchor="mt")
+
+    cells = [
+        ("Best Time", _format(values.get("best_time"), "ms")),
+        ("Total Games", _format(values.get("total_games"))),
+        ("Achievements", _format(values.get("total_achievements"))),
+        ("Average", _format(values.get("average_time"), "ms")),
+    ]
+    for index, (label, value) in enumerate(cells):
+        x = (230 if index % 2 == 0 else 570) * SCALE
+        y = (240 + 110 * (index // 2)) * SCALE
+        draw.text((x, y), label, font=_assets["label"], fill=_fade(0.7), anchor="mt")
+        draw.text((x, y + 30 * SCALE), value, font=_assets["value"], fill=ACCENT, anchor="mt")
+
+    draw.text((center, 500 * SCALE), "Play at IrysReflex.com", font=_assets["footer"], fill=_fade(0.6), anchor="mt")
+
+    temp = f"{path}.{os.getpid()}.tmp"
+    image.save(temp, format="PNG", optimize=True)
+    os.replace(temp, path)
+    return os.path.getsize(path)
+
+
+class StatsCardRenderer:
+    """Server-side stats_card_v1 PNGs, cached on disk by card_key().
+
+    Rendering happens on a bounded process pool whose workers load fonts and
+    the background once. A card already on disk is served without rendering,
+    and concurrent requests for the same key share one render.
+    """
+
+    def __init__(self, root: str = STATS_CARD_DIR, workers: int = STATS_CARD_WORKERS,
+                 timeout: float = STATS_CARD_TIMEOUT):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        executor = ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=load_assets
+        )
+        self.executor = BoundedExecutor("stats_cards", executor, workers, timeout=timeout)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.renders = 0
+
+    def path_for(self, key: str) -> Path:
+        return self.root / f"{key}.png"
+
+    async def render(self, stats: dict) -> Tuple[str, Path]:
+        """Return (key, path) of the card for these stats, rendering it if needed."""
+        key = card_key(stats)
+        path = self.path_for(key)
+        if await asyncio.to_thread(path.exists):
+            self.hits += 1
+            return key, path
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.renders += 1
+            task = asyncio.create_task(self.executor.run(render_card, card_values(stats), str(path)))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._settled(key, done))
+        await asyncio.shield(task)
+        return key, path
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+    def status(self) -> dict:
+        return {
+            "template": TEMPLATE,
+            "cache_hits": self.hits,
+            "renders": self.renders,
+            "rendering": len(self._inflight),
+            **self.executor.status()
+        }
+
+    def _settled(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Stats card {key} failed to render: {task.exception() or 'timed out'}")
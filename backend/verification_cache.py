@@ -0,0 +1,84 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+# Cache sizing and lifetimes (seconds)
+VERIFICATION_CACHE_SIZE = int(os.environ.get('VERIFICATION_CACHE_SIZE', '10000'))
+VERIFICATION_POSITIVE_TTL = float(os.environ.get('VERIFICATION_POSITIVE_TTL', '86400'))
+VERIFICATION_NEGATIVE_TTL = float(os.environ.get('VERIFICATION_NEGATIVE_TTL', '30'))
+
+
+class VerificationCache:
+    """LRU/TTL cache of gateway verification results keyed by tx_id.
+
+    Irys data is immutable once it lands, so positive results are kept for a
+    long time and, when a collection is given, persisted to Mongo so they
+    survive restarts. Negative results only live in memory with a short TTL
+    because a transaction may simply not have propagated yet.
+    """
+
+    def __init__(self, collection=None, max_entries: int = VERIFICATION_CACHE_SIZE,
+                 positive_ttl: float = VERIFICATION_POSITIVE_TTL,
+                 negative_ttl: float = VERIFICATION_NEGATIVE_TTL):
+        self.collection = collection
+        self.max_entries = max(1, max_entries)
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # tx_id -> (verified, expires_at)
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, tx_id: str) -> Optional[bool]:
+        """Return the cached result for tx_id, or None if it must be fetched."""
+        entry = self._entries.get(tx_id)
+        if entry is not None:
+            verified, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(tx_id)
+                self.hits += 1
+                return verified
+            del self._entries[tx_id]
+
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one({"tx_id": tx_id}, {"_id": 0, "tx_id": 1})
+                if doc:
+                    self._remember(tx_id, True)
+                    self.hits += 1
+                    return True
+            except Exception as e:
+                print(f"Verification cache lookup failed: {e}")
+
+        self.misses += 1
+        return None
+
+    async def set(self, tx_id: str, verified: bool):
+        self._remember(tx_id, verified)
+
+        if verified and self.collection is not None:
+            try:
+                await self.collection.update_one(
+                    {"tx_id": tx_id},
+                    {"$setOnInsert": {"tx_id": tx_id, "verified_at": datetime.utcnow()}},
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"Failed to persist verification result: {e}")
+
+    def status(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "persistent": self.collection is not None
+        }
+
+    def _remember(self, tx_id: str, verified: bool):
+        ttl = self.positive_ttl if verified else self.negative_ttl
+        self._entries[tx_id] = (verified, time.monotonic() + ttl)
+        self._entries.move_to_end(tx_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -14,6 +14,9 @@ import { initKeepAlive } from './utils/keepAlive';
 import TwitterShare from './components/TwitterShare';
 import './App.css';
 
+// Number of rows shown on the leaderboard
+const LEADERBOARD_SIZE = 10;
+
 const App = () => {
   const [gameState, setGameState] = useState('waiting');
   const [reactionTime, setReactionTime] = useState(null);
@@ -65,7 +68,6 @@ const App = () => {
   useEffect(() => {
     checkInitialWalletConnection();
     fetchGameModes();
-    fetchLeaderboard();
     fetchNetworkInfo();
   }, []);
 
@@ -467,7 +469,6 @@ const App = () => {
       if (response.ok) {
         const result = await response.json();
         toast.success(`🎉 Score saved! ${result.verified ? 'Verified on Irys' : 'Pending verification'}`, { id: 'save' });
-        fetchLeaderboard();
         // Refresh balance after successful upload
         await checkBalance();
       } else {
@@ -556,11 +557,59 @@ const App = () => {
     }
   };
 
-  // Update leaderboard when game mode changes
+  // Keep the leaderboard live: one Server-Sent Events stream per selected mode
+  // replaces re-fetching after every submission and mode change
   useEffect(() => {
-    if (selectedGameMode) {
-      fetchLeaderboard(selectedGameMode);
+    if (!selectedGameMode) return;
+
+    // Show the board straight away; the stream's snapshot replaces it once connected
+    fetchLeaderboard(selectedGameMode);
+    if (typeof EventSource === 'undefined') {
+      return;
     }
+
+    const source = new EventSource(
+      `${process.env.REACT_APP_BACKEND_URL}/api/leaderboard/stream?game_mode=${selectedGameMode}&limit=${LEADERBOARD_SIZE}`
+    );
+
+    source.addEventListener('snapshot', (event) => {
+      setLeaderboard(JSON.parse(event.data).entries || []);
+    });
+
+    source.addEventListener('entry', (event) => {
+      const change = JSON.parse(event.data);
+      setLeaderboard((current) => {
+        const rows = (Array.isArray(current) ? current : []).filter(
+          (row) => row.id !== change.entry.id && row.id !== change.removed_id
+        );
+        rows.splice(change.rank - 1, 0, change.entry);
+        return rows.slice(0, LEADERBOARD_SIZE);
+      });
+    });
+
+    source.addEventListener('verified', (event) => {
+      const update = JSON.parse(event.data);
+      setLeaderboard((current) => (Array.isArray(current) ? current : []).map((row) => (
+        row.id === update.id
+          ? { ...row, verified: update.verified, verification_state: update.verification_state }
+          : row
+      )));
+    });
+
+    // A buffered score the database refused after all - take it back off the board
+    source.addEventListener('removed', (event) => {
+      const removal = JSON.parse(event.data);
+      setLeaderboard((current) => (Array.isArray(current) ? current : []).filter((row) => row.id !== removal.id));
+    });
+
+    // We fell behind and the server dropped our backlog - refetch the board
+    source.addEventListener('resync', () => fetchLeaderboard(selectedGameMode));
+
+    // The stream failed (no database, a proxy dropped it): fall back to a plain fetch.
+    // EventSource reconnects by itself unless the server refused the stream outright.
+    source.onerror = () => fetchLeaderboard(selectedGameMode);
+
+    return () => source.close();
   }, [selectedGameMode]);
 
   return (
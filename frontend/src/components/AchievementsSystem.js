@@ -72,7 +72,8 @@ const AchievementsSystem = ({ playerAddress, gameStats }) => {
         return stats.lastGameMode === 'sequence' && stats.lastTargets >= 10;
       
       case 'streak_legend':
-        return stats.dailyStreak >= 7;
+        // Granted by the server when a score extends the daily streak to 7
+        return false;
       
       default:
         return false;
@@ -1,30 +1,24 @@
-import React, { useState, useRef } from 'react';
-import html2canvas from 'html2canvas';
+import React, { useState } from 'react';
 import toast from 'react-hot-toast';
 
 const SocialShare = ({ playerAddress, playerStats }) => {
   const [isGenerating, setIsGenerating] = useState(false);
-  const statsCardRef = useRef(null);
 
   const generateStatsCard = async () => {
     if (!playerStats || !playerAddress) return;
 
     setIsGenerating(true);
     try {
-      // Generate screenshot of stats card
-      const canvas = await html2canvas(statsCardRef.current, {
-        backgroundColor: '#0A0A0A',
-        width: 800,
-        height: 600,
-        scale: 2,
-        logging: false,
-        useCORS: true
-      });
-
-      // Convert to blob
-      const blob = await new Promise(resolve => {
-        canvas.toBlob(resolve, 'image/png', 0.9);
-      });
+      // The backend renders the stats card (and caches it until the stats change)
+      const response = await fetch(
+        `${process.env.REACT_APP_BACKEND_URL}/api/player/${playerAddress}/generate-stats-image`,
+        { method: 'POST' }
+      );
+      if (!response.ok) {
+        throw new Error('Failed to generate stats card');
+      }
+      // The share page carries the og:image/twitter:image tags pointing at the card
+      const { share_url: shareUrl } = await response.json();
 
       // Create stats text
       const statsText = `🎯 My Irys Reflex Stats:
@@ -37,7 +31,7 @@ Play now at IrysReflex.com!
 #IrysReflex #ReactionTime #Gaming #Blockchain`;
 
       // Share to Twitter/X
-      await shareToTwitter(statsText, blob);
+      await shareToTwitter(statsText, shareUrl);
       
     } catch (error) {
       console.error('Error generating stats card:', error);
@@ -47,13 +41,13 @@ Play now at IrysReflex.com!
     }
   };
 
-  const shareToTwitter = async (text, imageBlob) => {
+  const shareToTwitter = async (text, shareUrl) => {
     try {
       // For now, we'll use the Twitter Web Intent API
       // In a real app, you might use Twitter API v2 with proper authentication
       
       const encodedText = encodeURIComponent(text);
-      const twitterUrl = `https://twitter.com/intent/tweet?text=${encodedText}`;
+      const twitterUrl = `https://twitter.com/intent/tweet?text=${encodedText}&url=${encodeURIComponent(shareUrl)}`;
       
       // Open Twitter in new window
       window.open(twitterUrl, '_blank', 'width=600,height=400');
@@ -101,83 +95,6 @@ Play now at IrysReflex.com!`;
         <p>Show off your reaction time skills!</p>
       </div>
 
-      {/* Stats Card for Screenshot */}
-      <div 
-        ref={statsCardRef} 
-        className="stats-card-screenshot"
-        style={{ 
-          position: 'absolute', 
-          left: '-9999px', 
-          width: '800px', 
-          height: '600px',
-          background: 'linear-gradient(135deg, #0A0A0A 0%, #1A1A1A 100%)',
-          color: 'white',
-          padding: '60px',
-          borderRadius: '20px',
-          fontFamily: 'Inter, sans-serif'
-        }}
-      >
-        <div style={{ textAlign: 'center' }}>
-          <h1 style={{ 
-            fontSize: '48px', 
-            marginBottom: '20px',
-            background: 'linear-gradient(135deg, #00FFD1 0%, #3A007A 100%)',
-            WebkitBackgroundClip: 'text',
-            WebkitTextFillColor: 'transparent',
-            fontWeight: 'bold'
-          }}>
-            Irys Reflex
-          </h1>
-          
-          <div style={{ 
-            fontSize: '32px', 
-            marginBottom: '40px',
-            opacity: 0.8 
-          }}>
-            Player Stats
-          </div>
-          
-          <div style={{ 
-            display: 'grid', 
-            gridTemplateColumns: '1fr 1fr',
-            gap: '40px',
-            marginBottom: '40px'
-          }}>
-            <div>
-              <div style={{ fontSize: '18px', opacity: 0.7 }}>Best Time</div>
-              <div style={{ fontSize: '36px', fontWeight: 'bold', color: '#00FFD1' }}>
-                {playerStats.best_time}ms
-              </div>
-            </div>
-            <div>
-              <div style={{ fontSize: '18px', opacity: 0.7 }}>Total Games</div>
-              <div style={{ fontSize: '36px', fontWeight: 'bold', color: '#00FFD1' }}>
-                {playerStats.total_games}
-              </div>
-            </div>
-            <div>
-              <div style={{ fontSize: '18px', opacity: 0.7 }}>Achievements</div>
-              <div style={{ fontSize: '36px', fontWeight: 'bold', color: '#00FFD1' }}>
-                {playerStats.total_achievements}
-              </div>
-            </div>
-            <div>
-              <div style={{ fontSize: '18px', opacity: 0.7 }}>Average</div>
-              <div style={{ fontSize: '36px', fontWeight: 'bold', color: '#00FFD1' }}>
-                {playerStats.average_time}ms
-              </div>
-            </div>
-          </div>
-          
-          <div style={{ 
-            opacity: 0.6, 
-            fontSize: '20px' 
-          }}>
-            Play at IrysReflex.com
-          </div>
-        </div>
-      </div>
-
       {/* Share Buttons */}
       <div className="share-buttons">
         <button
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from idempotency import IdempotencyStore
+
+
+def test_retry_replays_the_first_result():
+    calls = []
+
+    async def store():
+        calls.append(1)
+        return {"id": len(calls)}
+
+    async def run():
+        idempotency = IdempotencyStore()
+        first = await idempotency.run(("0xabc", "key"), store)
+        second = await idempotency.run(("0xabc", "key"), store)
+        other = await idempotency.run(("0xdef", "key"), store)
+        return first, second, other
+
+    first, second, other = asyncio.run(run())
+    assert first == ({"id": 1}, False)
+    assert second == ({"id": 1}, True)
+    assert other == ({"id": 2}, False)
+
+
+def test_concurrent_retry_waits_for_the_original():
+    calls = []
+
+    async def store():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "stored"
+
+    async def run():
+        idempotency = IdempotencyStore()
+        return await asyncio.gather(*(idempotency.run("key", store) for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False, True, True]
+
+
+def test_failure_is_forgotten_so_the_retry_runs():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("mongo down")
+        return "stored"
+
+    async def run():
+        idempotency = IdempotencyStore()
+        with pytest.raises(RuntimeError):
+            await idempotency.run("key", flaky)
+        return await idempotency.run("key", flaky)
+
+    assert asyncio.run(run()) == ("stored", False)
+
+
+def test_expired_and_evicted_entries_run_again():
+    async def store():
+        return object()
+
+    async def run():
+        expired = IdempotencyStore(ttl=0)
+        await expired.run("key", store)
+        bounded = IdempotencyStore(max_entries=1)
+        await bounded.run("old", store)
+        await bounded.run("new", store)
+        return (await expired.run("key", store))[1], (await bounded.run("old", store))[1]
+
+    assert asyncio.run(run()) == (False, False)
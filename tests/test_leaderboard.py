@@ -0,0 +1,81 @@
+
+import pytest
+
+from leaderboard import TopKBoard, after_filter, before_filter, decode_cursor, encode_cursor, sort_spec
+
+
+def rows():
+    return [
+        {"id": "a", "time": 300, "hits_count": 40},
+        {"id": "b", "time": 200, "hits_count": 55},
+        {"id": "c", "time": 200, "hits_count": None},
+        {"id": "d", "time": 250, "hits_count": 55},
+        {"id": "e", "time": 180, "hits_count": 10},
+    ]
+
+
+def test_board_ranks_by_time_with_id_tiebreak():
+    board = TopKBoard("classic", 10)
+    board.replace(rows())
+    assert [entry["id"] for entry in board.entries] == ["e", "b", "c", "d", "a"]
+
+
+def test_endurance_ranks_hits_descending_with_missing_last():
+    board = TopKBoard("endurance", 10)
+    for row in rows():
+        board.add(row)
+    assert [entry["id"] for entry in board.entries] == ["b", "d", "a", "e", "c"]
+
+
+def test_full_board_drops_the_worst_and_ignores_worse_rows():
+    board = TopKBoard("classic", 3)
+    board.replace(rows())
+    assert board.add({"id": "z", "time": 400}) is None
+    index, dropped = board.add({"id": "f", "time": 190})
+    assert index == 1
+    assert dropped["id"] == "c"
+    assert [entry["id"] for entry in board.entries] == ["e", "f", "b"]
+
+
+def test_removing_from_a_full_board_marks_it_cold():
+    board = TopKBoard("classic", 3)
+    board.replace(rows())
+    assert board.remove("b")
+    assert not board.warm
+    assert not board.remove("b")
+
+
+def test_page_continues_after_a_cursor():
+    board = TopKBoard("classic", 10)
+    board.replace(rows())
+    first = board.page(None, 2)
+    value, entry_id = decode_cursor(encode_cursor(first[-1], "classic"))
+    assert [entry["id"] for entry in board.page((value, entry_id), 2)] == ["c", "d"]
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor({"id": "b", "time": 200, "hits_count": 55}, "endurance")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (55, "b")
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", encode_cursor({"id": 5, "time": 1}, None)])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("game_mode", ["classic", "endurance"])
+def test_filters_split_the_ranking_at_every_row(game_mode):
+    mongomock = pytest.importorskip("mongomock")
+    collection = mongomock.MongoClient()["test"]["scores"]
+    collection.insert_many([dict(row) for row in rows()])
+    field = "hits_count" if game_mode == "endurance" else "time"
+    ranked = [doc["id"] for doc in collection.find({}, {"_id": 0}).sort(sort_spec(game_mode))]
+
+    for position, entry_id in enumerate(ranked):
+        value = next(row[field] for row in rows() if row["id"] == entry_id)
+        after = collection.find(after_filter(game_mode, value, entry_id)).sort(sort_spec(game_mode))
+        before = collection.find(before_filter(game_mode, value, entry_id)).sort(sort_spec(game_mode))
+        assert [doc["id"] for doc in after] == ranked[position + 1:]
+        assert [doc["id"] for doc in before] == ranked[:position]
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from player_stats import PlayerStatsStore, current_streak, streak_runs, utc_day
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+DAY_ONE = datetime(2026, 3, 1, 23, 59)
+
+
+def score(moment, time=250, player="0xabc"):
+    return {
+        "player": player,
+        "time": time,
+        "penalty": False,
+        "game_mode": "classic",
+        "timestamp": moment.isoformat(),
+        "created_at": moment,
+    }
+
+
+def record(*moments):
+    async def run():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        store = PlayerStatsStore(db.player_stats, db.migrations)
+        for moment in moments:
+            await store.record_score(score(moment))
+        return await store.get("0xabc")
+    return asyncio.run(run())
+
+
+def test_same_day_keeps_the_run():
+    stats = record(DAY_ONE, DAY_ONE + timedelta(seconds=30))
+    assert stats["streak_run"] == 1
+    assert stats["streak_best"] == 1
+    assert stats["last_active_day"] == utc_day(DAY_ONE)
+
+
+def test_next_day_extends_the_run():
+    # One minute later is already the next UTC day
+    stats = record(DAY_ONE, DAY_ONE + timedelta(minutes=1), DAY_ONE + timedelta(days=1, minutes=1))
+    assert stats["streak_run"] == 3
+    assert stats["streak_best"] == 3
+
+
+def test_gap_restarts_the_run_but_keeps_the_best():
+    stats = record(DAY_ONE, DAY_ONE + timedelta(days=1), DAY_ONE + timedelta(days=3))
+    assert stats["streak_run"] == 1
+    assert stats["streak_best"] == 2
+    assert stats["last_active_day"] == utc_day(DAY_ONE) + 3
+
+
+def test_older_score_does_not_move_the_run():
+    stats = record(DAY_ONE + timedelta(days=1), DAY_ONE)
+    assert stats["streak_run"] == 1
+    assert stats["last_active_day"] == utc_day(DAY_ONE) + 1
+
+
+def test_current_streak_expires_after_a_missed_day():
+    stats = {"last_active_day": 100, "streak_run": 4}
+    assert current_streak(stats, today=100) == 4
+    assert current_streak(stats, today=101) == 4
+    assert current_streak(stats, today=102) == 0
+    assert current_streak({}, today=100) == 0
+
+
+def test_streak_runs_matches_the_incremental_merge():
+    assert streak_runs([5, 3, 4, 4, 8, 9]) == (9, 2, 3)
+
+
+def test_streak_legends_reports_each_player_once():
+    async def run():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        store = PlayerStatsStore(db.player_stats, db.migrations)
+        due = [await store.record_score(score(DAY_ONE + timedelta(days=offset))) for offset in range(7)]
+        await store.record_score(score(DAY_ONE, player="0xdef"))
+        first = await store.streak_legends(["0xabc", "0xdef", "0xabc"])
+        await store.mark_streak_legend("0xabc")
+        again = await store.record_score(score(DAY_ONE + timedelta(days=7)))
+        return due, first, again, await store.streak_legends(["0xabc"])
+
+    due, first, again, second = asyncio.run(run())
+    # Only the seventh day's score reports a legend due, and not once it is marked
+    assert due == [False] * 6 + [True]
+    assert first == ["0xabc"]
+    assert again is False
+    assert second == []
@@ -0,0 +1,98 @@
+import asyncio
+import random
+from datetime import datetime
+
+import pytest
+
+from quantile_sketch import DDSketch, ScoreDistribution
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+@pytest.mark.parametrize("q", [0.1, 0.25, 0.5, 0.75, 0.9, 0.99])
+def test_quantiles_within_relative_accuracy(q):
+    rng = random.Random(7)
+    values = [rng.lognormvariate(5.5, 0.6) for _ in range(20000)]
+    sketch = DDSketch(0.01)
+    for value in values:
+        sketch.add(value)
+
+    expected = exact_quantile(values, q)
+    assert abs(sketch.quantile(q) - expected) <= 0.01 * expected
+
+
+def test_empty_sketch_has_no_quantiles():
+    sketch = DDSketch()
+    assert sketch.quantile(0.5) is None
+    assert sketch.histogram() == []
+
+
+def test_merge_matches_a_single_sketch():
+    rng = random.Random(11)
+    values = [rng.uniform(150, 900) for _ in range(5000)]
+    whole, left, right = DDSketch(), DDSketch(), DDSketch()
+    for index, value in enumerate(values):
+        whole.add(value)
+        (left if index % 2 else right).add(value)
+
+    left.merge(right)
+    assert left.count == whole.count
+    assert left.bins == whole.bins
+    assert (left.min, left.max) == (whole.min, whole.max)
+    for q in (0.05, 0.5, 0.95):
+        assert left.quantile(q) == whole.quantile(q)
+
+
+def test_remove_undoes_add():
+    sketch = DDSketch()
+    for value in (180, 220, 260, 0):
+        sketch.add(value)
+    sketch.remove(220)
+    sketch.remove(0)
+    assert sketch.count == 2
+    assert sketch.zero_count == 0
+    assert sketch.count_at_most(200) == 1
+    assert sketch.count_below(180) == 0
+
+
+def test_round_trips_through_dict():
+    sketch = DDSketch()
+    for value in (120, 240, 480):
+        sketch.add(value)
+    restored = DDSketch.from_dict(sketch.to_dict())
+    assert restored.bins == sketch.bins
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+
+
+def test_instances_add_up_instead_of_overwriting():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def run():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        await db.scores.insert_one({"game_mode": "classic", "time": 300, "created_at": datetime(2020, 1, 1)})
+        # Written by an empty sketch before counters were merged
+        await db.stats_sketches.insert_one({"_id": "all", "bins": {}, "count": 0, "zero_count": 0, "min": None, "max": None})
+        first = ScoreDistribution(db.stats_sketches, db.scores, persist_interval=0)
+        second = ScoreDistribution(db.stats_sketches, db.scores, persist_interval=0)
+        await first.start()
+        await second.start()
+
+        first.record_score({"game_mode": "classic", "time": 200})
+        second.record_score({"game_mode": "classic", "time": 250})
+        second.record_score({"game_mode": "classic", "time": 260})
+        second.retract_score({"game_mode": "classic", "time": 260})
+        await first.persist()
+        await second.persist()
+        await first.persist()
+        return {**first.describe("classic"), "all": first.describe(None)["count"]}, second.describe("classic")
+
+    first, second = asyncio.run(run())
+    # The rebuilt score is counted once, plus one live score from each instance
+    assert first["count"] == second["count"] == 3
+    assert first["min"] == 200
+    assert first["percentiles"] == second["percentiles"]
+    # Only live scores reach the pre-existing all-modes sketch
+    assert first["all"] == 2
@@ -0,0 +1,148 @@
+import asyncio
+import uuid
+
+import pytest
+
+from score_buffer import BOOKKEEPING_FIELD, DuplicateScoreError, ScoreWriteBuffer
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def score(**fields):
+    return {"id": str(uuid.uuid4()), "player": "0xabc", "time": 250, **fields}
+
+
+async def scores_collection():
+    collection = mongomock_motor.AsyncMongoMockClient()["test"]["scores"]
+    await collection.create_index("id", unique=True)
+    await collection.create_index("tx_id", unique=True, sparse=True)
+    return collection
+
+
+class Unreachable:
+    """A collection whose writes always fail, as if Mongo were down."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return await self.collection.find_one(*args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs):
+        raise ConnectionError("mongo unreachable")
+
+
+def test_spooled_scores_are_replayed_once(tmp_path):
+    async def run():
+        collection = await scores_collection()
+        first, second = score(), score()
+
+        crashed = ScoreWriteBuffer(Unreachable(collection), spool_dir=str(tmp_path), flush_ms=10)
+        await crashed.start()
+        await crashed.add(first)
+        await crashed.add(second)
+        await crashed.stop()
+        assert len(list(tmp_path.glob("*.spool"))) == 1
+
+        # Stored before the crash, but its segment was never deleted
+        await collection.insert_one(dict(first))
+        stored = []
+
+        async def on_stored(docs):
+            stored.extend(doc["id"] for doc in docs)
+
+        restarted = ScoreWriteBuffer(collection, spool_dir=str(tmp_path), on_stored=on_stored)
+        await restarted.start()
+        status = restarted.status()
+        await restarted.stop()
+        return stored, status, await collection.count_documents({}), second["id"]
+
+    stored, status, count, second_id = asyncio.run(run())
+    assert stored == [second_id]
+    assert status["replayed"] == 2
+    assert status["rejected"] == 0
+    assert status["pending"] == 0
+    assert count == 2
+    assert not list(tmp_path.glob("*.spool"))
+
+
+def test_duplicate_tx_id_is_refused_while_pending_and_once_stored(tmp_path):
+    async def run():
+        collection = await scores_collection()
+        buffer = ScoreWriteBuffer(collection, spool_dir=str(tmp_path))
+        await buffer.start()
+        original = score(tx_id="tx-1")
+        await buffer.add(original)
+        with pytest.raises(DuplicateScoreError) as pending:
+            await buffer.add(score(tx_id="tx-1"))
+        await buffer.flush()
+        with pytest.raises(DuplicateScoreError) as stored:
+            await buffer.add(score(tx_id="tx-1"))
+        await buffer.stop()
+        return original, pending.value.existing, stored.value.existing
+
+    original, pending, stored = asyncio.run(run())
+    assert pending is original
+    assert stored["id"] == original["id"]
+
+
+def test_score_refused_at_flush_is_handed_back(tmp_path):
+    async def run():
+        collection = await scores_collection()
+        rejected = []
+
+        async def on_rejected(docs):
+            rejected.extend(docs)
+
+        buffer = ScoreWriteBuffer(collection, spool_dir=str(tmp_path), on_rejected=on_rejected)
+        await buffer.start()
+        buffered = score(tx_id="tx-2")
+        kept = score()
+        await buffer.add(buffered)
+        await buffer.add(kept)
+        # Another instance stores the same tx_id before this one flushes
+        await collection.insert_one(score(tx_id="tx-2"))
+        await buffer.flush()
+        status = buffer.status()
+        await buffer.stop()
+        ids = [doc["id"] async for doc in collection.find({}, {"id": 1})]
+        return rejected, buffered, kept, status, ids
+
+    rejected, buffered, kept, status, ids = asyncio.run(run())
+    assert rejected == [buffered]
+    assert status["rejected"] == 1
+    assert kept["id"] in ids
+    assert buffered["id"] not in ids
+
+
+def test_replay_reruns_bookkeeping_for_scores_stored_before_a_crash(tmp_path):
+    async def run():
+        collection = await scores_collection()
+        unrecorded, recorded = score(), score()
+
+        async def never(docs):
+            pass
+
+        crashed = ScoreWriteBuffer(Unreachable(collection), spool_dir=str(tmp_path), on_stored=never)
+        await crashed.start()
+        await crashed.add(unrecorded)
+        await crashed.add(recorded)
+        await crashed.stop()
+
+        # Both were inserted before the crash, but only one had on_stored run
+        await collection.insert_one(dict(unrecorded))
+        await collection.insert_one({key: value for key, value in recorded.items() if key != BOOKKEEPING_FIELD})
+        stored = []
+
+        async def on_stored(docs):
+            stored.extend(doc["id"] for doc in docs)
+
+        restarted = ScoreWriteBuffer(collection, spool_dir=str(tmp_path), on_stored=on_stored)
+        await restarted.start()
+        await restarted.stop()
+        marked = await collection.count_documents({BOOKKEEPING_FIELD: {"$exists": True}})
+        return stored, unrecorded["id"], marked
+
+    stored, unrecorded_id, marked = asyncio.run(run())
+    assert stored == [unrecorded_id]
+    assert marked == 0
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from screenshot_retention import SCREENSHOT, ScreenshotRetention, StorageFull
+from screenshot_store import ScreenshotStore
+
+
+def write_files(root, names, size=100):
+    # Oldest first, one second apart, so the scan orders them
+    start = time.time() - 100
+    for offset, name in enumerate(names):
+        path = root / name
+        path.write_bytes(b"x" * size)
+        os.utime(path, (start + offset, start + offset))
+
+
+def retention(root, **options):
+    options.setdefault("min_free", 0)
+    options.setdefault("access_resolution", 0)
+    return ScreenshotRetention(ScreenshotStore(root=str(root)), **options)
+
+
+def remaining(root):
+    return sorted(path.name for path in root.iterdir() if path.is_file())
+
+
+def test_start_evicts_least_recently_served_down_to_the_low_watermark(tmp_path):
+    write_files(tmp_path, ["a.png", "b.png", "c.png", "d.png"])
+
+    async def run():
+        limits = retention(tmp_path, quota=350)
+        await limits.start()
+        await limits.stop()
+        return limits.status()
+
+    status = asyncio.run(run())
+    # 90% of 350 is 315: dropping the oldest 100-byte file is enough
+    assert remaining(tmp_path) == ["b.png", "c.png", "d.png"]
+    assert status["bytes"] == 300
+    assert status["evicted"] == 1
+
+
+def test_serving_a_file_protects_it_from_eviction(tmp_path):
+    write_files(tmp_path, ["a.png", "b.png", "c.png"])
+
+    async def run():
+        limits = retention(tmp_path, quota=1000)
+        await limits.start()
+        assert limits.touch(SCREENSHOT, "a.png")
+        assert not limits.touch(SCREENSHOT, "missing.png")
+        await limits.make_room(750)
+        await limits.stop()
+
+    asyncio.run(run())
+    assert remaining(tmp_path) == ["a.png"]
+
+
+def test_touch_persists_the_serve_time_for_the_next_start(tmp_path):
+    write_files(tmp_path, ["a.png", "b.png"])
+
+    async def run():
+        limits = retention(tmp_path, quota=1000)
+        await limits.start()
+        limits.touch(SCREENSHOT, "a.png")
+        await asyncio.sleep(0.05)
+        await limits.stop()
+
+        restarted = retention(tmp_path, quota=150)
+        await restarted.start()
+        await restarted.stop()
+
+    asyncio.run(run())
+    assert remaining(tmp_path) == ["a.png"]
+
+
+def test_expired_files_are_removed(tmp_path):
+    write_files(tmp_path, ["old.png"])
+
+    async def run():
+        limits = retention(tmp_path, quota=1000, max_age=10)
+        await limits.start()
+        await limits.stop()
+        return limits.status()
+
+    status = asyncio.run(run())
+    assert remaining(tmp_path) == []
+    assert status["expired"] == 1
+
+
+def test_a_write_larger_than_the_quota_is_refused(tmp_path):
+    async def run():
+        limits = retention(tmp_path, quota=1000)
+        await limits.start()
+        limits.add(SCREENSHOT, "new.png", 100)
+        with pytest.raises(StorageFull):
+            await limits.make_room(2000)
+        await limits.stop()
+        return limits.status()
+
+    assert asyncio.run(run())["refused"] == 1
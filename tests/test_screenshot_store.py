@@ -0,0 +1,35 @@
+import asyncio
+import io
+
+from fastapi import UploadFile
+from PIL import Image
+
+from screenshot_store import ScreenshotStore
+
+
+def png_upload() -> UploadFile:
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buffer, "PNG")
+    data = buffer.getvalue()
+    return UploadFile(io.BytesIO(data), size=len(data), filename="card.png")
+
+
+def test_upload_racing_the_last_release_keeps_its_file(tmp_path):
+    async def run():
+        store = ScreenshotStore(root=str(tmp_path))
+        first = await store.save_upload(png_upload())
+        delete_files = store._delete_files
+
+        async def slow_delete(filename):
+            await asyncio.sleep(0.2)
+            await delete_files(filename)
+
+        store._delete_files = slow_delete
+        # The last reference goes while the same content is uploaded again
+        _, second = await asyncio.gather(store.release(first["filename"]), store.save_upload(png_upload()))
+        return store, second
+
+    store, second = asyncio.run(run())
+    assert second["refs"] == 1
+    assert store.path_for(second["filename"]).exists()
+    assert not store._locks